@@ -0,0 +1,38 @@
+"""Compact storage of submission answers.
+
+A packed submission stores one byte per question instead of a list of
+{question_id, selected_answer} documents. Byte i is the selected option
+for the question in slot i of the test's `answer_slots`, an append-only
+list of question ids, so slots stay valid when questions are later
+added, removed or reordered.
+"""
+from typing import Any, Dict, List
+
+UNANSWERED = 255
+
+
+def pack_answers(slots: List[str], answers: List[Dict[str, Any]]) -> bytes:
+    """Answers for question ids not in `slots` are dropped; they never score"""
+    position = {question_id: i for i, question_id in enumerate(slots)}
+    packed = bytearray([UNANSWERED]) * len(slots)
+    for answer in answers:
+        slot = position.get(answer["question_id"])
+        if slot is not None and 0 <= answer["selected_answer"] < UNANSWERED:
+            packed[slot] = answer["selected_answer"]
+    return bytes(packed)
+
+
+def unpack_answers(slots: List[str], packed: bytes) -> List[Dict[str, Any]]:
+    return [
+        {"question_id": slots[slot], "selected_answer": value}
+        for slot, value in enumerate(packed)
+        if value != UNANSWERED
+    ]
+
+
+def decode_submission(submission: Dict[str, Any], slots: List[str]) -> Dict[str, Any]:
+    """Expand a packed submission in place; expanded ones pass through unchanged"""
+    packed = submission.pop("answers_packed", None)
+    if packed is not None:
+        submission["answers"] = unpack_answers(slots, packed)
+    return submission
@@ -0,0 +1,313 @@
+"""Benchmarks that run against a scratch MongoDB database.
+
+Usage:
+    python benchmarks.py class-codes [--length 3] [--samples 500]
+    python benchmarks.py question-dedup [--bank-size 50000] [--probes 1000]
+    python benchmarks.py export [--rows 100000] [--gzip]
+    python benchmarks.py answer-packing [--submissions 10000] [--with-db]
+
+The scratch database is BENCH_DB_NAME (default "quiz_benchmarks") on
+MONGO_URL and is dropped before each run.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import bson
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import server
+from answer_packing import decode_submission, pack_answers
+from question_similarity import SimilarityIndex, lsh_bands, minhash, similarity, DUPLICATE_THRESHOLD
+
+
+def get_bench_db():
+    client = AsyncIOMotorClient(server.mongo_url)
+    return client[os.environ.get('BENCH_DB_NAME', 'quiz_benchmarks')]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def code_from_index(index, length):
+    alphabet = server.CLASS_CODE_ALPHABET
+    chars = []
+    for _ in range(length):
+        index, digit = divmod(index, len(alphabet))
+        chars.append(alphabet[digit])
+    return ''.join(chars)
+
+
+async def bench_class_codes(length, samples):
+    """Allocation latency of insert_with_unique_code at 50% and 90% code-space occupancy.
+
+    A short code length keeps the code space small enough to fill; the
+    expected number of attempts only depends on occupancy (1 / (1 - p)).
+    """
+    db = get_bench_db()
+    space = len(server.CLASS_CODE_ALPHABET) ** length
+    print(f"Code space: {space} codes of length {length}")
+
+    for occupancy in (0.5, 0.9):
+        await db.classes.drop()
+        await db.classes.create_index("class_code", unique=True)
+        taken = random.sample(range(space), int(space * occupancy))
+        for i in range(0, len(taken), 5000):
+            await db.classes.insert_many([{"class_code": code_from_index(n, length)} for n in taken[i:i + 5000]])
+
+        latencies = []
+        attempts = []
+        for _ in range(samples):
+            doc = {"class_code": server.generate_class_code(length)}
+            started = time.perf_counter()
+            attempts.append(await server.insert_with_unique_code(db.classes, doc, length=length, max_attempts=10000))
+            latencies.append((time.perf_counter() - started) * 1000)
+            # Keep occupancy constant
+            await db.classes.delete_one({"_id": doc["_id"]})
+
+        print(
+            f"occupancy={occupancy:.0%} "
+            f"p50={percentile(latencies, 50):.2f}ms p95={percentile(latencies, 95):.2f}ms p99={percentile(latencies, 99):.2f}ms "
+            f"mean_attempts={statistics.mean(attempts):.2f} max_attempts={max(attempts)}"
+        )
+
+    await db.client.drop_database(db.name)
+
+
+WORDS = (
+    "which what how many sum product difference fraction equal greater less number value total "
+    "area perimeter triangle square circle angle measure length width height story character setting "
+    "theme author main idea detail evidence cause effect plant animal energy force motion water cycle "
+    "planet moon sun cell habitat predator prey chemical reaction map river mountain country capital"
+).split()
+
+
+def random_question(rng):
+    return {
+        "question_text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 16))) + "?",
+        "options": [" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))) for _ in range(4)]
+    }
+
+
+def near_duplicate(rng, question):
+    """Rephrase slightly: swap one word of the stem and change punctuation/case"""
+    words = question["question_text"].rstrip("?").split()
+    words[rng.randrange(len(words))] = rng.choice(WORDS)
+    return {"question_text": " ".join(words).capitalize() + " ?", "options": list(question["options"])}
+
+
+def bench_question_dedup(bank_size, probes):
+    """Near-duplicate lookup against a teacher bank: LSH index vs a linear scan.
+
+    Runs in memory; the API uses the same signatures and bands with the
+    lookup pushed down to the (teacher_id, bands) Mongo index.
+    """
+    rng = random.Random(7)
+    bank = [random_question(rng) for _ in range(bank_size)]
+
+    started = time.perf_counter()
+    signatures = [minhash(q) for q in bank]
+    index = SimilarityIndex()
+    for i, signature in enumerate(signatures):
+        index.add(i, signature)
+    build_s = time.perf_counter() - started
+    print(f"Indexed {bank_size} questions in {build_s:.1f}s ({build_s / bank_size * 1e6:.0f}us per question)")
+
+    probe_set = []
+    for i in range(probes):
+        source = rng.randrange(bank_size)
+        if i % 2 == 0:
+            probe_set.append((near_duplicate(rng, bank[source]), source))
+        else:
+            probe_set.append((random_question(rng), None))
+
+    lsh_ms, scan_ms = [], []
+    found = expected = false_positives = 0
+    for i, (probe, source) in enumerate(probe_set):
+        signature = minhash(probe)
+        started = time.perf_counter()
+        matches = index.find_similar(signature, bands=lsh_bands(signature))
+        lsh_ms.append((time.perf_counter() - started) * 1000)
+
+        # The exact ground truth is a full scan; time it on a sample of probes
+        if i < 50:
+            started = time.perf_counter()
+            truth = [j for j, s in enumerate(signatures) if similarity(signature, s) >= DUPLICATE_THRESHOLD]
+            scan_ms.append((time.perf_counter() - started) * 1000)
+        if source is not None and similarity(signature, signatures[source]) >= DUPLICATE_THRESHOLD:
+            expected += 1
+            found += source in matches
+        if source is None and matches:
+            false_positives += 1
+
+    print(f"LSH lookup:  p50={percentile(lsh_ms, 50):.3f}ms p99={percentile(lsh_ms, 99):.3f}ms")
+    print(f"Linear scan: p50={percentile(scan_ms, 50):.1f}ms p99={percentile(scan_ms, 99):.1f}ms")
+    print(f"Recall on near-duplicates above threshold: {found}/{expected}; fresh questions flagged: {false_positives}/{probes // 2}")
+
+
+def current_rss_mb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def bench_export(rows, compress):
+    """RSS while streaming a large test report export, sampled every 10% of rows.
+
+    The export routes read the submissions cursor in batches and emit 64KB
+    chunks, so RSS should stay flat regardless of the row count.
+    """
+    db = get_bench_db()
+    server.db = server.reports_db = db
+    await db.client.drop_database(db.name)
+
+    rng = random.Random(3)
+    standards = [f"STD.{i}" for i in range(8)]
+    await db.users.insert_many([{"id": f"s{i}", "name": f"Student {i}", "email": f"s{i}@example.com"} for i in range(1000)])
+    for start in range(0, rows, 5000):
+        await db.submissions.insert_many([
+            {
+                "id": f"sub{n}", "test_id": "bench-test", "student_id": f"s{n % 1000}",
+                "answers": {str(q): rng.randrange(4) for q in range(20)},
+                "score": rng.uniform(0, 100),
+                "standards_breakdown": {s: {"correct": 1, "total": 2, "percentage": 50.0} for s in standards},
+                "submitted_at": datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=n)
+            }
+            for n in range(start, min(start + 5000, rows))
+        ])
+    print(f"Seeded {rows} submissions; RSS before export {current_rss_mb():.1f}MB")
+
+    fieldnames = ["student_id", "student_name", "student_email", "score", "submitted_at"] + standards
+    emitted = total_bytes = 0
+    samples = []
+    started = time.perf_counter()
+
+    async def counted():
+        nonlocal emitted
+        async for row in server.test_report_rows("bench-test", standards, {}):
+            emitted += 1
+            if emitted % max(1, rows // 10) == 0:
+                samples.append(current_rss_mb())
+            yield row
+
+    async for chunk in server.encode_rows(counted(), "csv", fieldnames, compress):
+        total_bytes += len(chunk)
+    elapsed = time.perf_counter() - started
+
+    print(f"Exported {emitted} rows, {total_bytes / 1e6:.1f}MB{' gzipped' if compress else ''} in {elapsed:.1f}s")
+    print("RSS per 10% of rows (MB): " + " ".join(f"{mb:.0f}" for mb in samples))
+    await db.client.drop_database(db.name)
+
+
+def sample_submission(rng, question_ids, standards):
+    return {
+        "id": str(uuid.uuid4()),
+        "test_id": str(uuid.uuid4()),
+        "student_id": str(uuid.uuid4()),
+        "answers": [{"question_id": qid, "selected_answer": rng.randrange(4)} for qid in question_ids],
+        "score": 65.0,
+        "standards_breakdown": {s: {"correct": 3, "total": 5, "percentage": 60.0} for s in standards},
+        "submitted_at": "2026-01-01T00:00:00.000000+00:00"
+    }
+
+
+def packed(submission, slots):
+    doc = {k: v for k, v in submission.items() if k != "answers"}
+    doc["answers_packed"] = pack_answers(slots, submission["answers"])
+    return doc
+
+
+async def bench_answer_packing(count, with_db):
+    """BSON size and read cost of expanded vs packed submission answers.
+
+    Sizes and decode throughput are measured in memory (BSON decode is the
+    driver's share of every report read). With --with-db the report query
+    itself is timed against both encodings in the scratch database.
+    """
+    rng = random.Random(5)
+    for num_questions in (10, 20, 40):
+        slots = [str(uuid.uuid4()) for _ in range(num_questions)]
+        standards = [f"CCSS.MATH.CONTENT.{g}.OA.A.{i}" for g in (3, 4) for i in range(1, 3)]
+        expanded_docs = [sample_submission(rng, slots, standards) for _ in range(count)]
+        packed_docs = [packed(d, slots) for d in expanded_docs]
+
+        results = []
+        for name, docs in (("expanded", expanded_docs), ("packed", packed_docs)):
+            raw = b"".join(bson.encode(d) for d in docs)
+            started = time.perf_counter()
+            for doc in bson.decode_all(raw):
+                decode_submission(doc, slots)
+            elapsed = time.perf_counter() - started
+            results.append(f"{name}: {len(raw) / count:.0f}B/doc, decode {count / elapsed:,.0f} docs/s")
+        print(f"{num_questions} questions: " + "; ".join(results))
+
+    if not with_db:
+        return
+
+    db = get_bench_db()
+    await db.client.drop_database(db.name)
+    slots = [str(uuid.uuid4()) for _ in range(20)]
+    standards = [f"CCSS.MATH.CONTENT.3.OA.A.{i}" for i in range(1, 4)]
+    for name in ("expanded", "packed"):
+        docs = [sample_submission(rng, slots, standards) for _ in range(count)]
+        for doc in docs:
+            doc["test_id"] = name
+        await db.submissions.insert_many(docs if name == "expanded" else [packed(d, slots) for d in docs])
+    await db.submissions.create_index("test_id")
+    stats = await db.command("collstats", "submissions")
+    print(f"Collection: {stats['count']} docs, avgObjSize {stats['avgObjSize']}B (both encodings mixed)")
+
+    for name in ("expanded", "packed"):
+        timings = []
+        for _ in range(5):
+            started = time.perf_counter()
+            docs = await db.submissions.find({"test_id": name}, {"_id": 0}).to_list(None)
+            for doc in docs:
+                decode_submission(doc, slots)
+            timings.append(time.perf_counter() - started)
+        print(f"Report read of {count} {name} submissions: median {statistics.median(timings) * 1000:.0f}ms")
+    await db.client.drop_database(db.name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quiz app benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    class_codes = subparsers.add_parser("class-codes", help="Class code allocation latency by occupancy")
+    class_codes.add_argument("--length", type=int, default=3)
+    class_codes.add_argument("--samples", type=int, default=500)
+
+    dedup = subparsers.add_parser("question-dedup", help="Near-duplicate lookup latency on a large question bank")
+    dedup.add_argument("--bank-size", type=int, default=50000)
+    dedup.add_argument("--probes", type=int, default=1000)
+
+    export = subparsers.add_parser("export", help="Memory profile of a streamed CSV export")
+    export.add_argument("--rows", type=int, default=100000)
+    export.add_argument("--gzip", action="store_true")
+
+    packing = subparsers.add_parser("answer-packing", help="Submission size and read cost, expanded vs packed answers")
+    packing.add_argument("--submissions", type=int, default=10000)
+    packing.add_argument("--with-db", action="store_true", help="Also time the report query against the scratch database")
+
+    args = parser.parse_args()
+    if args.command == "class-codes":
+        asyncio.run(bench_class_codes(args.length, args.samples))
+    elif args.command == "question-dedup":
+        bench_question_dedup(args.bank_size, args.probes)
+    elif args.command == "export":
+        asyncio.run(bench_export(args.rows, args.gzip))
+    elif args.command == "answer-packing":
+        asyncio.run(bench_answer_packing(args.submissions, args.with_db))
+
+
+if __name__ == "__main__":
+    main()
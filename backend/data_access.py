@@ -0,0 +1,75 @@
+"""Read-preference routing per route class.
+
+Auth, submissions and anything that must read its own writes use the
+primary. Analytics and reports run heavy aggregations that can tolerate
+bounded replica lag, so by default they prefer secondaries, which keeps
+them off the node taking bell-time submission writes. Each route class
+gets its own Database handle over the one shared client, so routing
+adds nothing per query. Against a standalone server every handle reads
+from that server.
+"""
+from typing import Dict, Mapping, Optional, Tuple
+
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+READ_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest
+}
+# Servers reject maxStalenessSeconds below this
+MIN_MAX_STALENESS_SECONDS = 90
+
+# Route class -> default (mode, max staleness in seconds or None)
+DEFAULT_ROUTES: Dict[str, Tuple[str, Optional[int]]] = {
+    "primary": ("primary", None),
+    "analytics": ("secondaryPreferred", MIN_MAX_STALENESS_SECONDS),
+    "reports": ("secondaryPreferred", MIN_MAX_STALENESS_SECONDS)
+}
+
+
+def read_preference(mode: str, max_staleness: Optional[int] = None):
+    if mode not in READ_MODES:
+        raise ValueError(f"read preference must be one of {', '.join(READ_MODES)}")
+    if mode == "primary":
+        return Primary()
+    if max_staleness is not None and max_staleness < MIN_MAX_STALENESS_SECONDS:
+        raise ValueError(f"max staleness must be at least {MIN_MAX_STALENESS_SECONDS} seconds")
+    return READ_MODES[mode](max_staleness=-1 if max_staleness is None else max_staleness)
+
+
+def routes_from_env(environ: Mapping[str, str]) -> Dict[str, Tuple[str, Optional[int]]]:
+    """Apply <CLASS>_READ_PREFERENCE and <CLASS>_MAX_STALENESS_SECONDS overrides.
+
+    The primary class is not configurable: its callers read their own writes.
+    A max staleness of 0 means no bound.
+    """
+    routes = dict(DEFAULT_ROUTES)
+    for route, (mode, max_staleness) in DEFAULT_ROUTES.items():
+        if route == "primary":
+            continue
+        prefix = route.upper()
+        mode = environ.get(f"{prefix}_READ_PREFERENCE", mode)
+        if f"{prefix}_MAX_STALENESS_SECONDS" in environ:
+            max_staleness = int(environ[f"{prefix}_MAX_STALENESS_SECONDS"]) or None
+        routes[route] = (mode, None if mode == "primary" else max_staleness)
+    return routes
+
+
+class DataAccess:
+    """Database handles per route class, all sharing one client and its connection pools"""
+
+    def __init__(self, client, db_name: str, routes: Mapping[str, Tuple[str, Optional[int]]] = DEFAULT_ROUTES):
+        self.databases = {
+            route: client.get_database(db_name, read_preference=read_preference(mode, max_staleness))
+            for route, (mode, max_staleness) in routes.items()
+        }
+
+    def __getitem__(self, route: str):
+        return self.databases[route]
+
+    @property
+    def primary(self):
+        return self.databases["primary"]
@@ -0,0 +1,228 @@
+"""Per-standard performance forecasts over bucketed time series.
+
+Daily aggregates (one row per standard and day) are rolled up into
+day/week/month buckets and laid out as a standards x periods matrix, with
+empty buckets carrying zero weight. Every standard is then fitted at once:
+a weighted least-squares line (weights are submission counts) gives the
+next-bucket prediction and its interval, and an exponentially weighted
+moving average over the observed buckets gives the current level.
+Each standard is projected to the bucket after its own last observation,
+so a standard that stopped being tested is not extrapolated to the
+newest bucket of the others.
+"""
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+BUCKETS = ("day", "week", "month")
+EWMA_ALPHA = 0.5
+MIN_BUCKETS_FOR_FIT = 3
+
+# Two-sided 95% Student t quantiles by degrees of freedom; 1.96 beyond the table
+_T_95 = {1: 12.71, 2: 4.30, 3: 3.18, 4: 2.78, 5: 2.57, 6: 2.45, 7: 2.36, 8: 2.31, 9: 2.26, 10: 2.23,
+         12: 2.18, 15: 2.13, 20: 2.09, 30: 2.04}
+
+
+def t_95(dof: int) -> float:
+    for limit in sorted(_T_95):
+        if dof <= limit:
+            return _T_95[limit]
+    return 1.96
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def period_index(day: date, bucket: str) -> int:
+    """Position of the bucket containing `day` on a contiguous integer axis"""
+    if bucket == "week":
+        return bucket_start(day, "week").toordinal() // 7
+    if bucket == "month":
+        return day.year * 12 + day.month - 1
+    return day.toordinal()
+
+
+def period_label(index: int, bucket: str) -> str:
+    if bucket == "week":
+        return date.fromordinal(index * 7).isoformat()
+    if bucket == "month":
+        return date(index // 12, index % 12 + 1, 1).isoformat()
+    return date.fromordinal(index).isoformat()
+
+
+def build_matrix(rows: Iterable[Dict[str, Any]], bucket: str) -> Tuple[List[str], List[int], np.ndarray, np.ndarray]:
+    """Lay daily rows out as (standards, periods, mean percentage, submission count) matrices.
+
+    Each row needs `standard`, `day` (YYYY-MM-DD), `percentage_sum` and
+    `submissions`. Periods run contiguously from the first to the last
+    bucket seen so the column index is proportional to time.
+    """
+    sums: Dict[Tuple[str, int], float] = {}
+    counts: Dict[Tuple[str, int], int] = {}
+    for row in rows:
+        key = (row["standard"], period_index(date.fromisoformat(row["day"]), bucket))
+        sums[key] = sums.get(key, 0.0) + row["percentage_sum"]
+        counts[key] = counts.get(key, 0) + row["submissions"]
+
+    if not counts:
+        return [], [], np.zeros((0, 0)), np.zeros((0, 0))
+
+    standards = sorted({standard for standard, _ in counts})
+    first = min(period for _, period in counts)
+    periods = list(range(first, max(period for _, period in counts) + 1))
+    row_of = {standard: i for i, standard in enumerate(standards)}
+
+    totals = np.zeros((len(standards), len(periods)))
+    weights = np.zeros((len(standards), len(periods)))
+    for (standard, period), count in counts.items():
+        totals[row_of[standard], period - first] = sums[(standard, period)]
+        weights[row_of[standard], period - first] = count
+    means = np.divide(totals, weights, out=np.zeros_like(totals), where=weights > 0)
+    return standards, periods, means, weights
+
+
+def bucket_timelines(rows: Iterable[Dict[str, Any]], bucket: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Roll daily rows up into one timeline point per standard and bucket, oldest first"""
+    points: Dict[Tuple[str, int], Dict[str, Any]] = {}
+    for row in rows:
+        period = period_index(date.fromisoformat(row["day"]), bucket)
+        point = points.setdefault((row["standard"], period), {"correct": 0, "total": 0, "percentage_sum": 0.0, "submissions": 0})
+        for field in ("correct", "total", "percentage_sum", "submissions"):
+            point[field] += row[field]
+
+    timelines: Dict[str, List[Dict[str, Any]]] = {}
+    for (standard, period), point in sorted(points.items()):
+        timelines.setdefault(standard, []).append({
+            "date": period_label(period, bucket),
+            "period": period,
+            "percentage": round(point["percentage_sum"] / point["submissions"], 2),
+            "correct": point["correct"],
+            "total": point["total"],
+            "submissions": point["submissions"]
+        })
+    return timelines
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-triangle-three-buckets: indices of `threshold` points that keep the series' shape"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    selected = [0]
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        # Average of the following bucket stands in for the third vertex
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        a = selected[-1]
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        selected.append(start + int(areas.argmax()))
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+def ewma(values: np.ndarray, weights: np.ndarray, alpha: float = EWMA_ALPHA) -> np.ndarray:
+    """Row-wise EWMA over observed buckets; empty buckets carry the level forward"""
+    level = np.full(values.shape[0], np.nan)
+    for t in range(values.shape[1]):
+        observed = weights[:, t] > 0
+        updated = np.where(np.isnan(level), values[:, t], alpha * values[:, t] + (1 - alpha) * level)
+        level = np.where(observed, updated, level)
+    return level
+
+
+def fit_trends(values: np.ndarray, weights: np.ndarray) -> Dict[str, np.ndarray]:
+    """Weighted least-squares line per row, projected one bucket past the row's last observed column.
+
+    Weights are normalized to sum to the number of observed buckets, so
+    the residual variance is per bucket and the prediction interval is the
+    usual one for a new observation at the next bucket.
+    """
+    rows, columns = values.shape
+    x = np.arange(columns, dtype=float)
+    observed = (weights > 0).sum(axis=1)
+    total_weight = weights.sum(axis=1)
+    w = weights * np.divide(observed, total_weight, out=np.zeros(rows), where=total_weight > 0)[:, None]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_mean = (w * x).sum(axis=1) / observed
+        y_mean = (w * values).sum(axis=1) / observed
+        dx = np.where(weights > 0, x - x_mean[:, None], 0.0)
+        sxx = (w * dx ** 2).sum(axis=1)
+        slope = (w * dx * (values - y_mean[:, None])).sum(axis=1) / sxx
+        intercept = y_mean - slope * x_mean
+
+        residuals = np.where(weights > 0, values - (intercept[:, None] + slope[:, None] * x), 0.0)
+        dof = observed - 2
+        sigma = np.sqrt((w * residuals ** 2).sum(axis=1) / dof)
+
+        # Column of each row's last observation; a row with none projects past the matrix
+        last = np.where((weights > 0).any(axis=1), columns - 1 - (weights[:, ::-1] > 0).argmax(axis=1), columns - 1)
+        x_next = last + 1.0
+        predicted = intercept + slope * x_next
+        spread = sigma * np.sqrt(1 + 1 / observed + (x_next - x_mean) ** 2 / sxx)
+        slope_se = sigma / np.sqrt(sxx)
+
+    fitted = (observed >= MIN_BUCKETS_FOR_FIT) & (sxx > 0)
+    t_values = np.array([t_95(int(d)) for d in np.maximum(dof, 1)])
+    return {
+        "fitted": fitted,
+        "observed": observed,
+        "next_column": last + 1,
+        "slope": np.where(fitted, slope, 0.0),
+        "slope_se": np.where(fitted, slope_se, np.inf),
+        "predicted": np.where(fitted, predicted, np.nan),
+        "margin": np.where(fitted, t_values * spread, np.nan)
+    }
+
+
+def forecast(rows: Iterable[Dict[str, Any]], bucket: str = "day") -> List[Dict[str, Any]]:
+    """Forecast every standard in `rows` at once; see module docstring"""
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+    standards, periods, values, weights = build_matrix(rows, bucket)
+    if not standards:
+        return []
+
+    level = ewma(values, weights)
+    trends = fit_trends(values, weights)
+    submissions = weights.sum(axis=1)
+
+    results = []
+    for i, standard in enumerate(standards):
+        current = float(level[i])
+        if trends["fitted"][i]:
+            predicted = float(np.clip(trends["predicted"][i], 0, 100))
+            margin = float(trends["margin"][i])
+            low, high = max(0.0, predicted - margin), min(100.0, predicted + margin)
+            slope = float(trends["slope"][i])
+            significant = abs(slope) > 2 * float(trends["slope_se"][i])
+            trend = ("improving" if slope > 0 else "declining") if significant else "stable"
+            confidence = "high" if margin <= 10 else "medium" if margin <= 20 else "low"
+        else:
+            predicted, low, high, slope = current, None, None, 0.0
+            trend, confidence = "stable", "low"
+
+        results.append({
+            "standard": standard,
+            "current_average": round(current, 2),
+            "predicted_score": round(predicted, 2),
+            "interval": {"low": round(low, 2), "high": round(high, 2)} if low is not None else None,
+            "trend": trend,
+            "trend_magnitude": round(abs(slope), 2),
+            "slope_per_bucket": round(slope, 2),
+            "confidence": confidence,
+            "data_points": int(submissions[i]),
+            "buckets_observed": int(trends["observed"][i]),
+            "next_bucket": period_label(periods[0] + int(trends["next_column"][i]), bucket),
+            "recommendation": "Continue current approach" if predicted >= 70 else "Needs intervention and additional practice"
+        })
+    return results
@@ -0,0 +1,96 @@
+"""Classical item analysis from running per-question counters.
+
+Each submission adds one observation to every question on the test:
+whether it was answered correctly, which option was chosen, and the
+student's rest score (correct answers on the *other* questions). Keeping
+sums of the rest score, its square, and its sum over correct answers is
+enough to recover difficulty and the corrected point-biserial
+discrimination without revisiting any submission.
+"""
+import math
+from typing import Any, Dict, List, Optional
+
+# Reporting thresholds, following the usual classroom-test rules of thumb
+MIN_ATTEMPTS_FOR_FLAGS = 10
+TOO_HARD = 0.2
+TOO_EASY = 0.95
+LOW_DISCRIMINATION = 0.2
+
+
+def item_increments(questions: List[Dict[str, Any]], selected: Dict[str, int]) -> Dict[str, Dict[str, float]]:
+    """$inc documents per question id for one submission.
+
+    `selected` maps question id to the chosen option index in stored
+    option order; unanswered questions (missing, negative as autosaved
+    attempts record them, or out of range) count as incorrect and skipped.
+    """
+    is_correct = {q["id"]: selected.get(q["id"]) == q["correct_answer"] for q in questions}
+    total_correct = sum(is_correct.values())
+
+    increments = {}
+    for question in questions:
+        correct = is_correct[question["id"]]
+        rest = total_correct - correct
+        inc = {
+            "attempts": 1,
+            "correct": int(correct),
+            "rest_sum": rest,
+            "rest_sq_sum": rest * rest,
+            "rest_sum_correct": rest if correct else 0
+        }
+        choice = selected.get(question["id"])
+        if choice is None or not 0 <= choice < len(question["options"]):
+            inc["skipped"] = 1
+        else:
+            inc[f"choice_counts.{choice}"] = 1
+        increments[question["id"]] = inc
+    return increments
+
+
+def point_biserial(stats: Dict[str, Any]) -> Optional[float]:
+    """Correlation between answering this item correctly and the rest score"""
+    n, n1 = stats.get("attempts", 0), stats.get("correct", 0)
+    if n < 2 or n1 in (0, n):
+        return None
+    mean = stats["rest_sum"] / n
+    variance = stats["rest_sq_sum"] / n - mean * mean
+    if variance <= 0:
+        return None
+    mean_correct = stats["rest_sum_correct"] / n1
+    mean_incorrect = (stats["rest_sum"] - stats["rest_sum_correct"]) / (n - n1)
+    p = n1 / n
+    return (mean_correct - mean_incorrect) / math.sqrt(variance) * math.sqrt(p * (1 - p))
+
+
+def summarize_item(question: Dict[str, Any], stats: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    stats = stats or {}
+    attempts = stats.get("attempts", 0)
+    counts = stats.get("choice_counts", {})
+    choice_counts = [counts.get(str(i), 0) for i in range(len(question["options"]))]
+    difficulty = stats.get("correct", 0) / attempts if attempts else None
+    discrimination = point_biserial(stats)
+
+    flags = []
+    if attempts >= MIN_ATTEMPTS_FOR_FLAGS:
+        if difficulty < TOO_HARD:
+            flags.append("too_hard")
+        elif difficulty > TOO_EASY:
+            flags.append("too_easy")
+        if discrimination is not None and discrimination < LOW_DISCRIMINATION:
+            flags.append("low_discrimination")
+        key_count = choice_counts[question["correct_answer"]] if question["correct_answer"] < len(choice_counts) else 0
+        if any(c > key_count for i, c in enumerate(choice_counts) if i != question["correct_answer"]):
+            flags.append("distractor_outdraws_key")
+
+    return {
+        "question_id": question["id"],
+        "question_text": question["question_text"],
+        "standard": question["standard"],
+        "attempts": attempts,
+        "difficulty": round(difficulty, 3) if difficulty is not None else None,
+        "discrimination": round(discrimination, 3) if discrimination is not None else None,
+        "choice_counts": choice_counts,
+        "correct_answer": question["correct_answer"],
+        "skipped": stats.get("skipped", 0),
+        "flags": flags
+    }
@@ -0,0 +1,104 @@
+"""LLM providers used for question generation.
+
+Provider SDKs are imported on first use instead of at module load. The
+emergentintegrations stack (LiteLLM, Google GenAI) takes seconds to import
+and only the generation routes need it, so keeping it out of the import
+graph keeps worker start-up fast.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import uuid
+from abc import ABC, abstractmethod
+from typing import Optional
+
+
+class LlmProvider(ABC):
+    """Sends one prompt (with an optional file attachment) and returns the raw text reply."""
+
+    name = "base"
+    # Concurrent requests allowed against this backend unless configured otherwise
+    default_max_concurrency = 4
+
+    @abstractmethod
+    async def complete(self, prompt: str, system_message: str, session_prefix: str = "llm",
+                       file_path: Optional[str] = None, mime_type: Optional[str] = None) -> str:
+        ...
+
+
+class GeminiProvider(LlmProvider):
+    name = "gemini"
+
+    def __init__(self, api_key: str, model: str = "gemini-2.0-flash"):
+        self.api_key = api_key
+        self.model = model
+
+    async def complete(self, prompt: str, system_message: str, session_prefix: str = "llm",
+                       file_path: Optional[str] = None, mime_type: Optional[str] = None) -> str:
+        # Deferred: importing the integration pulls in LiteLLM and the Google GenAI SDKs
+        from emergentintegrations.llm.chat import LlmChat, UserMessage, FileContentWithMimeType
+
+        chat = LlmChat(
+            api_key=self.api_key,
+            session_id=f"{session_prefix}-{uuid.uuid4()}",
+            system_message=system_message
+        ).with_model("gemini", self.model)
+
+        file_contents = None
+        if file_path:
+            file_contents = [FileContentWithMimeType(file_path=file_path, mime_type=mime_type)]
+
+        return await chat.send_message(UserMessage(text=prompt, file_contents=file_contents))
+
+
+class StubProvider(LlmProvider):
+    """Local deterministic backend for tests and benchmarks; never calls a model.
+
+    The reply is a JSON array of as many questions as the prompt asks for
+    ("Create N ..."), seeded from the prompt so identical prompts give
+    identical questions.
+    """
+
+    name = "stub"
+    default_max_concurrency = 64
+
+    def __init__(self, latency_ms: float = 0):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+
+    async def complete(self, prompt: str, system_message: str, session_prefix: str = "llm",
+                       file_path: Optional[str] = None, mime_type: Optional[str] = None) -> str:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        match = re.search(r"Create (\d+)", prompt)
+        count = int(match.group(1)) if match else 5
+        rng = random.Random(hashlib.sha256(prompt.encode()).hexdigest())
+        questions = []
+        for i in range(count):
+            a, b = rng.randint(2, 99), rng.randint(2, 99)
+            answer = a + b
+            options = [answer, answer + rng.randint(1, 9), answer - rng.randint(1, 9), answer + rng.randint(10, 19)]
+            rng.shuffle(options)
+            questions.append({
+                "question_text": f"What is {a} + {b}?",
+                "options": [str(o) for o in options],
+                "correct_answer": options.index(answer),
+                "standard": f"STUB.MATH.{i % 3 + 1}"
+            })
+        return json.dumps(questions)
+
+
+PROVIDERS = {
+    GeminiProvider.name: GeminiProvider,
+    StubProvider.name: StubProvider,
+}
+
+
+def get_llm_provider(backend: str, **kwargs) -> LlmProvider:
+    if backend not in PROVIDERS:
+        raise ValueError(f"Unknown LLM backend '{backend}', expected one of {sorted(PROVIDERS)}")
+    return PROVIDERS[backend](**kwargs)
@@ -0,0 +1,469 @@
+"""Offline data migrations.
+
+Usage:
+    python migrations.py rosters [--clear-embedded] [--batch-size N]
+    python migrations.py question-signatures
+    python migrations.py question-bank
+    python migrations.py item-stats
+    python migrations.py pack-answers [--unpack] [--batch-size N]
+    python migrations.py datetimes [--batch-size N]
+    python migrations.py org-rollups [--batch-size N]
+    python migrations.py class-codes
+    python migrations.py emails
+    python migrations.py assignments
+"""
+import argparse
+import os
+import random
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from pymongo import MongoClient, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from answer_packing import decode_submission, pack_answers
+from item_analysis import item_increments
+from question_similarity import lsh_bands, minhash
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+
+def get_db():
+    client = MongoClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    return client[os.environ.get('DB_NAME', 'test_database')]
+
+
+def migrate_rosters(db, batch_size=1000, clear_embedded=False):
+    """Copy embedded Class.student_ids arrays into the enrollments collection.
+
+    Safe to re-run: enrollments are upserted on (class_id, student_id).
+    Run it before switching the API to ROSTER_STORAGE=collection, and again
+    right after the switch to pick up students who joined in between.
+    Only clear the embedded arrays once the API is running in collection mode.
+    """
+    db.enrollments.create_index([("class_id", 1), ("student_id", 1)], unique=True)
+    db.enrollments.create_index("student_id")
+
+    classes_migrated = 0
+    enrollments_upserted = 0
+    enrolled_at = datetime.now(timezone.utc)
+    for cls in db.classes.find({"student_ids.0": {"$exists": True}}, {"_id": 0, "id": 1, "student_ids": 1}):
+        ops = [
+            UpdateOne(
+                {"class_id": cls["id"], "student_id": student_id},
+                {"$setOnInsert": {"enrolled_at": enrolled_at}},
+                upsert=True
+            )
+            for student_id in cls["student_ids"]
+        ]
+        for i in range(0, len(ops), batch_size):
+            result = db.enrollments.bulk_write(ops[i:i + batch_size], ordered=False)
+            enrollments_upserted += result.upserted_count
+
+        if clear_embedded:
+            db.classes.update_one({"id": cls["id"]}, {"$set": {"student_ids": []}})
+        classes_migrated += 1
+
+    print(f"Migrated {classes_migrated} classes, {enrollments_upserted} new enrollments")
+
+
+def migrate_question_signatures(db, batch_size=1000):
+    """Compute near-duplicate signatures for questions created before de-duplication existed."""
+    db.question_signatures.create_index([("teacher_id", 1), ("bands", 1)])
+    db.question_signatures.create_index("question_id", unique=True)
+    db.question_signatures.create_index("test_id")
+
+    upserted = 0
+    ops = []
+    for test in db.tests.find({}, {"_id": 0, "id": 1, "teacher_id": 1, "questions": 1}):
+        for question in test.get("questions", []):
+            signature = minhash(question)
+            ops.append(UpdateOne(
+                {"question_id": question["id"]},
+                {"$setOnInsert": {
+                    "teacher_id": test["teacher_id"],
+                    "test_id": test["id"],
+                    "minhash": signature,
+                    "bands": lsh_bands(signature)
+                }},
+                upsert=True
+            ))
+            if len(ops) >= batch_size:
+                upserted += db.question_signatures.bulk_write(ops, ordered=False).upserted_count
+                ops = []
+    if ops:
+        upserted += db.question_signatures.bulk_write(ops, ordered=False).upserted_count
+
+    print(f"Added signatures for {upserted} questions")
+
+
+def migrate_question_bank(db, batch_size=1000):
+    """Populate the question bank from questions in existing tests."""
+    db.question_bank.create_index("id", unique=True)
+    db.question_bank.create_index([("teacher_id", 1), ("standard", 1)])
+    db.question_bank.create_index([("teacher_id", 1), ("grade_level", 1)])
+    db.question_bank.create_index([("teacher_id", 1), ("question_text", "text")])
+
+    upserted = 0
+    ops = []
+    for test in db.tests.find({}, {"_id": 0}):
+        for question in test.get("questions", []):
+            ops.append(UpdateOne(
+                {"id": question["id"]},
+                {"$setOnInsert": {
+                    "teacher_id": test["teacher_id"],
+                    "question_text": question["question_text"],
+                    "options": question["options"],
+                    "correct_answer": question["correct_answer"],
+                    "standard": question["standard"],
+                    "grade_level": test.get("grade_level"),
+                    "state_standards": test.get("state_standards"),
+                    "source_test_id": test["id"],
+                    "created_at": test.get("created_at", datetime.now(timezone.utc))
+                }},
+                upsert=True
+            ))
+            if len(ops) >= batch_size:
+                upserted += db.question_bank.bulk_write(ops, ordered=False).upserted_count
+                ops = []
+    if ops:
+        upserted += db.question_bank.bulk_write(ops, ordered=False).upserted_count
+
+    print(f"Added {upserted} questions to the bank")
+
+
+def migrate_item_stats(db):
+    """Rebuild per-question item analysis counters from existing submissions.
+
+    Counters for each test are accumulated in memory (one entry per
+    question) and replace whatever is stored. Run it while submissions are
+    quiet, or re-run it afterwards, since live $inc updates that land
+    between the scan and the write are overwritten.
+    """
+    db.item_stats.create_index([("test_id", 1), ("question_id", 1)], unique=True)
+
+    tests_rebuilt = 0
+    for test in db.tests.find({}, {"_id": 0, "id": 1, "teacher_id": 1, "questions": 1, "answer_slots": 1}):
+        questions = test.get("questions", [])
+        totals = {}
+        for sub in db.submissions.find({"test_id": test["id"]}, {"_id": 0, "answers": 1, "answers_packed": 1}):
+            decode_submission(sub, test.get("answer_slots", []))
+            selected = {a["question_id"]: a["selected_answer"] for a in sub.get("answers", [])}
+            for question_id, inc in item_increments(questions, selected).items():
+                counters = totals.setdefault(question_id, {})
+                for field, value in inc.items():
+                    counters[field] = counters.get(field, 0) + value
+        if not totals:
+            continue
+
+        ops = []
+        for question_id, counters in totals.items():
+            doc = {"test_id": test["id"], "question_id": question_id, "teacher_id": test["teacher_id"], "choice_counts": {}}
+            for field, value in counters.items():
+                if field.startswith("choice_counts."):
+                    doc["choice_counts"][field.split(".", 1)[1]] = value
+                else:
+                    doc[field] = value
+            ops.append(ReplaceOne({"test_id": test["id"], "question_id": question_id}, doc, upsert=True))
+        db.item_stats.bulk_write(ops, ordered=False)
+        tests_rebuilt += 1
+
+    print(f"Rebuilt item statistics for {tests_rebuilt} tests")
+
+
+def migrate_pack_answers(db, batch_size=1000, unpack=False):
+    """Convert stored submission answers to the packed encoding, or back with unpack=True.
+
+    Slots are added for every question id a test's submissions reference,
+    including questions deleted since, so packing loses nothing. Set
+    SUBMISSION_ANSWER_ENCODING to match once the run finishes; the API
+    reads both encodings either way.
+    """
+    converted = 0
+    for test in db.tests.find({}, {"_id": 0, "id": 1, "questions": 1, "answer_slots": 1}):
+        source = {"answers_packed": {"$exists": True}} if unpack else {"answers": {"$exists": True}}
+        query = {"test_id": test["id"], **source}
+        if not unpack:
+            referenced = [q["id"] for q in test.get("questions", [])]
+            referenced += db.submissions.distinct("answers.question_id", query)
+            existing = set(test.get("answer_slots", []))
+            missing = [qid for qid in dict.fromkeys(referenced) if qid not in existing]
+            if missing:
+                test = db.tests.find_one_and_update(
+                    {"id": test["id"]},
+                    {"$addToSet": {"answer_slots": {"$each": missing}}},
+                    projection={"_id": 0, "id": 1, "answer_slots": 1},
+                    return_document=ReturnDocument.AFTER
+                )
+        slots = test.get("answer_slots", [])
+
+        ops = []
+        for sub in db.submissions.find(query, {"answers": 1, "answers_packed": 1}):
+            if unpack:
+                update = {"$set": {"answers": decode_submission(sub, slots)["answers"]}, "$unset": {"answers_packed": ""}}
+            else:
+                update = {"$set": {"answers_packed": pack_answers(slots, sub["answers"])}, "$unset": {"answers": ""}}
+            ops.append(UpdateOne({"_id": sub["_id"]}, update))
+            if len(ops) >= batch_size:
+                converted += db.submissions.bulk_write(ops, ordered=False).modified_count
+                ops = []
+        if ops:
+            converted += db.submissions.bulk_write(ops, ordered=False).modified_count
+
+    print(f"{'Unpacked' if unpack else 'Packed'} answers in {converted} submissions")
+
+
+# Timestamp fields that older code stored as ISO strings
+DATETIME_FIELDS = {
+    "users": ["created_at"],
+    "user_sessions": ["expires_at", "created_at"],
+    "tests": ["created_at"],
+    "classes": ["created_at"],
+    "assignments": ["created_at"],
+    "submissions": ["submitted_at"],
+    "enrollments": ["enrolled_at"],
+    "question_bank": ["created_at"],
+    "student_summaries": ["updated_at"],
+    "request_profiles": ["created_at"]
+}
+
+
+def migrate_datetimes(db, batch_size=1000):
+    """Convert ISO string timestamps to BSON dates.
+
+    The API reads both forms, so this can run while it is serving; time
+    range filters and session TTL expiry only see converted documents.
+    Safe to re-run: only string values are touched.
+    """
+    for collection, fields in DATETIME_FIELDS.items():
+        for field in fields:
+            converted = 0
+            ops = []
+            for doc in db[collection].find({field: {"$type": "string"}}, {field: 1}):
+                value = datetime.fromisoformat(doc[field])
+                if value.tzinfo is None:
+                    value = value.replace(tzinfo=timezone.utc)
+                # Match on the old value so a concurrent rewrite is not clobbered
+                ops.append(UpdateOne({"_id": doc["_id"], field: doc[field]}, {"$set": {field: value}}))
+                if len(ops) >= batch_size:
+                    converted += db[collection].bulk_write(ops, ordered=False).modified_count
+                    ops = []
+            if ops:
+                converted += db[collection].bulk_write(ops, ordered=False).modified_count
+            if converted:
+                print(f"{collection}.{field}: converted {converted}")
+
+
+def migrate_org_rollups(db, batch_size=1000):
+    """Recompute the org rollup cubes from all submissions.
+
+    This is the compaction job for the incrementally maintained cubes: it
+    folds in history from before a teacher joined a school, corrects any
+    drift from moves that raced with submissions, and drops empty cells.
+    Each teacher's cells are computed by one $group. Submissions recorded
+    while it runs may be missed, so schedule it for a quiet period.
+    """
+    db.org_rollups.create_index([("org_unit_id", 1), ("day", 1), ("standard", 1)], unique=True)
+    day_of_submission = {"$cond": [
+        {"$eq": [{"$type": "$submitted_at"}, "string"]},
+        {"$substrBytes": ["$submitted_at", 0, 10]},
+        {"$dateToString": {"format": "%Y-%m-%d", "date": "$submitted_at"}}
+    ]}
+
+    cells = {}
+    for teacher in db.users.find({"role": "teacher"}, {"_id": 0, "id": 1, "org_path": 1}):
+        # Submissions find their rollup units on the test
+        db.tests.update_many({"teacher_id": teacher["id"]}, {"$set": {"org_path": teacher.get("org_path", [])}})
+        test_ids = [t["id"] for t in db.tests.find({"teacher_id": teacher["id"]}, {"_id": 0, "id": 1})]
+        if not test_ids:
+            continue
+        pipeline = [
+            {"$match": {"test_id": {"$in": test_ids}}},
+            {"$project": {"day": day_of_submission, "score": 1, "breakdown": {"$objectToArray": "$standards_breakdown"}}},
+            {"$facet": {
+                "totals": [{"$group": {"_id": "$day", "submissions": {"$sum": 1}, "score_sum": {"$sum": "$score"}}}],
+                "standards": [
+                    {"$unwind": "$breakdown"},
+                    {"$group": {
+                        "_id": {"standard": "$breakdown.k", "day": "$day"},
+                        "correct": {"$sum": "$breakdown.v.correct"},
+                        "total": {"$sum": "$breakdown.v.total"},
+                        "percentage_sum": {"$sum": "$breakdown.v.percentage"},
+                        "submissions": {"$sum": 1}
+                    }}
+                ]
+            }}
+        ]
+        result = next(db.submissions.aggregate(pipeline))
+        rows = [(None, row.pop("_id"), row) for row in result["totals"]]
+        for row in result["standards"]:
+            key = row.pop("_id")
+            rows.append((key["standard"], key["day"], row))
+        for unit in teacher.get("org_path", []) + [teacher["id"]]:
+            for standard, day, sums in rows:
+                cell = cells.setdefault((unit, standard, day), {})
+                for field, value in sums.items():
+                    cell[field] = cell.get(field, 0) + value
+
+    # Replace cells in place, then drop any this run did not produce
+    compacted_at = datetime.now(timezone.utc)
+    ops = []
+    for (unit, standard, day), sums in cells.items():
+        key = {"org_unit_id": unit, "standard": standard, "day": day}
+        ops.append(ReplaceOne(key, {**key, **sums, "compacted_at": compacted_at}, upsert=True))
+        if len(ops) >= batch_size:
+            db.org_rollups.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        db.org_rollups.bulk_write(ops, ordered=False)
+    removed = db.org_rollups.delete_many({"compacted_at": {"$ne": compacted_at}}).deleted_count
+
+    print(f"Rebuilt {len(cells)} rollup cells, removed {removed} stale ones")
+
+
+# Same alphabet the API draws class codes from
+CLASS_CODE_ALPHABET = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+
+
+def migrate_class_codes(db):
+    """Give classes sharing a code new codes, then make the class_code index unique.
+
+    The oldest class in each group keeps the code students already have;
+    the others are printed so their teachers can hand out the new one.
+    The API keeps the old index and logs a warning until this has run.
+    """
+    duplicates = db.classes.aggregate([
+        {"$group": {"_id": "$class_code", "classes": {"$push": {"_id": "$_id", "id": "$id", "teacher_id": "$teacher_id", "created_at": "$created_at"}}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True)
+
+    reassigned = 0
+    for group in duplicates:
+        code = group["_id"]
+        later = sorted(group["classes"], key=lambda c: str(c.get("created_at")))[1:]
+        for cls in later:
+            while True:
+                new_code = ''.join(random.choices(CLASS_CODE_ALPHABET, k=len(code)))
+                if not db.classes.find_one({"class_code": new_code}, {"_id": 1}):
+                    break
+            result = db.classes.update_one({"_id": cls["_id"], "class_code": code}, {"$set": {"class_code": new_code}})
+            if result.modified_count:
+                reassigned += 1
+                print(f"class {cls['id']} (teacher {cls['teacher_id']}): {code} -> {new_code}")
+
+    index = db.classes.index_information().get("class_code_1")
+    if index and not index.get("unique"):
+        db.classes.drop_index("class_code_1")
+    db.classes.create_index("class_code", unique=True)
+    print(f"Reassigned {reassigned} duplicate class codes; class_code is now unique")
+
+
+def migrate_emails(db):
+    """Lowercase and trim user emails, the form logins and roster imports look up.
+
+    Accounts whose emails differ only by case are left untouched and listed,
+    to be merged by hand. Safe to re-run.
+    """
+    normalized = conflicts = 0
+    for user in db.users.find({"email": {"$regex": r"[A-Z]|^\s|\s$"}}, {"_id": 1, "id": 1, "email": 1}):
+        email = user["email"].strip().lower()
+        try:
+            # The unique index may not exist yet if duplicates predate it, so check explicitly too
+            if db.users.find_one({"email": email, "_id": {"$ne": user["_id"]}}, {"_id": 1}):
+                raise DuplicateKeyError(email)
+            db.users.update_one({"_id": user["_id"]}, {"$set": {"email": email}})
+            normalized += 1
+        except DuplicateKeyError:
+            conflicts += 1
+            print(f"user {user['id']}: {user['email']} collides with another account for {email}")
+
+    print(f"Normalized {normalized} emails, {conflicts} conflicts left to merge")
+
+
+def migrate_assignments(db):
+    """Merge assignments sharing a test_id, then make the test_id index unique.
+
+    The oldest assignment keeps its id and window and gains the class ids
+    of the others, which are removed. Safe to re-run.
+    """
+    duplicates = db.assignments.aggregate([
+        {"$sort": {"created_at": 1}},
+        {"$group": {"_id": "$test_id", "assignments": {"$push": {"_id": "$_id", "class_ids": "$class_ids"}}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True)
+
+    merged = removed = 0
+    for group in duplicates:
+        keep, *others = group["assignments"]
+        class_ids = [cid for a in others for cid in a.get("class_ids") or []]
+        db.assignments.update_one({"_id": keep["_id"]}, {"$addToSet": {"class_ids": {"$each": class_ids}}})
+        removed += db.assignments.delete_many({"_id": {"$in": [a["_id"] for a in others]}}).deleted_count
+        merged += 1
+
+    index = db.assignments.index_information().get("test_id_1")
+    if index and not index.get("unique"):
+        db.assignments.drop_index("test_id_1")
+    db.assignments.create_index("test_id", unique=True)
+    print(f"Merged {removed} duplicate assignments into {merged}; assignments.test_id is now unique")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quiz app data migrations")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rosters = subparsers.add_parser("rosters", help="Move embedded class rosters into the enrollments collection")
+    rosters.add_argument("--batch-size", type=int, default=1000)
+    rosters.add_argument("--clear-embedded", action="store_true", help="Empty Class.student_ids after copying")
+
+    signatures = subparsers.add_parser("question-signatures", help="Backfill near-duplicate signatures for existing questions")
+    signatures.add_argument("--batch-size", type=int, default=1000)
+
+    bank = subparsers.add_parser("question-bank", help="Populate the question bank from existing tests")
+    bank.add_argument("--batch-size", type=int, default=1000)
+
+    subparsers.add_parser("item-stats", help="Rebuild per-question item analysis counters from submissions")
+
+    pack = subparsers.add_parser("pack-answers", help="Store submission answers as one byte per question")
+    pack.add_argument("--batch-size", type=int, default=1000)
+    pack.add_argument("--unpack", action="store_true", help="Convert packed answers back to the expanded list")
+
+    datetimes = subparsers.add_parser("datetimes", help="Convert ISO string timestamps to native dates")
+    datetimes.add_argument("--batch-size", type=int, default=1000)
+
+    rollups = subparsers.add_parser("org-rollups", help="Recompute school/district rollup cubes from submissions")
+    rollups.add_argument("--batch-size", type=int, default=1000)
+
+    subparsers.add_parser("class-codes", help="Reassign duplicate class codes and make class_code unique")
+
+    subparsers.add_parser("emails", help="Lowercase user emails to match how the API looks them up")
+
+    subparsers.add_parser("assignments", help="Merge duplicate assignments of a test and make test_id unique")
+
+    args = parser.parse_args()
+    db = get_db()
+    if args.command == "rosters":
+        migrate_rosters(db, batch_size=args.batch_size, clear_embedded=args.clear_embedded)
+    elif args.command == "question-signatures":
+        migrate_question_signatures(db, batch_size=args.batch_size)
+    elif args.command == "question-bank":
+        migrate_question_bank(db, batch_size=args.batch_size)
+    elif args.command == "item-stats":
+        migrate_item_stats(db)
+    elif args.command == "pack-answers":
+        migrate_pack_answers(db, batch_size=args.batch_size, unpack=args.unpack)
+    elif args.command == "datetimes":
+        migrate_datetimes(db, batch_size=args.batch_size)
+    elif args.command == "org-rollups":
+        migrate_org_rollups(db, batch_size=args.batch_size)
+    elif args.command == "class-codes":
+        migrate_class_codes(db)
+    elif args.command == "emails":
+        migrate_emails(db)
+    elif args.command == "assignments":
+        migrate_assignments(db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Question generation service.
+
+Owns prompt assembly, response parsing and the operational policy around
+the LLM backend: a per-backend concurrency limit, per-call timeouts,
+retries with backoff, and batching of concurrent small generate-more
+requests for the same test into a single model call.
+"""
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from llm_providers import LlmProvider
+
+logger = logging.getLogger(__name__)
+
+QUESTION_SYSTEM_MESSAGE = "You are an expert educational content creator. Generate high-quality multiple choice questions based on the provided resources."
+
+
+def build_test_prompt(num_questions: int, resource_description: str, grade_level: Optional[str] = None,
+                      state_standards: Optional[str] = None, standards: Optional[str] = None) -> str:
+    # Build context for standards
+    standards_context = []
+    if grade_level:
+        standards_context.append(f"Grade Level: {grade_level}")
+    if state_standards:
+        standards_context.append(f"State Standards: {state_standards}")
+    if standards:
+        standards_context.append(f"Specific Standards: {standards}")
+
+    standards_text = "\n".join(standards_context) if standards_context else "Use appropriate educational standards"
+
+    return f"""Create {num_questions} multiple choice questions based on the following resource:
+
+Resource Description: {resource_description}
+
+{standards_text}
+
+IMPORTANT: 
+- Questions should be appropriate for {grade_level if grade_level else 'the appropriate grade level'}
+- Use {state_standards if state_standards else 'Common Core'} standard codes
+- Ensure questions align with the specified standards
+
+For each question:
+1. Write a clear, grade-appropriate question
+2. Provide exactly 4 answer options
+3. Indicate which option is correct (0-3)
+4. Tag with the specific standard code (e.g., CCSS.Math.3.OA.A.1)
+
+Return ONLY a valid JSON array with this exact structure:
+[
+  {{
+    "question_text": "Question here?",
+    "options": ["Option A", "Option B", "Option C", "Option D"],
+    "correct_answer": 0,
+    "standard": "Full standard code with grade level"
+  }}
+]
+
+Do not include any markdown formatting or explanatory text, just the JSON array."""
+
+
+def build_more_prompt(num_questions: int, test: Dict[str, Any]) -> str:
+    # Get existing standards
+    existing_standards = list(set([q["standard"] for q in test["questions"]]))
+    standards_text = ", ".join(existing_standards) if existing_standards else "relevant educational standards"
+
+    return f"""Create {num_questions} NEW multiple choice questions based on the following resource:
+
+Resource Description: {test["resource_description"]}
+Standards to cover: {standards_text}
+
+IMPORTANT: Generate questions that are DIFFERENT from these existing topics that are already covered in the test.
+
+For each question:
+1. Write a clear, appropriate-level question
+2. Provide exactly 4 answer options
+3. Indicate which option is correct (0-3)
+4. Tag with the relevant standard
+
+Return ONLY a valid JSON array with this exact structure:
+[
+  {{
+    "question_text": "Question here?",
+    "options": ["Option A", "Option B", "Option C", "Option D"],
+    "correct_answer": 0,
+    "standard": "Standard code"
+  }}
+]
+
+Do not include any markdown formatting or explanatory text, just the JSON array."""
+
+
+def parse_questions(response: str) -> List[Dict[str, Any]]:
+    response_text = response.strip()
+    # Remove markdown code blocks if present
+    if response_text.startswith('```'):
+        response_text = response_text.split('```')[1]
+        if response_text.startswith('json'):
+            response_text = response_text[4:]
+    response_text = response_text.strip()
+
+    try:
+        questions = json.loads(response_text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Failed to parse AI response: {str(e)}. Response: {response_text[:200]}")
+    if not isinstance(questions, list):
+        raise ValueError(f"Failed to parse AI response: expected a JSON array. Response: {response_text[:200]}")
+    return questions
+
+
+class _MoreBatch:
+    def __init__(self):
+        self.requests = []  # (num_questions, future)
+
+    @property
+    def total(self) -> int:
+        return sum(n for n, _ in self.requests)
+
+
+class QuestionGenerator:
+    def __init__(self, provider: LlmProvider, max_concurrency: Optional[int] = None, timeout: float = 90,
+                 max_retries: int = 2, retry_backoff: float = 1.0, batch_window_ms: float = 50,
+                 max_batch_questions: int = 20):
+        self.provider = provider
+        self.max_concurrency = max_concurrency or provider.default_max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_questions = max_batch_questions
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._batches: Dict[str, _MoreBatch] = {}
+        # The event loop only keeps weak references to tasks
+        self._flush_tasks = set()
+
+    async def _generate(self, prompt: str, session_prefix: str, file_path: Optional[str] = None,
+                        mime_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """One model call with concurrency limit, timeout and retries; returns parsed question dicts"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    response = await asyncio.wait_for(
+                        self.provider.complete(
+                            prompt,
+                            system_message=QUESTION_SYSTEM_MESSAGE,
+                            session_prefix=session_prefix,
+                            file_path=file_path,
+                            mime_type=mime_type
+                        ),
+                        timeout=self.timeout
+                    )
+                return parse_questions(response)
+            except asyncio.TimeoutError:
+                error = TimeoutError(f"{self.provider.name} did not respond within {self.timeout:.0f}s")
+            except Exception as e:
+                error = e
+            if attempt == self.max_retries:
+                raise error
+            logger.warning(f"Question generation attempt {attempt + 1} failed, retrying: {str(error)}")
+            await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+
+    async def generate_test(self, num_questions: int, resource_description: str, grade_level: Optional[str] = None,
+                            state_standards: Optional[str] = None, standards: Optional[str] = None,
+                            file_path: Optional[str] = None, mime_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        prompt = build_test_prompt(num_questions, resource_description, grade_level, state_standards, standards)
+        return await self._generate(prompt, "test-gen", file_path, mime_type)
+
+    async def generate_more(self, test: Dict[str, Any], num_questions: int, file_path: Optional[str] = None,
+                            mime_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        # Requests with an attachment or a large count go straight to the model
+        if file_path or num_questions >= self.max_batch_questions or self.batch_window <= 0:
+            return await self._generate(build_more_prompt(num_questions, test), "test-gen-more", file_path, mime_type)
+
+        batch = self._batches.get(test["id"])
+        if batch is None or batch.total + num_questions > self.max_batch_questions:
+            batch = _MoreBatch()
+            self._batches[test["id"]] = batch
+            task = asyncio.create_task(self._flush_batch(test, batch))
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+
+        future = asyncio.get_running_loop().create_future()
+        batch.requests.append((num_questions, future))
+        return await future
+
+    async def _flush_batch(self, test: Dict[str, Any], batch: _MoreBatch):
+        """Wait for the batch window, then serve every queued request from one model call"""
+        await asyncio.sleep(self.batch_window)
+        if self._batches.get(test["id"]) is batch:
+            del self._batches[test["id"]]
+
+        try:
+            questions = await self._generate(build_more_prompt(batch.total, test), "test-gen-more")
+        except Exception as e:
+            for _, future in batch.requests:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Fill requests in arrival order; those the model's reply does not fully cover fail
+        offset = 0
+        for num_questions, future in batch.requests:
+            if future.done():
+                continue
+            if offset + num_questions <= len(questions):
+                future.set_result(questions[offset:offset + num_questions])
+            else:
+                future.set_exception(ValueError(
+                    f"{self.provider.name} returned {len(questions)} of the {batch.total} questions requested"
+                ))
+            offset += num_questions
@@ -0,0 +1,91 @@
+"""Near-duplicate detection for questions using MinHash and LSH banding.
+
+A question's signature is the MinHash of the character shingles of its
+normalized text plus its options, so two questions only collide when
+both the stem and the answer choices are nearly the same. Signatures are
+split into bands; questions that share any band hash are candidates, and
+candidates are confirmed by the estimated Jaccard similarity. Lookups
+therefore touch only the handful of questions that share a band instead
+of the whole bank.
+"""
+import hashlib
+import re
+from typing import Any, Dict, Iterable, List, Set
+
+import numpy as np
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+DUPLICATE_THRESHOLD = 0.8
+
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+
+
+def normalize(text: str) -> str:
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def question_text_for_signature(question: Dict[str, Any]) -> str:
+    options = " | ".join(sorted(normalize(o) for o in question.get("options", [])))
+    return f"{normalize(question['question_text'])} || {options}"
+
+
+def _shingle_hashes(text: str) -> np.ndarray:
+    if len(text) <= SHINGLE_SIZE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "little") for s in shingles],
+        dtype=np.uint64
+    )
+
+
+def minhash(question: Dict[str, Any]) -> List[int]:
+    hashes = _shingle_hashes(question_text_for_signature(question))
+    # (a * x + b) mod p for every permutation and shingle; products stay below 2**64
+    permuted = (np.outer(_A, hashes) + _B[:, None]) % _PRIME
+    return permuted.min(axis=1).tolist()
+
+
+def lsh_bands(signature: List[int]) -> List[int]:
+    """One 63-bit hash per band, tagged with the band index so bands never collide with each other"""
+    bands = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(f"{band}:{rows}".encode(), digest_size=8).digest()
+        bands.append(int.from_bytes(digest, "little") >> 1)
+    return bands
+
+
+def similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures"""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_PERM
+
+
+class SimilarityIndex:
+    """In-memory LSH index of signatures keyed by an arbitrary id"""
+
+    def __init__(self):
+        self.signatures: Dict[Any, List[int]] = {}
+        self.buckets: Dict[int, Set[Any]] = {}
+
+    def add(self, key: Any, signature: List[int], bands: Iterable[int] = None):
+        self.signatures[key] = signature
+        for band in bands if bands is not None else lsh_bands(signature):
+            self.buckets.setdefault(band, set()).add(key)
+
+    def find_similar(self, signature: List[int], threshold: float = DUPLICATE_THRESHOLD, bands: Iterable[int] = None) -> List[Any]:
+        candidates = set()
+        for band in bands if bands is not None else lsh_bands(signature):
+            candidates |= self.buckets.get(band, set())
+        return [key for key in candidates if similarity(signature, self.signatures[key]) >= threshold]
+
+    def __len__(self):
+        return len(self.signatures)
@@ -0,0 +1,110 @@
+"""Incremental parsing of class roster uploads.
+
+Rosters arrive as CSV (with an `email` column and optional `name`) or as
+JSON: either a top-level array of objects or one object per line. Both
+are read from the upload's file object in fixed-size chunks and yielded
+row by row, so a district-sized file never has to be held in memory.
+"""
+import codecs
+import csv
+import json
+import re
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+CHUNK_SIZE = 64 * 1024
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+JSON_FORMATS = (".json", ".ndjson", ".jsonl")
+_JSON_SEPARATORS = re.compile(r"[\s,\[\]]*")
+
+
+class RosterParseError(ValueError):
+    def __init__(self, row: int, message: str):
+        super().__init__(f"Could not parse roster at row {row}: {message}")
+        self.row = row
+
+
+def iter_text(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Decode a binary stream chunk by chunk as UTF-8, dropping a leading BOM"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    while True:
+        chunk = stream.read(chunk_size)
+        text = decoder.decode(chunk, final=not chunk)
+        if text:
+            yield text
+        if not chunk:
+            return
+
+
+def iter_lines(chunks: Iterator[str]) -> Iterator[str]:
+    """Split decoded chunks into lines at newlines only, keeping line endings for the csv module.
+
+    str.splitlines would also break at form feeds, vertical tabs and the
+    Unicode line separators, which can appear inside field values.
+    """
+    pending = ""
+    for chunk in chunks:
+        *lines, pending = (pending + chunk).split("\n")
+        for line in lines:
+            yield line + "\n"
+    if pending:
+        yield pending
+
+
+def iter_json_records(chunks: Iterator[str]) -> Iterator[Any]:
+    """Yield the objects of a JSON array or newline-delimited JSON document"""
+    decoder = json.JSONDecoder()
+    buffer, position, eof = "", 0, False
+    while True:
+        position = _JSON_SEPARATORS.match(buffer, position).end()
+        if position < len(buffer):
+            try:
+                record, position = decoder.raw_decode(buffer, position)
+                yield record
+                continue
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+        elif eof:
+            return
+        # The next value is incomplete: drop what was consumed and read more
+        chunk = next(chunks, None)
+        buffer, position = buffer[position:] + (chunk or ""), 0
+        eof = chunk is None
+
+
+def iter_roster_rows(stream: BinaryIO, filename: Optional[str], content_type: Optional[str],
+                     chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield (row number, record) pairs with lowercased keys.
+
+    Row numbers are what a teacher sees in their file: CSV rows count the
+    header as row 1, JSON records count from 1.
+    """
+    chunks = iter_text(stream, chunk_size)
+    is_json = (filename or "").lower().endswith(JSON_FORMATS) or "json" in (content_type or "")
+    row = 0
+    try:
+        if is_json:
+            for row, record in enumerate(iter_json_records(chunks), start=1):
+                if not isinstance(record, dict):
+                    raise RosterParseError(row, "expected an object")
+                yield row, {str(k).strip().lower(): v for k, v in record.items()}
+        else:
+            reader = csv.DictReader(iter_lines(chunks))
+            for row, record in enumerate(reader, start=2):
+                yield row, {k.strip().lower(): v for k, v in record.items() if k}
+    except (ValueError, csv.Error) as e:
+        # JSONDecodeError and UnicodeDecodeError are both ValueErrors
+        if isinstance(e, RosterParseError):
+            raise
+        raise RosterParseError(row + 1, str(e)) from e
+
+
+def normalize_roster_row(record: Dict[str, Any]) -> Tuple[str, Optional[str], Optional[str]]:
+    """Return (email, name, error) for one parsed row"""
+    email = str(record.get("email") or "").strip().lower()
+    name = str(record.get("name") or "").strip() or None
+    if not email:
+        return email, name, "missing email"
+    if not EMAIL_PATTERN.match(email):
+        return email, name, "invalid email"
+    return email, name, None
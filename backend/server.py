@@ -1,8 +1,11 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Request, Response, Depends
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Request, Response, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 import os
 import logging
 from pathlib import Path
@@ -12,16 +15,35 @@ import uuid
 from datetime import datetime, timezone, timedelta
 import random
 import json
-from emergentintegrations.llm.chat import LlmChat, UserMessage, FileContentWithMimeType
-import aiohttp
+import csv
+import io
+import zlib
+import math
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from llm_providers import get_llm_provider
+from question_generation import QuestionGenerator
+from item_analysis import item_increments, summarize_item
+from answer_packing import decode_submission, pack_answers
+from roster_import import RosterParseError, iter_roster_rows, normalize_roster_row
+from data_access import DataAccess, routes_from_env
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ.get('DB_NAME', 'test_database')]
+# tz_aware: stored dates come back as UTC-aware datetimes, comparable with datetime.now(timezone.utc)
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
+# Heavy analytics/report reads prefer secondaries (see data_access.py); everything else reads the primary
+data_access = DataAccess(client, os.environ.get('DB_NAME', 'test_database'), routes_from_env(os.environ))
+db = data_access.primary
+analytics_db = data_access["analytics"]
+reports_db = data_access["reports"]
 
 # Create the main app without a prefix
 app = FastAPI()
@@ -32,6 +54,75 @@ api_router = APIRouter(prefix="/api")
 # Get LLM key
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY', '')
 
+# Question generation backend: "gemini" or "stub" (local, deterministic)
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'gemini')
+LLM_PROVIDER_OPTIONS = {
+    "gemini": {"api_key": EMERGENT_LLM_KEY},
+    "stub": {"latency_ms": float(os.environ.get('STUB_LLM_LATENCY_MS', '0'))},
+}
+
+# Providers import their SDK lazily, on the first generation request
+question_generator = QuestionGenerator(
+    get_llm_provider(LLM_BACKEND, **LLM_PROVIDER_OPTIONS.get(LLM_BACKEND, {})),
+    max_concurrency=int(os.environ.get('LLM_MAX_CONCURRENCY', '0')) or None,
+    timeout=float(os.environ.get('LLM_TIMEOUT_SECONDS', '90')),
+    max_retries=int(os.environ.get('LLM_MAX_RETRIES', '2')),
+    batch_window_ms=float(os.environ.get('GENERATE_MORE_BATCH_WINDOW_MS', '50'))
+)
+
+# Admission control for generation endpoints
+GENERATION_RATE_PER_MINUTE = float(os.environ.get('GENERATION_RATE_PER_MINUTE', '6'))  # per teacher
+GENERATION_BURST = int(os.environ.get('GENERATION_BURST', '3'))
+GENERATION_MAX_CONCURRENT = int(os.environ.get('GENERATION_MAX_CONCURRENT', '8'))  # across all teachers
+GENERATION_MAX_QUEUE = int(os.environ.get('GENERATION_MAX_QUEUE', '16'))
+GENERATION_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('GENERATION_QUEUE_TIMEOUT_SECONDS', '30'))
+GENERATION_RETRY_AFTER_SECONDS = 5
+
+# Autosaves arriving within this window share one bulk_write; each is acknowledged once written
+AUTOSAVE_BATCH_WINDOW_MS = float(os.environ.get('AUTOSAVE_BATCH_WINDOW_MS', '25'))
+# Unsubmitted attempts are removed this long after their last activity
+ATTEMPT_TTL_SECONDS = 24 * 60 * 60
+
+# Forecasts are invalidated in-process on new submissions; the TTL bounds staleness across workers
+FORECAST_CACHE_TTL_SECONDS = float(os.environ.get('FORECAST_CACHE_TTL_SECONDS', '300'))
+
+# 'packed' stores new submissions' answers as one byte per question (see answer_packing.py)
+SUBMISSION_ANSWER_ENCODING = os.environ.get('SUBMISSION_ANSWER_ENCODING', 'expanded')
+
+# Dependents of deleted tests/classes are removed in the background, this many _ids per delete_many
+CLEANUP_BATCH_SIZE = int(os.environ.get('CLEANUP_BATCH_SIZE', '500'))
+CLEANUP_BATCH_PAUSE_MS = float(os.environ.get('CLEANUP_BATCH_PAUSE_MS', '50'))
+CLEANUP_POLL_SECONDS = float(os.environ.get('CLEANUP_POLL_SECONDS', '30'))
+CLEANUP_LEASE_SECONDS = 300
+
+# Standards timelines are bucketed and then downsampled to at most this many points per standard
+DEFAULT_TIMELINE_POINTS = int(os.environ.get('DEFAULT_TIMELINE_POINTS', '120'))
+MAX_TIMELINE_POINTS = 1000
+
+# Tests assembled from the question bank hold at most this many questions
+MAX_ASSEMBLED_QUESTIONS = 200
+
+# Profiling configuration
+ADMIN_EMAILS = {e.strip().lower() for e in os.environ.get('ADMIN_EMAILS', '').split(',') if e.strip()}
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', '5'))
+SLOW_REQUEST_THRESHOLD_MS = float(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', '0'))  # 0 disables slow capture
+
+# Roster storage: "embedded" keeps Class.student_ids, "collection" uses the enrollments collection
+ROSTER_STORAGE = os.environ.get('ROSTER_STORAGE', 'embedded')
+USE_ENROLLMENTS = ROSTER_STORAGE == 'collection'
+ROSTER_PAGE_SIZE = 500
+MAX_ROSTER_PAGE_SIZE = 1000
+
+# Roster imports upsert users this many rows per bulk_write
+ROSTER_IMPORT_BATCH_SIZE = 500
+ROSTER_IMPORT_MAX_ROWS = int(os.environ.get('ROSTER_IMPORT_MAX_ROWS', '20000'))
+MAX_REPORTED_IMPORT_FAILURES = 500
+
+# Class codes
+CLASS_CODE_ALPHABET = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+CLASS_CODE_LENGTH = 6
+MAX_CLASS_CODE_ATTEMPTS = 20
+
 # ===== Models =====
 class User(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -40,6 +131,7 @@ class User(BaseModel):
     name: str
     picture: Optional[str] = None
     role: str = "student"  # "teacher" or "student"
+    org_path: List[str] = []  # a teacher's district and school, once placed in one
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class UserSession(BaseModel):
@@ -66,6 +158,7 @@ class Test(BaseModel):
     state_standards: Optional[str] = None  # e.g., "Common Core", "Texas TEKS"
     questions: List[Question]
     status: str = "draft"  # "draft" or "published"
+    org_path: List[str] = []  # the teacher's org_path, so submissions roll up without a user lookup
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class Assignment(BaseModel):
@@ -73,6 +166,8 @@ class Assignment(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     test_id: str
     class_ids: List[str]  # List of class IDs
+    available_from: Optional[datetime] = None  # students can open the test from this time...
+    available_until: Optional[datetime] = None  # ...until this one; either may be open-ended
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class StudentAnswer(BaseModel):
@@ -95,10 +190,16 @@ class Class(BaseModel):
     teacher_id: str
     name: str
     description: Optional[str] = None
-    class_code: str = Field(default_factory=lambda: ''.join(random.choices('ABCDEFGHJKLMNPQRSTUVWXYZ23456789', k=6)))
+    class_code: str
     student_ids: List[str] = []
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class Enrollment(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    class_id: str
+    student_id: str
+    enrolled_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
 class CreateClassRequest(BaseModel):
     name: str
     description: Optional[str] = None
@@ -122,16 +223,152 @@ class GenerateTestRequest(BaseModel):
 class AssignTestRequest(BaseModel):
     test_id: str
     class_ids: List[str]
+    available_from: Optional[datetime] = None
+    available_until: Optional[datetime] = None
+
+class BulkAssignRequest(BaseModel):
+    # Every test is assigned to every class
+    test_ids: List[str]
+    class_ids: List[str]
+    available_from: Optional[datetime] = None
+    available_until: Optional[datetime] = None
+
+class AddQuestionRequest(BaseModel):
+    # No id: question ids are always assigned by the server
+    question_text: str
+    options: List[str]
+    correct_answer: int
+    standard: str
+
+class UpdateQuestionRequest(BaseModel):
+    question_text: Optional[str] = None
+    options: Optional[List[str]] = None
+    correct_answer: Optional[int] = None
+    standard: Optional[str] = None
+
+class BankQuestion(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    teacher_id: str
+    question_text: str
+    options: List[str]
+    correct_answer: int
+    standard: str
+    grade_level: Optional[str] = None
+    state_standards: Optional[str] = None
+    source_test_id: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class AssembleTestRequest(BaseModel):
+    title: str
+    resource_description: str = "Assembled from question bank"
+    grade_level: Optional[str] = None
+    state_standards: Optional[str] = None
+    # Either pick bank questions explicitly...
+    question_ids: Optional[List[str]] = None
+    # ...or sample them by standard
+    standards: Optional[List[str]] = None
+    num_questions: int = 20
 
 class SubmitTestRequest(BaseModel):
     test_id: str
     answers: List[StudentAnswer]
+    attempt_token: Optional[str] = None  # from GET /tests/{id}/take, required of students; answers index the shuffled options
+
+# Student-facing test view: no answer key, standards or teacher metadata
+class StudentQuestion(BaseModel):
+    id: str
+    question_text: str
+    options: List[str]
+
+class StudentTestView(BaseModel):
+    id: str
+    title: str
+    questions: List[StudentQuestion]
+    attempt_token: str
+    saved_answers: Dict[str, int] = {}  # question_id -> displayed option index, from autosave
+
+class AutosaveAnswerRequest(BaseModel):
+    question_id: str
+    selected_answer: int  # index of the displayed (shuffled) option
+
+# Organization hierarchy: district -> school -> teacher
+class OrgUnit(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    name: str
+    type: str  # "district" or "school"
+    parent_id: Optional[str] = None
+    path: List[str] = []  # unit ids from the district down to and including this one
+    viewer_ids: List[str] = []  # coaches who can see this unit and everything below it
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class CreateOrgUnitRequest(BaseModel):
+    name: str
+    type: str
+    parent_id: Optional[str] = None
+
+class OrgMembersRequest(BaseModel):
+    teacher_ids: List[str] = []  # moved into this school
+    viewer_ids: List[str] = []  # granted read access to this unit
+
+# Reads that never look at individual answers skip both encodings
+SUBMISSION_WITHOUT_ANSWERS = {"_id": 0, "answers": 0, "answers_packed": 0}
+
+STUDENT_TEST_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "title": 1,
+    "resource_description": 1,
+    "questions.id": 1,
+    "questions.question_text": 1,
+    "questions.options": 1
+}
 
 # ===== Basic Routes =====
 @api_router.get("/")
 async def root():
     return {"message": "Quiz Generator API"}
 
+# ===== Timestamps =====
+def as_utc(value) -> Optional[datetime]:
+    """Read a stored timestamp: a BSON date, or an ISO string on documents not yet backfilled"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def time_range_filter(field: str, start: Optional[datetime], end: Optional[datetime]) -> Dict[str, Any]:
+    """Mongo filter for start <= field < end; either bound may be omitted"""
+    start, end = as_utc(start), as_utc(end)
+    if start and end and start >= end:
+        raise HTTPException(status_code=400, detail="from must be before to")
+    bounds = {}
+    if start:
+        bounds["$gte"] = start
+    if end:
+        bounds["$lt"] = end
+    if not bounds:
+        return {}
+    # Until `migrations.py datetimes` has run some documents hold ISO strings, which sort lexically
+    legacy = {op: bound.isoformat() for op, bound in bounds.items()}
+    return {"$or": [{field: bounds}, {field: legacy}]}
+
+def submitted_between(
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """Submission filter for the optional ?from=&to= window shared by analytics and report routes"""
+    return time_range_filter("submitted_at", from_, to)
+
 # ===== Auth Helpers =====
 async def get_current_user(request: Request) -> Optional[User]:
     # Check cookie first, then Authorization header
@@ -149,16 +386,7 @@ async def get_current_user(request: Request) -> Optional[User]:
     if not session:
         return None
     
-    # Handle expires_at - could be datetime or string
-    expires_at = session['expires_at']
-    if isinstance(expires_at, str):
-        expires_at = datetime.fromisoformat(expires_at)
-    
-    # Ensure timezone-aware comparison
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-    
-    if expires_at < datetime.now(timezone.utc):
+    if as_utc(session["expires_at"]) < datetime.now(timezone.utc):
         return None
     
     # Find user
@@ -180,6 +408,283 @@ async def require_teacher(request: Request) -> User:
         raise HTTPException(status_code=403, detail="Only teachers can perform this action")
     return user
 
+def is_admin(user: Optional[User]) -> bool:
+    return user is not None and user.email.lower() in ADMIN_EMAILS
+
+async def require_admin(request: Request) -> User:
+    user = await require_auth(request)
+    if not is_admin(user):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
+
+# ===== Roster Helpers =====
+async def get_student_class_ids(student_id: str) -> List[str]:
+    if USE_ENROLLMENTS:
+        enrollments = await db.enrollments.find({"student_id": student_id}, {"_id": 0, "class_id": 1}).to_list(1000)
+        return [e["class_id"] for e in enrollments]
+    classes = await db.classes.find({"student_ids": student_id}, {"_id": 0, "id": 1}).to_list(1000)
+    return [c["id"] for c in classes]
+
+async def get_class_student_ids(class_id: str) -> List[str]:
+    """Full roster of a class, for analytics that need every student"""
+    if USE_ENROLLMENTS:
+        enrollments = await db.enrollments.find({"class_id": class_id}, {"_id": 0, "student_id": 1}).to_list(None)
+        return [e["student_id"] for e in enrollments]
+    class_obj = await db.classes.find_one({"id": class_id}, {"_id": 0, "student_ids": 1})
+    return class_obj.get("student_ids", []) if class_obj else []
+
+async def get_roster_page(class_id: str, skip: int, limit: int):
+    """Returns (student_ids, total) for one page of a class roster"""
+    if USE_ENROLLMENTS:
+        total = await db.enrollments.count_documents({"class_id": class_id})
+        page = await db.enrollments.find(
+            {"class_id": class_id}, {"_id": 0, "student_id": 1}
+        ).sort("student_id", 1).skip(skip).limit(limit).to_list(limit)
+        return [e["student_id"] for e in page], total
+    
+    # Slice inside Mongo so the full embedded array never leaves the server
+    result = await db.classes.aggregate([
+        {"$match": {"id": class_id}},
+        {"$project": {
+            "_id": 0,
+            "total": {"$size": {"$ifNull": ["$student_ids", []]}},
+            "student_ids": {"$slice": [{"$ifNull": ["$student_ids", []]}, skip, limit]}
+        }}
+    ]).to_list(1)
+    if not result:
+        return [], 0
+    return result[0]["student_ids"], result[0]["total"]
+
+async def get_roster_counts(class_ids: List[str]) -> Dict[str, int]:
+    if USE_ENROLLMENTS:
+        pipeline = [
+            {"$match": {"class_id": {"$in": class_ids}}},
+            {"$group": {"_id": "$class_id", "count": {"$sum": 1}}}
+        ]
+    else:
+        pipeline = [
+            {"$match": {"id": {"$in": class_ids}}},
+            {"$project": {"_id": "$id", "count": {"$size": {"$ifNull": ["$student_ids", []]}}}}
+        ]
+    counts = await db[("enrollments" if USE_ENROLLMENTS else "classes")].aggregate(pipeline).to_list(None)
+    return {c["_id"]: c["count"] for c in counts}
+
+# ===== Class Code Allocation =====
+def generate_class_code(length: int = CLASS_CODE_LENGTH) -> str:
+    return ''.join(random.choices(CLASS_CODE_ALPHABET, k=length))
+
+async def insert_with_unique_code(collection, doc: Dict[str, Any], length: int = CLASS_CODE_LENGTH,
+                                  max_attempts: int = MAX_CLASS_CODE_ATTEMPTS) -> int:
+    """Insert doc, drawing a new doc["class_code"] whenever the unique index rejects it.
+
+    Collisions are detected by the insert itself, so there is no find_one
+    polling. Returns the number of attempts used.
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            await collection.insert_one(doc)
+            return attempt
+        except DuplicateKeyError as e:
+            if "class_code" not in (e.details or {}).get("keyValue", {}):
+                raise
+            doc.pop("_id", None)
+            doc["class_code"] = generate_class_code(length)
+    raise HTTPException(status_code=503, detail="Could not allocate a unique class code, please retry")
+
+# ===== Student Summaries =====
+def encode_field_key(key: str) -> str:
+    """Make an arbitrary string (e.g. a dotted standard code) safe to use as a Mongo field name"""
+    return key.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+def decode_field_key(key: str) -> str:
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+async def summarize_student(teacher_id: str, student_id: str, window: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """A student's summary for one teacher, computed from their submissions (optionally within a window)"""
+    teacher_tests = await db.tests.find({"teacher_id": teacher_id}, {"_id": 0, "id": 1}).to_list(1000)
+    submissions = await db.submissions.find(
+        {"student_id": student_id, "test_id": {"$in": [t["id"] for t in teacher_tests]}, **(window or {})},
+        {"_id": 0, "id": 1, "score": 1, "standards_breakdown": 1}
+    ).to_list(None)
+    
+    standards = {}
+    for sub in submissions:
+        for standard, stats in sub["standards_breakdown"].items():
+            data = standards.setdefault(encode_field_key(standard), {"correct": 0, "total": 0, "tests_count": 0})
+            data["correct"] += stats["correct"]
+            data["total"] += stats["total"]
+            data["tests_count"] += 1
+    
+    summary = {
+        "teacher_id": teacher_id,
+        "student_id": student_id,
+        "total_tests": len(submissions),
+        "score_sum": sum(sub["score"] for sub in submissions),
+        "standards": standards,
+        # Submission ids already counted; keeps increments idempotent against rebuilds
+        "applied": [sub["id"] for sub in submissions],
+        "updated_at": datetime.now(timezone.utc)
+    }
+    return summary
+
+async def rebuild_student_summary(teacher_id: str, student_id: str) -> Dict[str, Any]:
+    """Compute a missing summary from submissions and store it.
+
+    The snapshot is only inserted if no summary exists yet, and submissions
+    that landed while it was being computed are folded in afterwards, so a
+    concurrent record_submission is neither lost nor counted twice.
+    """
+    key = {"teacher_id": teacher_id, "student_id": student_id}
+    summary = await summarize_student(teacher_id, student_id)
+    try:
+        await db.student_summaries.update_one(
+            key, {"$setOnInsert": {k: v for k, v in summary.items() if k not in key}}, upsert=True
+        )
+    except DuplicateKeyError:
+        pass  # A concurrent rebuild inserted first
+    
+    teacher_tests = await db.tests.find({"teacher_id": teacher_id}, {"_id": 0, "id": 1}).to_list(1000)
+    late = await db.submissions.find(
+        {"student_id": student_id, "test_id": {"$in": [t["id"] for t in teacher_tests]}, "id": {"$nin": summary["applied"]}},
+        {"_id": 0, "id": 1, "student_id": 1, "score": 1, "standards_breakdown": 1}
+    ).to_list(None)
+    for sub in late:
+        await apply_submission_to_summary(teacher_id, sub)
+    return await db.student_summaries.find_one(key, {"_id": 0, "applied": 0})
+
+async def apply_submission_to_summary(teacher_id: str, submission: Dict[str, Any]):
+    """Fold one submission into an existing summary, at most once.
+
+    Missing summaries are left alone: the rebuild on first read counts this
+    submission, either in its snapshot or when it catches up afterwards.
+    """
+    inc = {"total_tests": 1, "score_sum": submission["score"]}
+    for standard, stats in submission["standards_breakdown"].items():
+        key = encode_field_key(standard)
+        inc[f"standards.{key}.correct"] = stats["correct"]
+        inc[f"standards.{key}.total"] = stats["total"]
+        inc[f"standards.{key}.tests_count"] = 1
+    await db.student_summaries.update_one(
+        {"teacher_id": teacher_id, "student_id": submission["student_id"], "applied": {"$ne": submission["id"]}},
+        {"$inc": inc, "$push": {"applied": submission["id"]}, "$set": {"updated_at": datetime.now(timezone.utc)}}
+    )
+
+# ===== Item Statistics =====
+async def apply_submission_to_item_stats(test: Dict[str, Any], answers: List[StudentAnswer]):
+    """Add one submission to the per-question counters behind item analysis"""
+    selected = {a.question_id: a.selected_answer for a in answers}
+    ops = [
+        UpdateOne(
+            {"test_id": test["id"], "question_id": question_id},
+            {"$inc": inc, "$setOnInsert": {"teacher_id": test["teacher_id"]}},
+            upsert=True
+        )
+        for question_id, inc in item_increments(test["questions"], selected).items()
+    ]
+    if ops:
+        await db.item_stats.bulk_write(ops, ordered=False)
+
+# ===== Organization Rollups =====
+# Cube cells are keyed by (org_unit_id, standard, day); standard None holds whole-submission totals
+ROLLUP_FIELDS = ("correct", "total", "percentage_sum", "submissions", "score_sum")
+
+async def get_rollup_units(test: Dict[str, Any]) -> List[str]:
+    """Units a test's submissions roll up into: its teacher's district and school, then the teacher"""
+    org_path = test.get("org_path")
+    if org_path is None:
+        # Tests created before org_path was kept on them
+        teacher = await db.users.find_one({"id": test["teacher_id"]}, {"_id": 0, "org_path": 1}) or {}
+        org_path = teacher.get("org_path", [])
+    return org_path + [test["teacher_id"]]
+
+async def apply_submission_to_rollups(test: Dict[str, Any], submission: Dict[str, Any]):
+    day = as_utc(submission["submitted_at"]).date().isoformat()
+    cells = [(None, {"submissions": 1, "score_sum": submission["score"]})]
+    for standard, stats in submission["standards_breakdown"].items():
+        cells.append((standard, {
+            "correct": stats["correct"],
+            "total": stats["total"],
+            "percentage_sum": stats["percentage"],
+            "submissions": 1
+        }))
+    ops = [
+        UpdateOne({"org_unit_id": unit, "standard": standard, "day": day}, {"$inc": inc}, upsert=True)
+        for unit in await get_rollup_units(test)
+        for standard, inc in cells
+    ]
+    await db.org_rollups.bulk_write(ops, ordered=False)
+
+async def move_teacher_rollups(teacher_id: str, old_path: List[str], new_path: List[str]):
+    """Shift a teacher's history between schools using their own cube cells.
+
+    Submissions landing mid-move can drift a unit by one submission;
+    `migrations.py org-rollups` recomputes every cube from scratch.
+    """
+    leaving = [unit for unit in old_path if unit not in new_path]
+    joining = [unit for unit in new_path if unit not in old_path]
+    if not leaving and not joining:
+        return
+    cells = await db.org_rollups.find({"org_unit_id": teacher_id}, {"_id": 0, "org_unit_id": 0}).to_list(None)
+    ops = []
+    for sign, units in ((-1, leaving), (1, joining)):
+        for unit in units:
+            for cell in cells:
+                inc = {field: sign * cell[field] for field in ROLLUP_FIELDS if field in cell}
+                ops.append(UpdateOne({"org_unit_id": unit, "standard": cell["standard"], "day": cell["day"]}, {"$inc": inc}, upsert=True))
+    if ops:
+        await db.org_rollups.bulk_write(ops, ordered=False)
+
+async def require_org_viewer(unit_id: str, user: User) -> Dict[str, Any]:
+    """The unit, if the user is an admin or a viewer of it or of any unit above it"""
+    unit = await db.org_units.find_one({"id": unit_id}, {"_id": 0})
+    if not unit:
+        raise HTTPException(status_code=404, detail="Organization unit not found")
+    if not is_admin(user):
+        granted = await db.org_units.count_documents({"id": {"$in": unit["path"]}, "viewer_ids": user.id}, limit=1)
+        if not granted:
+            raise HTTPException(status_code=403, detail="Not authorized")
+    return unit
+
+def rollup_days_between(
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """The ?from=&to= window at the cubes' day granularity; partial days are included"""
+    start, end = as_utc(from_), as_utc(to)
+    if start and end and start >= end:
+        raise HTTPException(status_code=400, detail="from must be before to")
+    bounds = {}
+    if start:
+        bounds["$gte"] = start.date().isoformat()
+    if end:
+        bounds["$lte"] = (end - timedelta(microseconds=1)).date().isoformat()
+    return {"day": bounds} if bounds else {}
+
+def normalize_email(email: str) -> str:
+    """Emails are stored lowercased, so logins and roster imports find the same account"""
+    return email.strip().lower()
+
+async def get_or_create_user(email: str, name: str, picture: Optional[str] = None) -> User:
+    email = normalize_email(email)
+    existing_user = await db.users.find_one({"email": email}, {"_id": 0})
+    if existing_user:
+        return User(**existing_user)
+    
+    # Create new user (default to student role); the upsert makes simultaneous first logins share one account
+    new_user = User(email=email, name=name, picture=picture, role="student")
+    try:
+        stored = await db.users.find_one_and_update(
+            {"email": email},
+            {"$setOnInsert": new_user.model_dump()},
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Lost the race to a concurrent login on the unique email index
+        stored = await db.users.find_one({"email": email}, {"_id": 0})
+    return User(**stored)
+
 # ===== Auth Routes =====
 @api_router.get("/auth/me")
 async def get_me(user: User = Depends(require_auth)):
@@ -192,7 +697,9 @@ async def create_session(request: Request, response: Response):
     if not session_id:
         raise HTTPException(status_code=400, detail="Missing session ID")
     
-    # Call Emergent Auth API
+    # Call Emergent Auth API; aiohttp is only needed here, so it loads on first login
+    import aiohttp
+    
     async with aiohttp.ClientSession() as session:
         try:
             async with session.get(
@@ -205,19 +712,7 @@ async def create_session(request: Request, response: Response):
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Auth service error: {str(e)}")
     
-    # Check if user exists
-    existing_user = await db.users.find_one({"email": data["email"]}, {"_id": 0})
-    if existing_user:
-        user = User(**existing_user)
-    else:
-        # Create new user (default to student role)
-        user = User(
-            email=data["email"],
-            name=data.get("name", data["email"]),
-            picture=data.get("picture"),
-            role="student"
-        )
-        await db.users.insert_one(user.model_dump())
+    user = await get_or_create_user(data["email"], data.get("name", data["email"]), data.get("picture"))
     
     # Create session
     expires_at = datetime.now(timezone.utc) + timedelta(days=7)
@@ -229,8 +724,8 @@ async def create_session(request: Request, response: Response):
     await db.user_sessions.insert_one({
         "user_id": user_session.user_id,
         "session_token": user_session.session_token,
-        "expires_at": user_session.expires_at.isoformat(),
-        "created_at": user_session.created_at.isoformat()
+        "expires_at": user_session.expires_at,
+        "created_at": user_session.created_at
     })
     
     # Set cookie
@@ -264,7 +759,185 @@ async def set_role(role: str, user: User = Depends(require_auth)):
     user.role = role
     return user
 
+# ===== Admission Control =====
+class TokenBucket:
+    def __init__(self, rate_per_second: float, capacity: int):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token; returns 0 on success, otherwise seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+class GenerationAdmission:
+    """Per-teacher token buckets plus a global concurrency cap with a bounded wait queue.
+
+    Rejections raise 429 with Retry-After, so bursts of generation requests
+    cannot pile up on the event loop or exhaust the LLM quota. Buckets that
+    have refilled are dropped, since a new bucket starts full anyway.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._waiting = 0
+        self._swept = time.monotonic()
+
+    @staticmethod
+    def _reject(detail: str, retry_after: float):
+        raise HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        # No bucket can refill faster than this, so sweeping more often finds nothing new
+        if now - self._swept < self.burst / self.rate:
+            return
+        self._swept = now
+        self._buckets = {
+            teacher_id: bucket for teacher_id, bucket in self._buckets.items()
+            if bucket.tokens + (now - bucket.updated) * bucket.rate < bucket.capacity
+        }
+
+    async def acquire(self, teacher_id: str):
+        bucket = self._buckets.get(teacher_id)
+        if bucket is None:
+            self._evict_idle()
+            bucket = self._buckets[teacher_id] = TokenBucket(self.rate, self.burst)
+        wait = bucket.take()
+        if wait > 0:
+            self._reject("Too many generation requests, please wait before trying again", wait)
+
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return
+
+        if self._waiting >= self.max_queue:
+            bucket.refund()
+            self._reject("Question generation is busy, please try again shortly", GENERATION_RETRY_AFTER_SECONDS)
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            bucket.refund()
+            self._reject("Question generation is busy, please try again shortly", GENERATION_RETRY_AFTER_SECONDS)
+        finally:
+            self._waiting -= 1
+
+    def release(self):
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self, teacher_id: str):
+        await self.acquire(teacher_id)
+        try:
+            yield
+        finally:
+            self.release()
+
+generation_admission = GenerationAdmission(
+    GENERATION_RATE_PER_MINUTE,
+    GENERATION_BURST,
+    GENERATION_MAX_CONCURRENT,
+    GENERATION_MAX_QUEUE,
+    GENERATION_QUEUE_TIMEOUT_SECONDS
+)
+
+# ===== Question De-duplication =====
+async def filter_near_duplicates(teacher_id: str, questions: List[Dict[str, Any]]):
+    """Drop questions that nearly duplicate one already in the teacher's bank or earlier in the batch.
+
+    Only signatures sharing an LSH band with a new question are fetched, via
+    the (teacher_id, bands) index. Returns the kept questions with their
+    signatures as (question, minhash, bands) tuples.
+    """
+    from question_similarity import SimilarityIndex, lsh_bands, minhash
+    
+    signatures = [minhash(q) for q in questions]
+    bands = [lsh_bands(sig) for sig in signatures]
+    
+    index = SimilarityIndex()
+    all_bands = list({band for question_bands in bands for band in question_bands})
+    if all_bands:
+        candidates = await db.question_signatures.find(
+            {"teacher_id": teacher_id, "bands": {"$in": all_bands}},
+            {"_id": 0, "question_id": 1, "minhash": 1, "bands": 1}
+        ).to_list(None)
+        for candidate in candidates:
+            index.add(candidate["question_id"], candidate["minhash"], candidate["bands"])
+    
+    kept = []
+    for question, signature, question_bands in zip(questions, signatures, bands):
+        if index.find_similar(signature, bands=question_bands):
+            continue
+        index.add(question["id"], signature, question_bands)
+        kept.append((question, signature, question_bands))
+    return kept
+
+async def record_question_signatures(teacher_id: str, test_id: str, kept):
+    if not kept:
+        return
+    await db.question_signatures.insert_many([{
+        "teacher_id": teacher_id,
+        "test_id": test_id,
+        "question_id": question["id"],
+        "minhash": signature,
+        "bands": question_bands
+    } for question, signature, question_bands in kept])
+
+# ===== Question Bank Helpers =====
+async def add_to_question_bank(teacher_id: str, test: Dict[str, Any], questions: List[Dict[str, Any]]):
+    """Copy newly generated questions into the teacher's reusable bank"""
+    if not questions:
+        return
+    entries = []
+    for question in questions:
+        entry = BankQuestion(
+            id=question["id"],
+            teacher_id=teacher_id,
+            question_text=question["question_text"],
+            options=question["options"],
+            correct_answer=question["correct_answer"],
+            standard=question["standard"],
+            grade_level=test.get("grade_level"),
+            state_standards=test.get("state_standards"),
+            source_test_id=test["id"]
+        ).model_dump()
+        entries.append(entry)
+    await db.question_bank.insert_many(entries)
+
 # ===== Test Generation Route =====
+async def save_upload(file: UploadFile):
+    """Save an uploaded resource to a temp file; returns (path, mime_type)"""
+    temp_path = f"/tmp/{file.filename}"
+    with open(temp_path, "wb") as f:
+        content = await file.read()
+        f.write(content)
+    
+    # Determine mime type
+    mime_type = file.content_type or "application/octet-stream"
+    if file.filename.endswith('.pdf'):
+        mime_type = "application/pdf"
+    elif file.filename.endswith('.txt'):
+        mime_type = "text/plain"
+    elif file.filename.endswith('.csv'):
+        mime_type = "text/csv"
+    return temp_path, mime_type
+
 @api_router.post("/tests/generate")
 async def generate_test(
     request: Request,
@@ -278,94 +951,28 @@ async def generate_test(
     teacher: User = Depends(require_teacher)
 ):
     try:
-        # Initialize LLM chat
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"test-gen-{uuid.uuid4()}",
-            system_message="You are an expert educational content creator. Generate high-quality multiple choice questions based on the provided resources."
-        ).with_model("gemini", "gemini-2.0-flash")
-        
-        # Build context for standards
-        standards_context = []
-        if grade_level:
-            standards_context.append(f"Grade Level: {grade_level}")
-        if state_standards:
-            standards_context.append(f"State Standards: {state_standards}")
-        if standards:
-            standards_context.append(f"Specific Standards: {standards}")
-        
-        standards_text = "\n".join(standards_context) if standards_context else "Use appropriate educational standards"
-        
-        # Prepare prompt
-        prompt = f"""Create {num_questions} multiple choice questions based on the following resource:
-
-Resource Description: {resource_description}
-
-{standards_text}
-
-IMPORTANT: 
-- Questions should be appropriate for {grade_level if grade_level else 'the appropriate grade level'}
-- Use {state_standards if state_standards else 'Common Core'} standard codes
-- Ensure questions align with the specified standards
-
-For each question:
-1. Write a clear, grade-appropriate question
-2. Provide exactly 4 answer options
-3. Indicate which option is correct (0-3)
-4. Tag with the specific standard code (e.g., CCSS.Math.3.OA.A.1)
-
-Return ONLY a valid JSON array with this exact structure:
-[
-  {{
-    "question_text": "Question here?",
-    "options": ["Option A", "Option B", "Option C", "Option D"],
-    "correct_answer": 0,
-    "standard": "Full standard code with grade level"
-  }}
-]
-
-Do not include any markdown formatting or explanatory text, just the JSON array."""
-        
-        # If file is uploaded, include it
-        file_contents = None
-        if file:
-            # Save file temporarily
-            temp_path = f"/tmp/{file.filename}"
-            with open(temp_path, "wb") as f:
-                content = await file.read()
-                f.write(content)
-            
-            # Determine mime type
-            mime_type = file.content_type or "application/octet-stream"
-            if file.filename.endswith('.pdf'):
-                mime_type = "application/pdf"
-            elif file.filename.endswith('.txt'):
-                mime_type = "text/plain"
-            elif file.filename.endswith('.csv'):
-                mime_type = "text/csv"
-            
-            file_contents = [FileContentWithMimeType(
+        # Throttled requests are rejected before the upload is written to disk
+        async with generation_admission.slot(teacher.id):
+            temp_path, mime_type = await save_upload(file) if file else (None, None)
+            questions_data = await question_generator.generate_test(
+                num_questions,
+                resource_description,
+                grade_level=grade_level,
+                state_standards=state_standards,
+                standards=standards,
                 file_path=temp_path,
                 mime_type=mime_type
-            )]
-        
-        # Send message to LLM
-        user_message = UserMessage(text=prompt, file_contents=file_contents if file_contents else None)
-        response = await chat.send_message(user_message)
-        
-        # Parse response
-        response_text = response.strip()
-        # Remove markdown code blocks if present
-        if response_text.startswith('```'):
-            response_text = response_text.split('```')[1]
-            if response_text.startswith('json'):
-                response_text = response_text[4:]
-        response_text = response_text.strip()
+            )
         
-        questions_data = json.loads(response_text)
-        
-        # Create Question objects
-        questions = [Question(**q) for q in questions_data]
+        # Create Question objects, skipping near-duplicates of the teacher's existing questions
+        questions = [Question(**q).model_dump() for q in questions_data]
+        kept = await filter_near_duplicates(teacher.id, questions)
+        if not kept:
+            # A test with no questions could never be scored
+            raise HTTPException(
+                status_code=409,
+                detail=f"All {len(questions)} generated questions duplicate ones already in your question bank; try a different resource description"
+            )
         
         # Create test
         test = Test(
@@ -374,21 +981,108 @@ Do not include any markdown formatting or explanatory text, just the JSON array.
             resource_description=resource_description,
             grade_level=grade_level,
             state_standards=state_standards,
-            questions=questions
+            questions=[question for question, _, _ in kept],
+            org_path=teacher.org_path
         )
         
         # Save to DB
         test_dict = test.model_dump()
-        test_dict['created_at'] = test_dict['created_at'].isoformat()
         await db.tests.insert_one(test_dict)
+        await record_question_signatures(teacher.id, test.id, kept)
+        await add_to_question_bank(teacher.id, test_dict, test_dict["questions"])
         
-        return test
+        return {**test.model_dump(), "duplicates_skipped": len(questions) - len(kept)}
     
-    except json.JSONDecodeError as e:
-        raise HTTPException(status_code=500, detail=f"Failed to parse AI response: {str(e)}. Response: {response_text[:200]}")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Test generation failed: {str(e)}")
 
+# ===== Question Bank Routes =====
+@api_router.get("/question-bank")
+async def search_question_bank(
+    q: Optional[str] = None,
+    standard: Optional[str] = None,
+    grade_level: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 50,
+    teacher: User = Depends(require_teacher)
+):
+    """Search the teacher's question bank by text, standard and grade level"""
+    query = {"teacher_id": teacher.id}
+    if standard:
+        query["standard"] = standard
+    if grade_level:
+        query["grade_level"] = grade_level
+    
+    projection = {"_id": 0}
+    if q:
+        query["$text"] = {"$search": q}
+        projection["score"] = {"$meta": "textScore"}
+    
+    limit = max(1, min(limit, 200))
+    cursor = db.question_bank.find(query, projection)
+    cursor = cursor.sort([("score", {"$meta": "textScore"})]) if q else cursor.sort("created_at", -1)
+    questions = await cursor.skip(max(skip, 0)).limit(limit).to_list(limit)
+    total = await db.question_bank.count_documents(query)
+    return {"questions": questions, "total": total, "skip": skip, "limit": limit}
+
+@api_router.delete("/question-bank/{question_id}")
+async def delete_bank_question(question_id: str, teacher: User = Depends(require_teacher)):
+    result = await db.question_bank.delete_one({"id": question_id, "teacher_id": teacher.id})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Question not found")
+    return {"message": "Question removed from bank"}
+
+@api_router.post("/tests/from-bank")
+async def assemble_test_from_bank(req: AssembleTestRequest, teacher: User = Depends(require_teacher)):
+    """Create a draft test from bank questions, without calling the LLM"""
+    if req.question_ids:
+        if len(req.question_ids) > MAX_ASSEMBLED_QUESTIONS:
+            raise HTTPException(status_code=400, detail=f"A test can hold at most {MAX_ASSEMBLED_QUESTIONS} questions")
+        bank_questions = await db.question_bank.find(
+            {"id": {"$in": req.question_ids}, "teacher_id": teacher.id}, {"_id": 0}
+        ).to_list(len(req.question_ids))
+        by_id = {q["id"]: q for q in bank_questions}
+        missing = [qid for qid in req.question_ids if qid not in by_id]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Bank questions not found: {', '.join(missing)}")
+        bank_questions = [by_id[qid] for qid in req.question_ids]
+    elif req.standards:
+        size = max(1, min(req.num_questions, MAX_ASSEMBLED_QUESTIONS))
+        bank_questions = await db.question_bank.aggregate([
+            {"$match": {"teacher_id": teacher.id, "standard": {"$in": req.standards}}},
+            {"$sample": {"size": size}},
+            {"$project": {"_id": 0}}
+        ]).to_list(size)
+        if not bank_questions:
+            raise HTTPException(status_code=404, detail="No bank questions for these standards")
+    else:
+        raise HTTPException(status_code=400, detail="Provide question_ids or standards")
+    
+    # Copies get fresh ids so results on the new test are tracked separately
+    questions = [Question(
+        question_text=q["question_text"],
+        options=q["options"],
+        correct_answer=q["correct_answer"],
+        standard=q["standard"]
+    ) for q in bank_questions]
+    
+    test = Test(
+        title=req.title,
+        teacher_id=teacher.id,
+        resource_description=req.resource_description,
+        grade_level=req.grade_level,
+        state_standards=req.state_standards,
+        questions=questions,
+        org_path=teacher.org_path
+    )
+    
+    test_dict = test.model_dump()
+    await db.tests.insert_one(test_dict)
+    
+    return test
+
 # ===== Test Management Routes =====
 @api_router.put("/tests/{test_id}/publish")
 async def publish_test(test_id: str, teacher: User = Depends(require_teacher)):
@@ -401,19 +1095,96 @@ async def publish_test(test_id: str, teacher: User = Depends(require_teacher)):
     await db.tests.update_one({"id": test_id}, {"$set": {"status": "published"}})
     return {"message": "Test published"}
 
-@api_router.delete("/tests/{test_id}/questions/{question_id}")
-async def delete_question(test_id: str, question_id: str, teacher: User = Depends(require_teacher)):
-    test = await db.tests.find_one({"id": test_id})
+async def raise_question_update_error(test_id: str, teacher: User, detail: str = "Question not found"):
+    """Explain why an ownership-filtered question update matched nothing"""
+    test = await db.tests.find_one({"id": test_id}, {"_id": 0, "teacher_id": 1})
     if not test:
         raise HTTPException(status_code=404, detail="Test not found")
     if test["teacher_id"] != teacher.id:
         raise HTTPException(status_code=403, detail="Not authorized")
-    
-    # Remove question from array
-    questions = [q for q in test["questions"] if q["id"] != question_id]
-    await db.tests.update_one({"id": test_id}, {"$set": {"questions": questions}})
+    raise HTTPException(status_code=404, detail=detail)
+
+@api_router.delete("/tests/{test_id}/questions/{question_id}")
+async def delete_question(test_id: str, question_id: str, teacher: User = Depends(require_teacher)):
+    # Remove question from array in place; ownership and the question's presence are part of the filter
+    result = await db.tests.update_one(
+        {"id": test_id, "teacher_id": teacher.id, "questions.id": question_id},
+        {"$pull": {"questions": {"id": question_id}}}
+    )
+    if result.modified_count == 0:
+        await raise_question_update_error(test_id, teacher)
+    await db.question_signatures.delete_one({"question_id": question_id})
+    await db.item_stats.delete_one({"test_id": test_id, "question_id": question_id})
     return {"message": "Question deleted"}
 
+@api_router.post("/tests/{test_id}/questions")
+async def add_question(test_id: str, req: AddQuestionRequest, teacher: User = Depends(require_teacher)):
+    if not 0 <= req.correct_answer < len(req.options):
+        raise HTTPException(status_code=400, detail="correct_answer must index into options")
+    question = Question(**req.model_dump()).model_dump()
+    
+    # Manual additions are de-duplicated and banked like generated questions
+    kept = await filter_near_duplicates(teacher.id, [question])
+    if not kept:
+        raise HTTPException(status_code=409, detail="This question duplicates one already in your question bank")
+    
+    updated_test = await db.tests.find_one_and_update(
+        {"id": test_id, "teacher_id": teacher.id},
+        {"$push": {"questions": question}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated_test:
+        await raise_question_update_error(test_id, teacher, "Test not found")
+    
+    await record_question_signatures(teacher.id, test_id, kept)
+    await add_to_question_bank(teacher.id, updated_test, [question])
+    return updated_test
+
+@api_router.put("/tests/{test_id}/questions/{question_id}")
+async def update_question(test_id: str, question_id: str, req: UpdateQuestionRequest, teacher: User = Depends(require_teacher)):
+    updates = req.model_dump(exclude_none=True)
+    if not updates:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+    
+    # The element match keeps correct_answer pointing at a real option
+    element_match = {"id": question_id}
+    if "options" in updates and "correct_answer" in updates:
+        if not 0 <= updates["correct_answer"] < len(updates["options"]):
+            raise HTTPException(status_code=400, detail="correct_answer must index into options")
+    elif "options" in updates:
+        element_match["correct_answer"] = {"$lt": len(updates["options"])}
+    elif "correct_answer" in updates:
+        if updates["correct_answer"] < 0:
+            raise HTTPException(status_code=400, detail="correct_answer must index into options")
+        element_match[f"options.{updates['correct_answer']}"] = {"$exists": True}
+    
+    # Positional update of the single matched question
+    updated_test = await db.tests.find_one_and_update(
+        {"id": test_id, "teacher_id": teacher.id, "questions": {"$elemMatch": element_match}},
+        {"$set": {f"questions.$.{field}": value for field, value in updates.items()}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated_test:
+        await raise_question_update_error(test_id, teacher, "Question not found or correct_answer out of range")
+    
+    # Keep the near-duplicate signature in step with the edited text
+    if "question_text" in updates or "options" in updates:
+        from question_similarity import lsh_bands, minhash
+        
+        question = next(q for q in updated_test["questions"] if q["id"] == question_id)
+        signature = minhash(question)
+        await db.question_signatures.update_one(
+            {"question_id": question_id},
+            {"$set": {"teacher_id": teacher.id, "test_id": test_id, "minhash": signature, "bands": lsh_bands(signature)}},
+            upsert=True
+        )
+    # Counters for the old options or answer key no longer describe this question
+    if "options" in updates or "correct_answer" in updates:
+        await db.item_stats.delete_one({"test_id": test_id, "question_id": question_id})
+    return updated_test
+
 @api_router.post("/tests/{test_id}/generate-more")
 async def generate_more_questions(
     test_id: str,
@@ -429,89 +1200,34 @@ async def generate_more_questions(
         raise HTTPException(status_code=403, detail="Not authorized")
     
     try:
-        # Initialize LLM chat
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"test-gen-more-{uuid.uuid4()}",
-            system_message="You are an expert educational content creator. Generate high-quality multiple choice questions based on the provided resources."
-        ).with_model("gemini", "gemini-2.0-flash")
-        
-        # Get existing standards
-        existing_standards = list(set([q["standard"] for q in test["questions"]]))
-        standards_text = ", ".join(existing_standards) if existing_standards else "relevant educational standards"
-        
-        # Prepare prompt
-        prompt = f"""Create {num_questions} NEW multiple choice questions based on the following resource:
-
-Resource Description: {test["resource_description"]}
-Standards to cover: {standards_text}
-
-IMPORTANT: Generate questions that are DIFFERENT from these existing topics that are already covered in the test.
-
-For each question:
-1. Write a clear, appropriate-level question
-2. Provide exactly 4 answer options
-3. Indicate which option is correct (0-3)
-4. Tag with the relevant standard
-
-Return ONLY a valid JSON array with this exact structure:
-[
-  {{
-    "question_text": "Question here?",
-    "options": ["Option A", "Option B", "Option C", "Option D"],
-    "correct_answer": 0,
-    "standard": "Standard code"
-  }}
-]
-
-Do not include any markdown formatting or explanatory text, just the JSON array."""
-        
-        # If file is uploaded, include it
-        file_contents = None
-        if file:
-            temp_path = f"/tmp/{file.filename}"
-            with open(temp_path, "wb") as f:
-                content = await file.read()
-                f.write(content)
-            
-            mime_type = file.content_type or "application/octet-stream"
-            if file.filename.endswith('.pdf'):
-                mime_type = "application/pdf"
-            elif file.filename.endswith('.txt'):
-                mime_type = "text/plain"
-            elif file.filename.endswith('.csv'):
-                mime_type = "text/csv"
-            
-            file_contents = [FileContentWithMimeType(
-                file_path=temp_path,
-                mime_type=mime_type
-            )]
+        # Admission comes after the checks above, so requests that would fail spend no tokens,
+        # and before the upload is written to disk
+        async with generation_admission.slot(teacher.id):
+            temp_path, mime_type = await save_upload(file) if file else (None, None)
+            new_questions_data = await question_generator.generate_more(
+                test, num_questions, file_path=temp_path, mime_type=mime_type
+            )
+        new_questions = [Question(**q).model_dump() for q in new_questions_data]
+        kept = await filter_near_duplicates(teacher.id, new_questions)
         
-        # Send message to LLM
-        user_message = UserMessage(text=prompt, file_contents=file_contents if file_contents else None)
-        response = await chat.send_message(user_message)
-        
-        # Parse response
-        response_text = response.strip()
-        if response_text.startswith('```'):
-            response_text = response_text.split('```')[1]
-            if response_text.startswith('json'):
-                response_text = response_text[4:]
-        response_text = response_text.strip()
-        
-        new_questions_data = json.loads(response_text)
-        new_questions = [Question(**q) for q in new_questions_data]
-        
-        # Add new questions to existing ones
-        all_questions = test["questions"] + [q.model_dump() for q in new_questions]
-        await db.tests.update_one({"id": test_id}, {"$set": {"questions": all_questions}})
+        # Append new questions in place and get the updated test back in the same round-trip
+        updated_test = await db.tests.find_one_and_update(
+            {"id": test_id},
+            {"$push": {"questions": {"$each": [question for question, _, _ in kept]}}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if not updated_test:
+            # Deleted while the questions were being generated
+            raise HTTPException(status_code=404, detail="Test not found")
+        await record_question_signatures(teacher.id, test_id, kept)
+        await add_to_question_bank(teacher.id, test, [question for question, _, _ in kept])
         
-        # Return updated test
-        updated_test = await db.tests.find_one({"id": test_id}, {"_id": 0})
+        updated_test["duplicates_skipped"] = len(new_questions) - len(kept)
         return updated_test
         
-    except json.JSONDecodeError as e:
-        raise HTTPException(status_code=500, detail=f"Failed to parse AI response: {str(e)}")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate more questions: {str(e)}")
 
@@ -521,19 +1237,22 @@ async def get_tests(user: User = Depends(require_auth)):
         tests = await db.tests.find({"teacher_id": user.id}, {"_id": 0}).to_list(1000)
     else:
         # Get classes student is in
-        my_classes = await db.classes.find({"student_ids": user.id}, {"_id": 0, "id": 1}).to_list(1000)
-        class_ids = [c["id"] for c in my_classes]
+        class_ids = await get_student_class_ids(user.id)
         
-        # Get assigned tests for those classes (only published ones)
-        assignments = await db.assignments.find({"class_ids": {"$in": class_ids}}, {"_id": 0}).to_list(1000)
+        # Get assigned tests for those classes that are open now (only published ones)
+        assignments = await db.assignments.find(
+            {"class_ids": {"$in": class_ids}, **open_assignment_filter(datetime.now(timezone.utc))}, {"_id": 0}
+        ).to_list(1000)
         test_ids = [a["test_id"] for a in assignments]
-        tests = await db.tests.find({"id": {"$in": test_ids}, "status": "published"}, {"_id": 0}).to_list(1000)
+        tests = await db.tests.find({"id": {"$in": test_ids}, "status": "published"}, STUDENT_TEST_PROJECTION).to_list(1000)
     
     return tests
 
 @api_router.get("/tests/{test_id}")
 async def get_test(test_id: str, user: User = Depends(require_auth)):
-    test = await db.tests.find_one({"id": test_id}, {"_id": 0})
+    # Students never get the answer key or standards
+    projection = STUDENT_TEST_PROJECTION if user.role == "student" else {"_id": 0}
+    test = await db.tests.find_one({"id": test_id}, projection)
     if not test:
         raise HTTPException(status_code=404, detail="Test not found")
     
@@ -544,41 +1263,80 @@ async def get_test(test_id: str, user: User = Depends(require_auth)):
         if not assignment:
             raise HTTPException(status_code=403, detail="Not authorized")
     elif user.role == "student":
-        # Check if student is assigned
-        assignment = await db.assignments.find_one({"test_id": test_id, "student_emails": user.email})
+        # Check if student is assigned (in any class that has this test)
+        class_ids = await get_student_class_ids(user.id)
+        assignment = await db.assignments.find_one({"test_id": test_id, "class_ids": {"$in": class_ids}}, {"_id": 1})
         if not assignment:
             raise HTTPException(status_code=403, detail="Not authorized")
     
     return test
 
 # Get randomized test for student
-@api_router.get("/tests/{test_id}/take")
+@api_router.get("/tests/{test_id}/take", response_model=StudentTestView)
 async def get_test_for_taking(test_id: str, user: User = Depends(require_auth)):
-    test = await db.tests.find_one({"id": test_id}, {"_id": 0})
+    # Only load what the student sees; the answer key never leaves Mongo
+    test = await db.tests.find_one({"id": test_id}, STUDENT_TEST_PROJECTION)
     if not test:
         raise HTTPException(status_code=404, detail="Test not found")
     
     # Check if student is assigned (check if student is in any class that has this test)
-    my_classes = await db.classes.find({"student_ids": user.id}, {"_id": 0, "id": 1}).to_list(1000)
-    class_ids = [c["id"] for c in my_classes]
+    class_ids = await get_student_class_ids(user.id)
     assignment = await db.assignments.find_one({"test_id": test_id, "class_ids": {"$in": class_ids}})
     if not assignment:
         raise HTTPException(status_code=403, detail="Not authorized")
-    
-    # Randomize questions and options
-    questions = test["questions"]
-    random.shuffle(questions)
-    
-    for question in questions:
-        # Store correct answer before shuffling
-        correct_text = question["options"][question["correct_answer"]]
-        # Shuffle options
-        random.shuffle(question["options"])
-        # Update correct answer index
-        question["correct_answer"] = question["options"].index(correct_text)
-    
-    test["questions"] = questions
-    return test
+    await ensure_assignment_open(test_id)
+    
+    questions_by_id = {q["id"]: q for q in test["questions"]}
+    
+    # Resume an unfinished attempt with the same order, unless the questions have changed since
+    now = datetime.now(timezone.utc)
+    attempt = await db.attempts.find_one({"test_id": test_id, "student_id": user.id}, {"_id": 0})
+    if not attempt or set(attempt.get("question_order", [])) != set(questions_by_id):
+        # Randomize questions and options, remembering each option permutation for scoring
+        question_order = list(questions_by_id)
+        random.shuffle(question_order)
+        option_orders = {}
+        for question_id in question_order:
+            order = list(range(len(questions_by_id[question_id]["options"])))
+            random.shuffle(order)
+            option_orders[question_id] = order
+        
+        attempt = {
+            "token": str(uuid.uuid4()),
+            "test_id": test_id,
+            "student_id": user.id,
+            "question_order": question_order,
+            "option_orders": option_orders,
+            "answers": {},  # question_id -> selected option in stored order
+            "created_at": now,
+            "updated_at": now
+        }
+        try:
+            await db.attempts.replace_one({"test_id": test_id, "student_id": user.id}, attempt, upsert=True)
+        except DuplicateKeyError:
+            # A concurrent first take created the attempt; use that one
+            attempt = await db.attempts.find_one({"test_id": test_id, "student_id": user.id}, {"_id": 0})
+    else:
+        # Resuming counts as activity, so the attempt does not expire mid-test
+        await db.attempts.update_one({"token": attempt["token"]}, {"$set": {"updated_at": now}})
+    
+    questions = []
+    saved_answers = {}
+    for question_id in attempt["question_order"]:
+        question = questions_by_id[question_id]
+        order = attempt["option_orders"][question_id]
+        questions.append({**question, "options": [question["options"][i] for i in order]})
+        saved = attempt.get("answers", {}).get(question_id)
+        if saved is not None and saved in order:
+            saved_answers[question_id] = order.index(saved)
+    
+    return StudentTestView(
+        id=test["id"],
+        title=test["title"],
+        questions=questions,
+        attempt_token=attempt["token"],
+        saved_answers=saved_answers
+    )
 
 @api_router.delete("/tests/{test_id}")
 async def delete_test(test_id: str, teacher: User = Depends(require_teacher)):
@@ -588,48 +1346,125 @@ async def delete_test(test_id: str, teacher: User = Depends(require_teacher)):
     if test["teacher_id"] != teacher.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
+    # The job is recorded first, so a crash before the delete still removes the test and its
+    # dependents (submissions, assignments, attempts, ...) in the cleanup worker
+    job_id = await cleanup_worker.enqueue("test", test_id, teacher.id)
     await db.tests.delete_one({"id": test_id})
-    await db.assignments.delete_many({"test_id": test_id})
-    return {"message": "Test deleted"}
+    forecast_cache.invalidate(teacher.id)
+    return {"message": "Test deleted", "cleanup_job_id": job_id}
 
 # ===== Assignment Routes =====
-@api_router.post("/assignments")
-async def assign_test(req: AssignTestRequest, teacher: User = Depends(require_teacher)):
-    # Verify test exists and belongs to teacher
-    test = await db.tests.find_one({"id": req.test_id})
-    if not test:
-        raise HTTPException(status_code=404, detail="Test not found")
-    if test["teacher_id"] != teacher.id:
+async def validate_assignment_targets(teacher: User, test_ids: List[str], class_ids: List[str]):
+    """Check ownership of all tests and classes with one $in query each"""
+    tests = await db.tests.find(
+        {"id": {"$in": test_ids}}, {"_id": 0, "id": 1, "teacher_id": 1, "status": 1}
+    ).to_list(None)
+    tests_by_id = {t["id"]: t for t in tests}
+    missing = [tid for tid in test_ids if tid not in tests_by_id]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Test not found: {', '.join(missing)}")
+    if any(t["teacher_id"] != teacher.id for t in tests):
         raise HTTPException(status_code=403, detail="Not authorized")
-    if test.get("status") != "published":
-        raise HTTPException(status_code=400, detail="Cannot assign draft test. Please publish it first.")
-    
-    # Verify all classes belong to teacher
-    for class_id in req.class_ids:
-        class_obj = await db.classes.find_one({"id": class_id})
-        if not class_obj or class_obj["teacher_id"] != teacher.id:
+    drafts = [t["id"] for t in tests if t.get("status") != "published"]
+    if drafts:
+        raise HTTPException(status_code=400, detail=f"Cannot assign draft test. Please publish it first: {', '.join(drafts)}")
+    
+    owned = await db.classes.find(
+        {"id": {"$in": class_ids}, "teacher_id": teacher.id}, {"_id": 0, "id": 1}
+    ).to_list(None)
+    owned_ids = {c["id"] for c in owned}
+    for class_id in class_ids:
+        if class_id not in owned_ids:
             raise HTTPException(status_code=403, detail=f"Class {class_id} not found or not authorized")
+
+def availability_window(available_from: Optional[datetime], available_until: Optional[datetime]) -> Dict[str, Any]:
+    available_from, available_until = as_utc(available_from), as_utc(available_until)
+    if available_from and available_until and available_from >= available_until:
+        raise HTTPException(status_code=400, detail="available_from must be before available_until")
+    return {"available_from": available_from, "available_until": available_until}
+
+def open_assignment_filter(now: datetime) -> Dict[str, Any]:
+    """Assignments whose availability window contains now (a missing bound is open)"""
+    return {"$and": [
+        {"$or": [{"available_from": None}, {"available_from": {"$lte": now}}]},
+        {"$or": [{"available_until": None}, {"available_until": {"$gt": now}}]}
+    ]}
+
+async def ensure_assignment_open(test_id: str):
+    assignment = await db.assignments.find_one(
+        {"test_id": test_id}, {"_id": 0, "available_from": 1, "available_until": 1}
+    ) or {}
+    now = datetime.now(timezone.utc)
+    available_from, available_until = as_utc(assignment.get("available_from")), as_utc(assignment.get("available_until"))
+    if available_from and now < available_from:
+        raise HTTPException(status_code=403, detail="This test is not available yet")
+    if available_until and now >= available_until:
+        raise HTTPException(status_code=403, detail="This test is closed")
+
+@api_router.post("/assignments")
+async def assign_test(req: AssignTestRequest, teacher: User = Depends(require_teacher)):
+    await validate_assignment_targets(teacher, [req.test_id], req.class_ids)
+    window = availability_window(req.available_from, req.available_until)
+    
+    # Create the assignment or replace its class list and window
+    assignment = Assignment(test_id=req.test_id, class_ids=req.class_ids, **window)
+    updated = await db.assignments.find_one_and_update(
+        {"test_id": req.test_id},
+        {
+            "$set": {"class_ids": req.class_ids, **window},
+            "$setOnInsert": {"id": assignment.id, "created_at": assignment.created_at}
+        },
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return updated
+
+@api_router.post("/assignments/bulk")
+async def bulk_assign_tests(req: BulkAssignRequest, teacher: User = Depends(require_teacher)):
+    """Assign many tests to many classes in one call, adding to any existing class lists"""
+    test_ids = list(dict.fromkeys(req.test_ids))
+    class_ids = list(dict.fromkeys(req.class_ids))
+    if not test_ids or not class_ids:
+        raise HTTPException(status_code=400, detail="test_ids and class_ids are required")
+    await validate_assignment_targets(teacher, test_ids, class_ids)
+    
+    # Only an explicitly given bound changes an existing assignment's window
+    window = {k: v for k, v in availability_window(req.available_from, req.available_until).items() if v is not None}
+    if len(window) == 1:
+        # The given bound must still fit the other bound each existing assignment keeps
+        existing = await db.assignments.find(
+            {"test_id": {"$in": test_ids}}, {"_id": 0, "test_id": 1, "available_from": 1, "available_until": 1}
+        ).to_list(None)
+        invalid = []
+        for assignment in existing:
+            merged = {**assignment, **window}
+            available_from, available_until = as_utc(merged.get("available_from")), as_utc(merged.get("available_until"))
+            if available_from and available_until and available_from >= available_until:
+                invalid.append(assignment["test_id"])
+        if invalid:
+            raise HTTPException(
+                status_code=400,
+                detail=f"available_from must be before available_until; the window would be empty for: {', '.join(invalid)}"
+            )
+    created_at = datetime.now(timezone.utc)
+    ops = []
+    for test_id in test_ids:
+        update = {
+            "$addToSet": {"class_ids": {"$each": class_ids}},
+            "$setOnInsert": {"id": str(uuid.uuid4()), "created_at": created_at}
+        }
+        if window:
+            update["$set"] = window
+        ops.append(UpdateOne({"test_id": test_id}, update, upsert=True))
+    result = await db.assignments.bulk_write(ops, ordered=False)
     
-    # Create or update assignment
-    existing = await db.assignments.find_one({"test_id": req.test_id}, {"_id": 0})
-    if existing:
-        # Update class list
-        await db.assignments.update_one(
-            {"test_id": req.test_id},
-            {"$set": {"class_ids": req.class_ids}}
-        )
-        # Return updated assignment without _id
-        updated = await db.assignments.find_one({"test_id": req.test_id}, {"_id": 0})
-        return updated
-    else:
-        assignment = Assignment(
-            test_id=req.test_id,
-            class_ids=req.class_ids
-        )
-        assignment_dict = assignment.model_dump()
-        assignment_dict['created_at'] = assignment_dict['created_at'].isoformat()
-        await db.assignments.insert_one(assignment_dict)
-        return assignment
+    assignments = await db.assignments.find({"test_id": {"$in": test_ids}}, {"_id": 0}).to_list(None)
+    return {
+        "created": result.upserted_count,
+        "updated": result.modified_count,
+        "assignments": assignments
+    }
 
 @api_router.get("/assignments/{test_id}")
 async def get_assignment(test_id: str, teacher: User = Depends(require_teacher)):
@@ -641,58 +1476,58 @@ async def get_assignment(test_id: str, teacher: User = Depends(require_teacher))
 # ===== Class Management Routes =====
 @api_router.post("/classes")
 async def create_class(req: CreateClassRequest, teacher: User = Depends(require_teacher)):
-    # Generate unique class code
-    while True:
-        class_code = ''.join(random.choices('ABCDEFGHJKLMNPQRSTUVWXYZ23456789', k=6))
-        existing = await db.classes.find_one({"class_code": class_code})
-        if not existing:
-            break
-    
     class_obj = Class(
         teacher_id=teacher.id,
         name=req.name,
         description=req.description,
-        class_code=class_code,
+        class_code=generate_class_code(),
         student_ids=[]
     )
     
     class_dict = class_obj.model_dump()
-    class_dict['created_at'] = class_dict['created_at'].isoformat()
-    await db.classes.insert_one(class_dict)
+    # The unique index on class_code guarantees uniqueness; retry on collision
+    await insert_with_unique_code(db.classes, class_dict)
+    class_obj.class_code = class_dict['class_code']
     
     return class_obj
 
 @api_router.get("/classes")
 async def get_classes(teacher: User = Depends(require_teacher)):
-    classes = await db.classes.find({"teacher_id": teacher.id}, {"_id": 0}).to_list(1000)
+    classes = await db.classes.find({"teacher_id": teacher.id}, {"_id": 0, "student_ids": 0}).to_list(1000)
     
     # Enrich with student count
+    counts = await get_roster_counts([cls["id"] for cls in classes])
     for cls in classes:
-        cls['student_count'] = len(cls.get('student_ids', []))
+        cls['student_count'] = counts.get(cls["id"], 0)
     
     return classes
 
 @api_router.get("/classes/{class_id}")
-async def get_class(class_id: str, teacher: User = Depends(require_teacher)):
-    class_obj = await db.classes.find_one({"id": class_id}, {"_id": 0})
+async def get_class(class_id: str, skip: int = 0, limit: int = ROSTER_PAGE_SIZE, teacher: User = Depends(require_teacher)):
+    class_obj = await db.classes.find_one({"id": class_id}, {"_id": 0, "student_ids": 0})
     if not class_obj:
         raise HTTPException(status_code=404, detail="Class not found")
     if class_obj["teacher_id"] != teacher.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Get student details
-    students = []
-    for student_id in class_obj.get('student_ids', []):
-        student = await db.users.find_one({"id": student_id}, {"_id": 0, "id": 1, "name": 1, "email": 1})
-        if student:
-            students.append(student)
-    
-    class_obj['students'] = students
+    # Get one page of student details
+    skip = max(skip, 0)
+    limit = max(1, min(limit, MAX_ROSTER_PAGE_SIZE))
+    student_ids, total = await get_roster_page(class_id, skip, limit)
+    students = await db.users.find(
+        {"id": {"$in": student_ids}}, {"_id": 0, "id": 1, "name": 1, "email": 1}
+    ).to_list(len(student_ids))
+    students_by_id = {s["id"]: s for s in students}
+    
+    class_obj['students'] = [students_by_id[sid] for sid in student_ids if sid in students_by_id]
+    class_obj['student_count'] = total
+    class_obj['skip'] = skip
+    class_obj['limit'] = limit
     return class_obj
 
 @api_router.put("/classes/{class_id}")
 async def update_class(class_id: str, req: UpdateClassRequest, teacher: User = Depends(require_teacher)):
-    class_obj = await db.classes.find_one({"id": class_id})
+    class_obj = await db.classes.find_one({"id": class_id}, {"_id": 0, "id": 1, "teacher_id": 1})
     if not class_obj:
         raise HTTPException(status_code=404, detail="Class not found")
     if class_obj["teacher_id"] != teacher.id:
@@ -707,33 +1542,53 @@ async def update_class(class_id: str, req: UpdateClassRequest, teacher: User = D
     if update_data:
         await db.classes.update_one({"id": class_id}, {"$set": update_data})
     
-    updated_class = await db.classes.find_one({"id": class_id}, {"_id": 0})
+    updated_class = await db.classes.find_one({"id": class_id}, {"_id": 0, "student_ids": 0})
     return updated_class
 
 @api_router.post("/classes/join")
 async def join_class(req: JoinClassRequest, user: User = Depends(require_auth)):
-    # Find class by code
-    class_obj = await db.classes.find_one({"class_code": req.class_code.upper()})
-    if not class_obj:
-        raise HTTPException(status_code=404, detail="Invalid class code")
-    
-    # Check if already in class
-    if user.id in class_obj.get('student_ids', []):
-        return {"message": "Already enrolled in this class", "class": class_obj}
-    
-    # Add student to class
-    await db.classes.update_one(
-        {"id": class_obj["id"]},
-        {"$addToSet": {"student_ids": user.id}}
+    class_code = req.class_code.upper()
+    # The student_ids array is never returned; rosters can be large
+    class_projection = {"_id": 0, "student_ids": 0}
+    
+    if USE_ENROLLMENTS:
+        class_obj = await db.classes.find_one({"class_code": class_code}, class_projection)
+        if not class_obj:
+            raise HTTPException(status_code=404, detail="Invalid class code")
+        try:
+            result = await db.enrollments.update_one(
+                {"class_id": class_obj["id"], "student_id": user.id},
+                {"$setOnInsert": {"enrolled_at": datetime.now(timezone.utc)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Lost a race with a concurrent join by the same student
+            result = None
+        if result is None or result.upserted_id is None:
+            return {"message": "Already enrolled in this class", "class": class_obj}
+        return {"message": "Successfully joined class", "class": class_obj}
+    
+    # Enroll in a single round-trip; the filter only matches if not already enrolled
+    class_obj = await db.classes.find_one_and_update(
+        {"class_code": class_code, "student_ids": {"$ne": user.id}},
+        {"$addToSet": {"student_ids": user.id}},
+        projection=class_projection,
+        return_document=ReturnDocument.AFTER
     )
+    if class_obj:
+        return {"message": "Successfully joined class", "class": class_obj}
     
-    updated_class = await db.classes.find_one({"id": class_obj["id"]}, {"_id": 0})
-    return {"message": "Successfully joined class", "class": updated_class}
+    # No match: either the code is invalid or the student is already enrolled
+    class_obj = await db.classes.find_one({"class_code": class_code}, class_projection)
+    if not class_obj:
+        raise HTTPException(status_code=404, detail="Invalid class code")
+    return {"message": "Already enrolled in this class", "class": class_obj}
 
 @api_router.get("/classes/student/my-classes")
 async def get_my_classes(user: User = Depends(require_auth)):
     """Get all classes the student is enrolled in"""
-    classes = await db.classes.find({"student_ids": user.id}, {"_id": 0}).to_list(1000)
+    class_ids = await get_student_class_ids(user.id)
+    classes = await db.classes.find({"id": {"$in": class_ids}}, {"_id": 0, "student_ids": 0}).to_list(1000)
     
     # Enrich with teacher info
     for cls in classes:
@@ -744,98 +1599,311 @@ async def get_my_classes(user: User = Depends(require_auth)):
 
 @api_router.delete("/classes/{class_id}")
 async def delete_class(class_id: str, teacher: User = Depends(require_teacher)):
-    class_obj = await db.classes.find_one({"id": class_id})
+    class_obj = await db.classes.find_one({"id": class_id}, {"_id": 0, "id": 1, "teacher_id": 1})
     if not class_obj:
         raise HTTPException(status_code=404, detail="Class not found")
     if class_obj["teacher_id"] != teacher.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
+    job_id = await cleanup_worker.enqueue("class", class_id, teacher.id)
     await db.classes.delete_one({"id": class_id})
-    return {"message": "Class deleted"}
-
-# ===== Analytics Routes =====
-@api_router.get("/analytics/standards-over-time")
-async def get_standards_over_time(teacher: User = Depends(require_teacher)):
-    """Get historical performance data for all standards"""
-    # Get all teacher's tests
-    tests = await db.tests.find({"teacher_id": teacher.id, "status": "published"}, {"_id": 0}).to_list(1000)
-    test_ids = [t["id"] for t in tests]
-    
-    # Get all submissions
-    submissions = await db.submissions.find({"test_id": {"$in": test_ids}}, {"_id": 0}).to_list(1000)
-    
-    if not submissions:
-        return {"standards": [], "timeline": []}
-    
-    # Organize by standard and time
-    standards_timeline = {}
+    return {"message": "Class deleted", "cleanup_job_id": job_id}
+
+# ===== Roster Import =====
+def record_import_failure(report: Dict[str, Any], row: int, email: str, error: str):
+    report["failed_count"] += 1
+    if len(report["failed"]) < MAX_REPORTED_IMPORT_FAILURES:
+        report["failed"].append({"row": row, "email": email, "error": error})
+
+async def upsert_roster_students(batch: List[tuple], report: Dict[str, Any]) -> List[str]:
+    """Create missing student accounts in one bulk_write; returns the batch's student ids"""
+    ops = [
+        UpdateOne(
+            {"email": email},
+            {"$setOnInsert": User(email=email, name=name or email.split("@")[0], role="student").model_dump()},
+            upsert=True
+        )
+        for _, email, name in batch
+    ]
+    try:
+        upserted = (await db.users.bulk_write(ops, ordered=False)).upserted_ids
+    except BulkWriteError as e:
+        if any(err["code"] != 11000 for err in e.details["writeErrors"]):
+            raise
+        # Lost an upsert race on the unique email index; the lookup below finds the winner
+        upserted = {u["index"]: u["_id"] for u in e.details.get("upserted", [])}
+    created = {batch[i][1] for i in upserted}
+    
+    users = await db.users.find(
+        {"email": {"$in": [email for _, email, _ in batch]}}, {"_id": 0, "id": 1, "email": 1, "role": 1}
+    ).to_list(None)
+    by_email = {u["email"]: u for u in users}
+    
+    student_ids = []
+    for row, email, _ in batch:
+        user = by_email.get(email)
+        if user is None:
+            record_import_failure(report, row, email, "user could not be created")
+        elif user.get("role") != "student":
+            record_import_failure(report, row, email, "email belongs to a teacher account")
+        else:
+            report["created" if email in created else "existing"] += 1
+            student_ids.append(user["id"])
+    return student_ids
+
+async def enroll_students(class_id: str, student_ids: List[str]):
+    if not student_ids:
+        return
+    if USE_ENROLLMENTS:
+        now = datetime.now(timezone.utc)
+        await db.enrollments.bulk_write([
+            UpdateOne({"class_id": class_id, "student_id": sid}, {"$setOnInsert": {"enrolled_at": now}}, upsert=True)
+            for sid in student_ids
+        ], ordered=False)
+        return
+    await db.classes.update_one({"id": class_id}, {"$addToSet": {"student_ids": {"$each": student_ids}}})
+
+def read_roster(file, filename: Optional[str], content_type: Optional[str], report: Dict[str, Any]) -> List[tuple]:
+    """Parse and validate the whole roster before any account is created; returns (row, email, name) tuples"""
+    valid, seen = [], set()
+    for rows, (row, record) in enumerate(iter_roster_rows(file, filename, content_type), start=1):
+        if rows > ROSTER_IMPORT_MAX_ROWS:
+            raise HTTPException(status_code=413, detail=f"Rosters are limited to {ROSTER_IMPORT_MAX_ROWS} rows")
+        email, name, error = normalize_roster_row(record)
+        if error is None and email in seen:
+            error = "duplicate email in file"
+        if error:
+            record_import_failure(report, row, email, error)
+            continue
+        seen.add(email)
+        valid.append((row, email, name))
+    return valid
+
+@api_router.post("/classes/{class_id}/roster/import")
+async def import_roster(class_id: str, file: UploadFile = File(...), teacher: User = Depends(require_teacher)):
+    """Create and enroll students from a CSV or JSON roster with an email column"""
+    class_obj = await db.classes.find_one({"id": class_id}, {"_id": 0, "id": 1, "teacher_id": 1})
+    if not class_obj:
+        raise HTTPException(status_code=404, detail="Class not found")
+    if class_obj["teacher_id"] != teacher.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
     
-    for sub in submissions:
-        submission_date = sub["submitted_at"]
-        for standard, stats in sub["standards_breakdown"].items():
-            if standard not in standards_timeline:
-                standards_timeline[standard] = []
-            
-            standards_timeline[standard].append({
-                "date": submission_date,
-                "percentage": stats["percentage"],
-                "correct": stats["correct"],
-                "total": stats["total"]
-            })
+    report = {"created": 0, "existing": 0, "enrolled": 0, "failed": [], "failed_count": 0}
+    try:
+        # The upload is spooled to a temporary file; read it off the event loop
+        valid = await run_in_threadpool(read_roster, file.file, file.filename, file.content_type, report)
+    except RosterParseError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    student_ids = []
+    for start in range(0, len(valid), ROSTER_IMPORT_BATCH_SIZE):
+        student_ids.extend(await upsert_roster_students(valid[start:start + ROSTER_IMPORT_BATCH_SIZE], report))
+    
+    # Enroll everyone at once, after the whole file has been read
+    await enroll_students(class_id, student_ids)
+    report["enrolled"] = len(student_ids)
+    return report
+
+# ===== Forecasting =====
+async def get_standard_daily_stats(test_ids: List[str], window: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Per (standard, day) sums over the given tests' submissions, grouped in Mongo"""
+    pipeline = [
+        {"$match": {"test_id": {"$in": test_ids}, **(window or {})}},
+        {"$project": {
+            "_id": 0,
+            # UTC day; submissions not yet backfilled to dates still hold ISO strings
+            "day": {"$cond": [
+                {"$eq": [{"$type": "$submitted_at"}, "string"]},
+                {"$substrBytes": ["$submitted_at", 0, 10]},
+                {"$dateToString": {"format": "%Y-%m-%d", "date": "$submitted_at"}}
+            ]},
+            "breakdown": {"$objectToArray": "$standards_breakdown"}
+        }},
+        {"$unwind": "$breakdown"},
+        {"$group": {
+            "_id": {"standard": "$breakdown.k", "day": "$day"},
+            "correct": {"$sum": "$breakdown.v.correct"},
+            "total": {"$sum": "$breakdown.v.total"},
+            "percentage_sum": {"$sum": "$breakdown.v.percentage"},
+            "submissions": {"$sum": 1}
+        }}
+    ]
+    rows = await analytics_db.submissions.aggregate(pipeline).to_list(None)
+    for row in rows:
+        row.update(row.pop("_id"))
+    return rows
+
+def summarize_standard_timelines(rows: List[Dict[str, Any]], bucket: str, max_points: int) -> List[Dict[str, Any]]:
+    """Per-standard averages, trend and a downsampled timeline from (standard, day) rows, weakest first"""
+    import numpy as np
+    import forecasting
     
-    # Calculate trends
     standards_data = []
-    for standard, data_points in standards_timeline.items():
-        # Sort by date
-        sorted_points = sorted(data_points, key=lambda x: x["date"])
+    for standard, points in forecasting.bucket_timelines(rows, bucket).items():
+        submissions = sum(p["submissions"] for p in points)
+        avg_performance = sum(p["percentage"] * p["submissions"] for p in points) / submissions
         
-        # Calculate average and trend
-        percentages = [p["percentage"] for p in sorted_points]
-        avg_performance = sum(percentages) / len(percentages) if percentages else 0
-        
-        # Simple trend: compare first half to second half
-        mid = len(percentages) // 2
-        if mid > 0:
-            first_half_avg = sum(percentages[:mid]) / mid
-            second_half_avg = sum(percentages[mid:]) / (len(percentages) - mid)
+        # Simple trend: compare the first half of the attempts to the second half
+        first_half = second_half = first_count = 0
+        for p in points:
+            if first_count < submissions / 2:
+                first_half += p["percentage"] * p["submissions"]
+                first_count += p["submissions"]
+            else:
+                second_half += p["percentage"] * p["submissions"]
+        if first_count and first_count < submissions:
+            first_half_avg = first_half / first_count
+            second_half_avg = second_half / (submissions - first_count)
             trend = "improving" if second_half_avg > first_half_avg + 5 else "declining" if second_half_avg < first_half_avg - 5 else "stable"
         else:
             trend = "insufficient_data"
         
+        # Bound the payload: keep the points that best preserve the curve's shape
+        if len(points) > max_points:
+            keep = forecasting.lttb(
+                np.array([p["period"] for p in points], dtype=float),
+                np.array([p["percentage"] for p in points]),
+                max_points
+            )
+            points = [points[k] for k in keep]
+        
         standards_data.append({
             "standard": standard,
             "average_performance": round(avg_performance, 2),
-            "total_attempts": len(sorted_points),
+            "total_attempts": submissions,
             "trend": trend,
-            "timeline": sorted_points,
-            "latest_performance": percentages[-1] if percentages else 0
+            "timeline": [{k: v for k, v in p.items() if k != "period"} for p in points],
+            "latest_performance": points[-1]["percentage"]
         })
     
     # Sort by average performance
     standards_data.sort(key=lambda x: x["average_performance"])
+    return standards_data
+
+class ForecastCache:
+    """Per-teacher forecasts, dropped whenever that teacher gets a new submission.
+
+    Generations come from one counter shared by all teachers. When too many
+    teachers are tracked everything is forgotten at once, and teachers not
+    seen since start from that moment's generation, so a forecast computed
+    before the reset can never be stored after it.
+    """
+    
+    MAX_ENTRIES = 10000
+    
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[tuple, tuple] = {}
+        self._generations: Dict[str, int] = {}
+        self._clock = 0
+        self._floor = 0
+    
+    def generation(self, teacher_id: str) -> int:
+        return self._generations.get(teacher_id, self._floor)
+    
+    def get(self, teacher_id: str, bucket: str):
+        entry = self._entries.get((teacher_id, bucket))
+        if entry and entry[0] == self.generation(teacher_id) and time.monotonic() - entry[1] < self.ttl:
+            return entry[2]
+        return None
+    
+    def put(self, teacher_id: str, bucket: str, generation: int, value):
+        # A submission that landed while this was computing makes it stale already
+        if generation == self.generation(teacher_id):
+            if len(self._entries) >= self.MAX_ENTRIES:
+                self._entries.clear()
+            self._entries[(teacher_id, bucket)] = (generation, time.monotonic(), value)
+    
+    def invalidate(self, teacher_id: str):
+        import forecasting
+        
+        self._clock += 1
+        if len(self._generations) >= self.MAX_ENTRIES and teacher_id not in self._generations:
+            self._generations.clear()
+            self._entries.clear()
+            self._floor = self._clock
+        self._generations[teacher_id] = self._clock
+        for bucket in forecasting.BUCKETS:
+            self._entries.pop((teacher_id, bucket), None)
+
+forecast_cache = ForecastCache(FORECAST_CACHE_TTL_SECONDS)
+
+async def get_teacher_forecasts(teacher_id: str, bucket: str, window: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    import forecasting
+    
+    if bucket not in forecasting.BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(forecasting.BUCKETS)}")
+    
+    # Only the full-history forecast is cached; windowed ones are computed per request
+    cached = None if window else forecast_cache.get(teacher_id, bucket)
+    if cached is not None:
+        return cached
+    
+    # Daily stats come from a secondary, so a cached forecast can trail the newest submission
+    # by up to the analytics max staleness until the TTL or the next submission drops it
+    generation = forecast_cache.generation(teacher_id)
+    tests = await db.tests.find({"teacher_id": teacher_id}, {"_id": 0, "id": 1}).to_list(1000)
+    rows = await get_standard_daily_stats([t["id"] for t in tests], window)
+    result = {
+        "bucket": bucket,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "predictions": forecasting.forecast(rows, bucket)
+    }
+    if not window:
+        forecast_cache.put(teacher_id, bucket, generation, result)
+    return result
+
+# ===== Analytics Routes =====
+@api_router.get("/analytics/standards-over-time")
+async def get_standards_over_time(
+    bucket: str = "day",
+    max_points: int = DEFAULT_TIMELINE_POINTS,
+    window: Dict[str, Any] = Depends(submitted_between),
+    teacher: User = Depends(require_teacher)
+):
+    """Get historical performance data for all standards, one timeline point per bucket"""
+    import forecasting
+    
+    if bucket not in forecasting.BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(forecasting.BUCKETS)}")
+    max_points = max(3, min(max_points, MAX_TIMELINE_POINTS))
+    
+    # Get all teacher's tests
+    tests = await db.tests.find({"teacher_id": teacher.id, "status": "published"}, {"_id": 0, "id": 1}).to_list(1000)
+    test_ids = [t["id"] for t in tests]
+    
+    rows = await get_standard_daily_stats(test_ids, window)
+    if not rows:
+        return {"standards": [], "timeline": []}
+    total_submissions = await analytics_db.submissions.count_documents({"test_id": {"$in": test_ids}, **window})
+    
+    standards_data = summarize_standard_timelines(rows, bucket, max_points)
     
     return {
+        "bucket": bucket,
         "standards": standards_data,
         "summary": {
             "total_standards_tracked": len(standards_data),
-            "total_submissions": len(submissions),
+            "total_submissions": total_submissions,
             "standards_needing_attention": [s for s in standards_data if s["average_performance"] < 70]
         }
     }
 
 @api_router.get("/analytics/class-progress/{class_id}")
-async def get_class_progress(class_id: str, teacher: User = Depends(require_teacher)):
+async def get_class_progress(class_id: str, window: Dict[str, Any] = Depends(submitted_between), teacher: User = Depends(require_teacher)):
     """Get progress over time for a specific class"""
     # Verify class belongs to teacher
-    class_obj = await db.classes.find_one({"id": class_id})
+    class_obj = await db.classes.find_one({"id": class_id}, {"_id": 0, "student_ids": 0})
     if not class_obj or class_obj["teacher_id"] != teacher.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
     # Get students in class
-    student_ids = class_obj.get("student_ids", [])
+    student_ids = await get_class_student_ids(class_id)
     
     # Get all submissions from these students
-    submissions = await db.submissions.find({"student_id": {"$in": student_ids}}, {"_id": 0}).to_list(1000)
+    submissions = await analytics_db.submissions.find(
+        {"student_id": {"$in": student_ids}, **window}, SUBMISSION_WITHOUT_ANSWERS
+    ).sort("submitted_at", 1).to_list(1000)
     
     if not submissions:
         return {"message": "No data yet", "students": []}
@@ -845,7 +1913,7 @@ async def get_class_progress(class_id: str, teacher: User = Depends(require_teac
     for sub in submissions:
         student_id = sub["student_id"]
         if student_id not in student_progress:
-            student = await db.users.find_one({"id": student_id}, {"_id": 0, "name": 1, "email": 1})
+            student = await analytics_db.users.find_one({"id": student_id}, {"_id": 0, "name": 1, "email": 1})
             student_progress[student_id] = {
                 "student_id": student_id,
                 "student_name": student.get("name", "Unknown") if student else "Unknown",
@@ -855,14 +1923,15 @@ async def get_class_progress(class_id: str, teacher: User = Depends(require_teac
             }
         
         student_progress[student_id]["submissions"].append({
-            "date": sub["submitted_at"],
+            "date": as_utc(sub["submitted_at"]),
             "score": sub["score"],
             "test_id": sub["test_id"]
         })
     
     # Calculate trends for each student
     for student_id, data in student_progress.items():
-        submissions_sorted = sorted(data["submissions"], key=lambda x: x["date"])
+        # Already in submission order from the query
+        submissions_sorted = data["submissions"]
         scores = [s["score"] for s in submissions_sorted]
         
         data["average_score"] = round(sum(scores) / len(scores), 2) if scores else 0
@@ -882,72 +1951,159 @@ async def get_class_progress(class_id: str, teacher: User = Depends(require_teac
         "class_average": round(sum(s["average_score"] for s in student_progress.values()) / len(student_progress), 2) if student_progress else 0
     }
 
+@api_router.get("/analytics/predictions")
+async def get_all_predictions(bucket: str = "day", window: Dict[str, Any] = Depends(submitted_between), teacher: User = Depends(require_teacher)):
+    """Forecast every standard the teacher has tested, in one call"""
+    return await get_teacher_forecasts(teacher.id, bucket, window)
+
 @api_router.get("/analytics/predictions/{standard}")
-async def get_standard_predictions(standard: str, teacher: User = Depends(require_teacher)):
+async def get_standard_predictions(standard: str, bucket: str = "day", window: Dict[str, Any] = Depends(submitted_between), teacher: User = Depends(require_teacher)):
     """Predict future performance on a specific standard"""
-    # Get all submissions with this standard
-    tests = await db.tests.find({"teacher_id": teacher.id}, {"_id": 0}).to_list(1000)
-    test_ids = [t["id"] for t in tests]
-    
-    submissions = await db.submissions.find({"test_id": {"$in": test_ids}}, {"_id": 0}).to_list(1000)
+    forecasts = await get_teacher_forecasts(teacher.id, bucket, window)
+    prediction = next((p for p in forecasts["predictions"] if p["standard"] == standard), None)
     
-    # Filter submissions that have this standard
-    relevant_data = []
-    for sub in submissions:
-        if standard in sub["standards_breakdown"]:
-            relevant_data.append({
-                "date": sub["submitted_at"],
-                "percentage": sub["standards_breakdown"][standard]["percentage"],
-                "student_id": sub["student_id"]
-            })
-    
-    if len(relevant_data) < 3:
+    if not prediction or prediction["data_points"] < 3:
         return {"message": "Insufficient data for predictions", "prediction": None}
     
-    # Sort by date
-    relevant_data.sort(key=lambda x: x["date"])
-    
-    # Simple linear regression for prediction
-    scores = [d["percentage"] for d in relevant_data]
-    avg_current = sum(scores[-5:]) / min(5, len(scores))  # Last 5 submissions average
+    return {**prediction, "bucket": bucket}
+
+# ===== Organization Routes =====
+@api_router.post("/admin/org-units")
+async def create_org_unit(req: CreateOrgUnitRequest, admin: User = Depends(require_admin)):
+    if req.type == "district":
+        if req.parent_id:
+            raise HTTPException(status_code=400, detail="Districts have no parent")
+        parent_path = []
+    elif req.type == "school":
+        parent = await db.org_units.find_one({"id": req.parent_id, "type": "district"}, {"_id": 0, "path": 1})
+        if not parent:
+            raise HTTPException(status_code=400, detail="A school needs an existing district as parent_id")
+        parent_path = parent["path"]
+    else:
+        raise HTTPException(status_code=400, detail="type must be district or school")
+    
+    unit = OrgUnit(name=req.name, type=req.type, parent_id=req.parent_id)
+    unit.path = parent_path + [unit.id]
+    await db.org_units.insert_one(unit.model_dump())
+    return unit
+
+@api_router.post("/admin/org-units/{unit_id}/members")
+async def add_org_members(unit_id: str, req: OrgMembersRequest, admin: User = Depends(require_admin)):
+    """Move teachers into a school (carrying their rollups along) and grant viewers access"""
+    unit = await db.org_units.find_one({"id": unit_id}, {"_id": 0})
+    if not unit:
+        raise HTTPException(status_code=404, detail="Organization unit not found")
+    if req.teacher_ids and unit["type"] != "school":
+        raise HTTPException(status_code=400, detail="Teachers belong to a school")
+    
+    teachers = await db.users.find(
+        {"id": {"$in": req.teacher_ids}, "role": "teacher"}, {"_id": 0, "id": 1, "org_path": 1}
+    ).to_list(None)
+    for teacher in teachers:
+        await db.users.update_one({"id": teacher["id"]}, {"$set": {"org_unit_id": unit_id, "org_path": unit["path"]}})
+        await db.tests.update_many({"teacher_id": teacher["id"]}, {"$set": {"org_path": unit["path"]}})
+        await move_teacher_rollups(teacher["id"], teacher.get("org_path", []), unit["path"])
+    
+    if req.viewer_ids:
+        await db.org_units.update_one({"id": unit_id}, {"$addToSet": {"viewer_ids": {"$each": req.viewer_ids}}})
+    
+    found = {t["id"] for t in teachers}
+    return {
+        "teachers_moved": len(teachers),
+        "teachers_not_found": [tid for tid in req.teacher_ids if tid not in found],
+        "viewers_added": len(req.viewer_ids)
+    }
+
+@api_router.get("/org-units")
+async def get_org_units(user: User = Depends(require_auth)):
+    """Units the user can view: those they were granted and everything below them"""
+    if is_admin(user):
+        return await db.org_units.find({}, {"_id": 0}).to_list(1000)
+    granted = await db.org_units.find({"viewer_ids": user.id}, {"_id": 0, "id": 1}).to_list(1000)
+    return await db.org_units.find({"path": {"$in": [g["id"] for g in granted]}}, {"_id": 0}).to_list(1000)
+
+@api_router.get("/org-units/{unit_id}/analytics/standards")
+async def get_org_standards(
+    unit_id: str,
+    bucket: str = "day",
+    max_points: int = DEFAULT_TIMELINE_POINTS,
+    days: Dict[str, Any] = Depends(rollup_days_between),
+    user: User = Depends(require_auth)
+):
+    """Standards over time for a whole school or district, read from the rollup cube"""
+    import forecasting
+    
+    unit = await require_org_viewer(unit_id, user)
+    if bucket not in forecasting.BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(forecasting.BUCKETS)}")
+    max_points = max(3, min(max_points, MAX_TIMELINE_POINTS))
+    
+    # Cells a move has emptied (or, racing a submission, left negative) are skipped
+    cells = await analytics_db.org_rollups.find(
+        {"org_unit_id": unit_id, "submissions": {"$gt": 0}, **days}, {"_id": 0, "org_unit_id": 0}
+    ).to_list(None)
+    totals = [c for c in cells if c["standard"] is None]
+    standards_data = summarize_standard_timelines([c for c in cells if c["standard"] is not None], bucket, max_points)
+    total_submissions = sum(c["submissions"] for c in totals)
     
-    # Calculate trend
-    if len(scores) >= 6:
-        recent_avg = sum(scores[-3:]) / 3
-        older_avg = sum(scores[-6:-3]) / 3
-        trend_direction = "improving" if recent_avg > older_avg else "declining"
-        trend_magnitude = abs(recent_avg - older_avg)
-        
-        # Simple prediction: project forward
-        predicted_score = recent_avg + (recent_avg - older_avg)
-        predicted_score = max(0, min(100, predicted_score))  # Clamp to 0-100
+    return {
+        "org_unit": {"id": unit["id"], "name": unit["name"], "type": unit["type"]},
+        "bucket": bucket,
+        "standards": standards_data,
+        "summary": {
+            "total_standards_tracked": len(standards_data),
+            "total_submissions": total_submissions,
+            "average_score": round(sum(c["score_sum"] for c in totals) / total_submissions, 2) if total_submissions else 0,
+            "standards_needing_attention": [s for s in standards_data if s["average_performance"] < 70]
+        }
+    }
+
+@api_router.get("/org-units/{unit_id}/analytics/children")
+async def get_org_children(unit_id: str, days: Dict[str, Any] = Depends(rollup_days_between), user: User = Depends(require_auth)):
+    """Side-by-side standards performance for a district's schools or a school's teachers"""
+    unit = await require_org_viewer(unit_id, user)
+    if unit["type"] == "district":
+        children = await db.org_units.find({"parent_id": unit_id}, {"_id": 0, "id": 1, "name": 1, "type": 1}).to_list(1000)
     else:
-        trend_direction = "stable"
-        trend_magnitude = 0
-        predicted_score = avg_current
+        children = await db.users.find({"org_unit_id": unit_id, "role": "teacher"}, {"_id": 0, "id": 1, "name": 1}).to_list(1000)
+        for child in children:
+            child["type"] = "teacher"
+    
+    pipeline = [
+        {"$match": {"org_unit_id": {"$in": [c["id"] for c in children]}, "submissions": {"$gt": 0}, **days}},
+        {"$group": {
+            "_id": {"unit": "$org_unit_id", "standard": "$standard"},
+            **{field: {"$sum": f"${field}"} for field in ROLLUP_FIELDS}
+        }}
+    ]
+    results = {c["id"]: {**c, "total_submissions": 0, "average_score": 0, "standards": {}} for c in children}
+    async for cell in analytics_db.org_rollups.aggregate(pipeline):
+        child = results[cell["_id"]["unit"]]
+        if cell["_id"]["standard"] is None:
+            child["total_submissions"] = cell["submissions"]
+            child["average_score"] = round(cell["score_sum"] / cell["submissions"], 2) if cell["submissions"] else 0
+        elif cell["submissions"]:
+            child["standards"][cell["_id"]["standard"]] = {
+                "average_performance": round(cell["percentage_sum"] / cell["submissions"], 2),
+                "total_attempts": cell["submissions"]
+            }
     
     return {
-        "standard": standard,
-        "current_average": round(avg_current, 2),
-        "predicted_score": round(predicted_score, 2),
-        "trend": trend_direction,
-        "trend_magnitude": round(trend_magnitude, 2),
-        "confidence": "high" if len(relevant_data) >= 10 else "medium" if len(relevant_data) >= 5 else "low",
-        "data_points": len(relevant_data),
-        "recommendation": "Continue current approach" if predicted_score >= 70 else "Needs intervention and additional practice"
+        "org_unit": {"id": unit["id"], "name": unit["name"], "type": unit["type"]},
+        "children": list(results.values())
     }
 
 # ===== Reports Routes =====
 @api_router.get("/reports/test/{test_id}")
-async def get_test_report(test_id: str, teacher: User = Depends(require_teacher)):
+async def get_test_report(test_id: str, window: Dict[str, Any] = Depends(submitted_between), teacher: User = Depends(require_teacher)):
     """Comprehensive test report with student grouping by proficiency"""
     # Verify test belongs to teacher
     test = await db.tests.find_one({"id": test_id})
     if not test or test["teacher_id"] != teacher.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Get all submissions
-    submissions = await db.submissions.find({"test_id": test_id}, {"_id": 0}).to_list(1000)
+    # Get all submissions in the window
+    submissions = await reports_db.submissions.find({"test_id": test_id, **window}, {"_id": 0}).to_list(1000)
     
     if not submissions:
         return {
@@ -969,7 +2125,8 @@ async def get_test_report(test_id: str, teacher: User = Depends(require_teacher)
     # Enrich with student info
     student_results = []
     for sub in submissions:
-        student = await db.users.find_one({"id": sub["student_id"]}, {"_id": 0})
+        decode_submission(sub, test.get("answer_slots", []))
+        student = await reports_db.users.find_one({"id": sub["student_id"]}, {"_id": 0})
         student_results.append({
             **sub,
             "student_name": student.get("name", "Unknown") if student else "Unknown",
@@ -1059,24 +2216,40 @@ async def get_test_report(test_id: str, teacher: User = Depends(require_teacher)
         "standards_proficiency_groups": standards_proficiency_groups
     }
 
+@api_router.get("/reports/test/{test_id}/items")
+async def get_item_analysis(test_id: str, teacher: User = Depends(require_teacher)):
+    """Difficulty, discrimination and distractor counts per question, from running counters"""
+    test = await db.tests.find_one({"id": test_id}, {"_id": 0, "teacher_id": 1, "questions": 1})
+    if not test or test["teacher_id"] != teacher.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    stats = await reports_db.item_stats.find({"test_id": test_id}, {"_id": 0}).to_list(None)
+    stats_by_question = {s["question_id"]: s for s in stats}
+    items = [summarize_item(q, stats_by_question.get(q["id"])) for q in test.get("questions", [])]
+    return {
+        "test_id": test_id,
+        "items": items,
+        "flagged": [item["question_id"] for item in items if item["flags"]]
+    }
+
 @api_router.get("/reports/student/{student_id}")
-async def get_student_report(student_id: str, teacher: User = Depends(require_teacher)):
+async def get_student_report(student_id: str, history_skip: int = 0, history_limit: int = 50, window: Dict[str, Any] = Depends(submitted_between), teacher: User = Depends(require_teacher)):
     """Overall student performance across all tests"""
     # Get student info
-    student = await db.users.find_one({"id": student_id}, {"_id": 0})
+    student = await db.users.find_one({"id": student_id}, {"_id": 0, "name": 1, "email": 1})
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
-    # Get all submissions for this student on teacher's tests
-    teacher_tests = await db.tests.find({"teacher_id": teacher.id}, {"_id": 0, "id": 1, "title": 1}).to_list(1000)
-    test_ids = [t["id"] for t in teacher_tests]
-    
-    submissions = await db.submissions.find({
-        "student_id": student_id,
-        "test_id": {"$in": test_ids}
-    }, {"_id": 0}).to_list(1000)
+    # Totals come from the precomputed summary, rebuilt from submissions if missing;
+    # the summary covers all time, so a windowed report totals its submissions directly
+    if window:
+        summary = await summarize_student(teacher.id, student_id, window)
+    else:
+        summary = await db.student_summaries.find_one({"teacher_id": teacher.id, "student_id": student_id}, {"_id": 0, "applied": 0})
+        if not summary:
+            summary = await rebuild_student_summary(teacher.id, student_id)
     
-    if not submissions:
+    if summary["total_tests"] == 0:
         return {
             "student_id": student_id,
             "student_name": student.get("name", ""),
@@ -1084,73 +2257,523 @@ async def get_student_report(student_id: str, teacher: User = Depends(require_te
             "total_tests": 0,
             "average_score": 0,
             "overall_standards_performance": {},
-            "test_history": []
+            "test_history": [],
+            "history_skip": history_skip,
+            "history_limit": history_limit
         }
     
-    # Calculate overall standards performance
     standards_performance = {}
-    for sub in submissions:
-        for standard, stats in sub["standards_breakdown"].items():
-            if standard not in standards_performance:
-                standards_performance[standard] = {"correct": 0, "total": 0, "tests_count": 0}
-            standards_performance[standard]["correct"] += stats["correct"]
-            standards_performance[standard]["total"] += stats["total"]
-            standards_performance[standard]["tests_count"] += 1
-    
-    for standard in standards_performance:
-        data = standards_performance[standard]
-        data["percentage"] = round((data["correct"] / data["total"]) * 100, 2) if data["total"] > 0 else 0
-    
-    # Get test history with titles
-    test_history = []
-    for sub in submissions:
-        test = next((t for t in teacher_tests if t["id"] == sub["test_id"]), None)
-        test_history.append({
-            "test_id": sub["test_id"],
-            "test_title": test["title"] if test else "Unknown Test",
-            "score": sub["score"],
-            "submitted_at": sub["submitted_at"],
-            "standards_breakdown": sub["standards_breakdown"]
-        })
-    
-    # Sort by submission date
-    test_history.sort(key=lambda x: x["submitted_at"], reverse=True)
+    for key, data in summary["standards"].items():
+        standards_performance[decode_field_key(key)] = {
+            **data,
+            "percentage": round((data["correct"] / data["total"]) * 100, 2) if data["total"] > 0 else 0
+        }
     
-    average_score = sum(s["score"] for s in submissions) / len(submissions)
+    # Get one page of test history with titles
+    teacher_tests = await db.tests.find({"teacher_id": teacher.id}, {"_id": 0, "id": 1, "title": 1}).to_list(1000)
+    titles = {t["id"]: t["title"] for t in teacher_tests}
+    
+    history_skip = max(history_skip, 0)
+    history_limit = max(1, min(history_limit, 500))
+    submissions = await reports_db.submissions.find(
+        {"student_id": student_id, "test_id": {"$in": list(titles)}, **window},
+        {"_id": 0, "test_id": 1, "score": 1, "submitted_at": 1, "standards_breakdown": 1}
+    ).sort("submitted_at", -1).skip(history_skip).limit(history_limit).to_list(history_limit)
+    
+    test_history = [{
+        "test_id": sub["test_id"],
+        "test_title": titles.get(sub["test_id"], "Unknown Test"),
+        "score": sub["score"],
+        "submitted_at": sub["submitted_at"],
+        "standards_breakdown": sub["standards_breakdown"]
+    } for sub in submissions]
     
     return {
         "student_id": student_id,
         "student_name": student.get("name", ""),
         "student_email": student.get("email", ""),
-        "total_tests": len(submissions),
-        "average_score": round(average_score, 2),
+        "total_tests": summary["total_tests"],
+        "average_score": round(summary["score_sum"] / summary["total_tests"], 2),
         "overall_standards_performance": standards_performance,
-        "test_history": test_history
+        "test_history": test_history,
+        "history_skip": history_skip,
+        "history_limit": history_limit
     }
 
-# ===== Submission Routes =====
-@api_router.post("/submissions")
-async def submit_test(req: SubmitTestRequest, user: User = Depends(require_auth)):
-    # Get test
-    test = await db.tests.find_one({"id": req.test_id}, {"_id": 0})
-    if not test:
-        raise HTTPException(status_code=404, detail="Test not found")
-    
-    # Check if already submitted
-    existing = await db.submissions.find_one({"test_id": req.test_id, "student_id": user.id})
-    if existing:
-        raise HTTPException(status_code=400, detail="Test already submitted")
+# ===== Cascade Cleanup =====
+# Collections holding per-test dependents, all keyed by test_id
+TEST_DEPENDENTS = ("assignments", "attempts", "question_signatures", "item_stats", "submissions")
+
+class CleanupWorker:
+    """Removes the dependents of deleted tests and classes in the background.
+
+    A delete records a job in cleanup_jobs and then removes the parent
+    document; the job removes the parent again, so a delete interrupted
+    between the two steps still completes. Jobs are claimed with a renewable lease, so a job left
+    behind by a crashed process is picked up by any other. Dependents go
+    in delete_many batches of at most `batch_size` _ids, with a pause
+    between batches to keep the hot collections responsive. Every step is
+    idempotent, so a reclaimed job simply starts over.
+    """
+
+    def __init__(self, batch_size: int, pause: float, poll_interval: float, lease: float):
+        self.batch_size = batch_size
+        self.pause = pause
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self._wake = asyncio.Event()
+        self._task = None
+
+    async def enqueue(self, kind: str, target_id: str, teacher_id: str) -> str:
+        job_id = str(uuid.uuid4())
+        await db.cleanup_jobs.insert_one({
+            "id": job_id,
+            "kind": kind,  # "test" or "class"
+            "target_id": target_id,
+            "teacher_id": teacher_id,
+            "status": "pending",
+            "created_at": datetime.now(timezone.utc)
+        })
+        self._wake.set()
+        return job_id
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        return await db.cleanup_jobs.find_one_and_update(
+            {"$or": [{"status": "pending"}, {"status": "running", "lease_until": {"$lt": now}}]},
+            {"$set": {"status": "running", "lease_until": now + timedelta(seconds=self.lease)}},
+            sort=[("created_at", 1)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _delete_in_batches(self, job_id: str, collection: str, query: Dict[str, Any]) -> int:
+        deleted = 0
+        while True:
+            batch = await db[collection].find(query, {"_id": 1}).limit(self.batch_size).to_list(self.batch_size)
+            if not batch:
+                return deleted
+            result = await db[collection].delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+            deleted += result.deleted_count
+            await db.cleanup_jobs.update_one(
+                {"id": job_id},
+                {"$set": {"lease_until": datetime.now(timezone.utc) + timedelta(seconds=self.lease)}}
+            )
+            await asyncio.sleep(self.pause)
+
+    async def run_job(self, job: Dict[str, Any]) -> Dict[str, int]:
+        target_id = job["target_id"]
+        deleted = {}
+        if job["kind"] == "test":
+            await db.tests.delete_one({"id": target_id})
+            for collection in TEST_DEPENDENTS:
+                deleted[collection] = await self._delete_in_batches(job["id"], collection, {"test_id": target_id})
+            # Summaries included this test's submissions; they are rebuilt on next read
+            deleted["student_summaries"] = await self._delete_in_batches(
+                job["id"], "student_summaries", {"teacher_id": job["teacher_id"]}
+            )
+        elif job["kind"] == "class":
+            await db.classes.delete_one({"id": target_id})
+            deleted["enrollments"] = await self._delete_in_batches(job["id"], "enrollments", {"class_id": target_id})
+            # Assignments keep their other classes; only those this class leaves with none are removed.
+            # Their ids are saved on the job first, so a reclaimed job still knows them after the $pull.
+            assignment_ids = job.get("assignment_ids")
+            if assignment_ids is None:
+                affected = await db.assignments.find({"class_ids": target_id}, {"_id": 0, "id": 1}).to_list(None)
+                assignment_ids = [a["id"] for a in affected]
+                await db.cleanup_jobs.update_one({"id": job["id"]}, {"$set": {"assignment_ids": assignment_ids}})
+            await db.assignments.update_many({"id": {"$in": assignment_ids}}, {"$pull": {"class_ids": target_id}})
+            deleted["assignments"] = await self._delete_in_batches(
+                job["id"], "assignments", {"id": {"$in": assignment_ids}, "class_ids": {"$size": 0}}
+            )
+        
+        await db.cleanup_jobs.update_one(
+            {"id": job["id"]},
+            {"$set": {"status": "done", "finished_at": datetime.now(timezone.utc), "deleted": deleted}, "$unset": {"lease_until": ""}}
+        )
+        return deleted
+
+    async def _run(self):
+        while True:
+            try:
+                job = await self._claim()
+                while job:
+                    await self.run_job(job)
+                    job = await self._claim()
+            except Exception as e:
+                # The job keeps its lease and is retried once it expires
+                logger.error(f"Cleanup job failed: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+cleanup_worker = CleanupWorker(CLEANUP_BATCH_SIZE, CLEANUP_BATCH_PAUSE_MS / 1000, CLEANUP_POLL_SECONDS, CLEANUP_LEASE_SECONDS)
+
+# ===== Attempt Autosave =====
+class AttemptAutosaver:
+    """Group-commits autosaved answers: one bulk_write per batch window, acknowledged once written.
+
+    Changes arriving within the window are coalesced (repeated changes to
+    the same question collapse into one field update, and all attempts in
+    the worker share one write), and each caller waits for the write that
+    contains its change. Nothing is acknowledged from memory, so any worker
+    can finalize an attempt from what is in the database.
+    """
+
+    MAX_CACHED_ATTEMPTS = 50000
+
+    def __init__(self, window: float):
+        self.window = window
+        self._pending: Dict[str, Dict[str, int]] = {}  # token -> {question_id: stored-order answer}
+        self._waiters: List[asyncio.Future] = []
+        self._attempts: Dict[str, Dict[str, Any]] = {}  # token -> attempt metadata, for validation
+        self._flush_task = None
+        # Batches are written in the order they were collected, so a newer answer is never overwritten
+        self._write_lock = asyncio.Lock()
+
+    async def get_attempt(self, token: str, student_id: str) -> Dict[str, Any]:
+        attempt = self._attempts.get(token)
+        if attempt is None:
+            attempt = await db.attempts.find_one(
+                {"token": token}, {"_id": 0, "student_id": 1, "test_id": 1, "option_orders": 1}
+            )
+            if not attempt:
+                raise HTTPException(status_code=404, detail="Attempt not found")
+            if len(self._attempts) >= self.MAX_CACHED_ATTEMPTS:
+                self._attempts.clear()
+            self._attempts[token] = attempt
+        if attempt["student_id"] != student_id:
+            raise HTTPException(status_code=403, detail="Not authorized")
+        return attempt
+
+    async def save(self, token: str, question_id: str, answer: int):
+        """Queue one answer change and wait until the batch holding it is written"""
+        self._pending.setdefault(token, {})[question_id] = answer
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+        try:
+            await waiter
+        except Exception as e:
+            logger.error(f"Autosave write failed: {str(e)}")
+            raise HTTPException(status_code=503, detail="Could not save the answer, please retry")
+
+    def discard(self, token: str):
+        self._attempts.pop(token, None)
+
+    @staticmethod
+    def _update(deltas: Dict[str, int]) -> Dict[str, Any]:
+        fields = {f"answers.{question_id}": answer for question_id, answer in deltas.items()}
+        fields["updated_at"] = datetime.now(timezone.utc)
+        return {"$set": fields}
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.window)
+        pending, waiters = self._pending, self._waiters
+        self._pending, self._waiters, self._flush_task = {}, [], None
+        async with self._write_lock:
+            try:
+                await db.attempts.bulk_write(
+                    [UpdateOne({"token": token}, self._update(deltas)) for token, deltas in pending.items()],
+                    ordered=False
+                )
+            except Exception as e:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                return
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def stop(self):
+        if self._flush_task is not None:
+            await self._flush_task
+
+attempt_autosaver = AttemptAutosaver(AUTOSAVE_BATCH_WINDOW_MS / 1000)
+
+async def dedupe_attempts() -> int:
+    """Delete all but the newest attempt per (test, student); returns how many were removed"""
+    groups = db.attempts.aggregate([
+        {"$sort": {"created_at": -1}},
+        {"$group": {"_id": {"test_id": "$test_id", "student_id": "$student_id"}, "ids": {"$push": "$_id"}}},
+        {"$match": {"ids.1": {"$exists": True}}}
+    ], allowDiskUse=True)
+    removed = 0
+    async for group in groups:
+        removed += (await db.attempts.delete_many({"_id": {"$in": group["ids"][1:]}})).deleted_count
+    return removed
+
+# ===== Live Submission Feed =====
+class SubmissionFeed:
+    """Fans out new submissions to per-test subscribers (the live dashboard streams).
+
+    When MongoDB supports change streams (replica sets), inserts are read
+    from db.submissions.watch() so every worker sees submissions recorded
+    by any worker. Whenever the stream is down (always, on a standalone
+    server) the feed falls back to in-process publishing from
+    record_submission, and keeps trying to reopen the stream, resuming
+    after the last change it saw.
+    """
+
+    QUEUE_SIZE = 1000
+    RETRY_DELAYS = (1, 5, 30, 60)  # seconds before each reopen attempt, the last repeating
+
+    def __init__(self):
+        self._subscribers: Dict[str, set] = {}
+        self.change_stream_active = False
+        self._resume_token = None
+        self._task = None
+
+    def subscribe(self, test_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self._subscribers.setdefault(test_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, test_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(test_id)
+        if subscribers:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[test_id]
+
+    def _dispatch(self, submission: Dict[str, Any]):
+        for queue in self._subscribers.get(submission["test_id"], ()):
+            try:
+                queue.put_nowait(submission)
+            except asyncio.QueueFull:
+                logger.warning(f"Dropping live submission event for slow subscriber on test {submission['test_id']}")
+
+    def publish(self, submission: Dict[str, Any]):
+        if not self.change_stream_active:
+            self._dispatch(submission)
+
+    async def _watch(self):
+        failures = 0
+        while True:
+            try:
+                pipeline = [{"$match": {"operationType": "insert"}}]
+                async with db.submissions.watch(pipeline, resume_after=self._resume_token) as stream:
+                    self.change_stream_active = True
+                    failures = 0
+                    async for change in stream:
+                        self._resume_token = change["_id"]
+                        submission = change["fullDocument"]
+                        submission.pop("_id", None)
+                        self._dispatch(submission)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if isinstance(e, OperationFailure) and e.code == 286:
+                    # ChangeStreamHistoryLost: the oplog no longer reaches back to the token
+                    self._resume_token = None
+                if not failures:
+                    logger.info(f"Submission change stream unavailable, using in-process feed: {str(e)}")
+            finally:
+                self.change_stream_active = False
+            failures += 1
+            await asyncio.sleep(self.RETRY_DELAYS[min(failures, len(self.RETRY_DELAYS)) - 1])
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+submission_feed = SubmissionFeed()
+
+def empty_submission_aggregate() -> Dict[str, Any]:
+    return {"total_submissions": 0, "score_sum": 0, "class_average": 0, "standards": {}}
+
+def add_to_submission_aggregate(aggregate: Dict[str, Any], submission: Dict[str, Any]):
+    aggregate["total_submissions"] += 1
+    aggregate["score_sum"] += submission["score"]
+    aggregate["class_average"] = round(aggregate["score_sum"] / aggregate["total_submissions"], 2)
+    for standard, stats in submission["standards_breakdown"].items():
+        data = aggregate["standards"].setdefault(standard, {"correct": 0, "total": 0, "percentage": 0})
+        data["correct"] += stats["correct"]
+        data["total"] += stats["total"]
+        data["percentage"] = round((data["correct"] / data["total"]) * 100, 2) if data["total"] > 0 else 0
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=json_default)}\n\n"
+
+# ===== Export Helpers =====
+EXPORT_CHUNK_SIZE = 64 * 1024
+EXPORT_LOOKUP_BATCH = 500
+
+async def with_student_info(cursor):
+    """Yield submissions from a cursor with student name/email, looked up in $in batches"""
+    batch = []
+    async for sub in cursor:
+        batch.append(sub)
+        if len(batch) >= EXPORT_LOOKUP_BATCH:
+            async for enriched in _enrich_batch(batch):
+                yield enriched
+            batch = []
+    async for enriched in _enrich_batch(batch):
+        yield enriched
+
+async def _enrich_batch(batch):
+    if not batch:
+        return
+    students = await reports_db.users.find(
+        {"id": {"$in": list({sub["student_id"] for sub in batch})}}, {"_id": 0, "id": 1, "name": 1, "email": 1}
+    ).to_list(None)
+    students_by_id = {st["id"]: st for st in students}
+    for sub in batch:
+        student = students_by_id.get(sub["student_id"], {})
+        sub["student_name"] = student.get("name", "")
+        sub["student_email"] = student.get("email", "")
+        yield sub
+
+async def encode_rows(rows, fmt: str, fieldnames: List[str], compress: bool):
+    """Serialize an async stream of row dicts to CSV or NDJSON chunks, optionally gzipped"""
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31 writes a gzip container
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+    if fmt == "csv":
+        writer.writeheader()
+    
+    def drain() -> bytes:
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+    
+    async for row in rows:
+        if fmt == "csv":
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(row, default=json_default) + "\n")
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            chunk = drain()
+            if chunk:
+                yield chunk
+    
+    chunk = drain()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+def export_response(rows, fmt: str, fieldnames: List[str], compress: bool, filename: str) -> StreamingResponse:
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    filename = f"{filename}.{fmt}" + (".gz" if compress else "")
+    media_type = "application/gzip" if compress else ("text/csv" if fmt == "csv" else "application/x-ndjson")
+    return StreamingResponse(
+        encode_rows(rows, fmt, fieldnames, compress),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+async def test_report_rows(test_id: str, standards: List[str], window: Dict[str, Any]):
+    cursor = reports_db.submissions.find({"test_id": test_id, **window}, SUBMISSION_WITHOUT_ANSWERS).batch_size(1000)
+    async for sub in with_student_info(cursor):
+        row = {
+            "student_id": sub["student_id"],
+            "student_name": sub["student_name"],
+            "student_email": sub["student_email"],
+            "score": sub["score"],
+            "submitted_at": as_utc(sub["submitted_at"]).isoformat()
+        }
+        for standard in standards:
+            stats = sub["standards_breakdown"].get(standard)
+            row[standard] = stats["percentage"] if stats else ""
+        yield row
+
+async def student_report_rows(student_id: str, titles: Dict[str, str], window: Dict[str, Any]):
+    cursor = reports_db.submissions.find(
+        {"student_id": student_id, "test_id": {"$in": list(titles)}, **window}, SUBMISSION_WITHOUT_ANSWERS
+    ).sort("submitted_at", -1).batch_size(1000)
+    async for sub in cursor:
+        yield {
+            "test_id": sub["test_id"],
+            "test_title": titles.get(sub["test_id"], "Unknown Test"),
+            "score": sub["score"],
+            "submitted_at": as_utc(sub["submitted_at"]).isoformat(),
+            "standards_breakdown": json.dumps(sub["standards_breakdown"])
+        }
+
+async def standards_rows(test_ids: List[str], window: Dict[str, Any]):
+    """One row per (submission, standard), the long format analytics tools expect"""
+    cursor = reports_db.submissions.find(
+        {"test_id": {"$in": test_ids}, **window}, SUBMISSION_WITHOUT_ANSWERS
+    ).batch_size(1000)
+    async for sub in cursor:
+        submitted_at = as_utc(sub["submitted_at"]).isoformat()
+        for standard, stats in sub["standards_breakdown"].items():
+            yield {
+                "submitted_at": submitted_at,
+                "test_id": sub["test_id"],
+                "student_id": sub["student_id"],
+                "standard": standard,
+                "correct": stats["correct"],
+                "total": stats["total"],
+                "percentage": stats["percentage"]
+            }
+
+# ===== Export Routes =====
+@api_router.get("/exports/test/{test_id}")
+async def export_test_report(test_id: str, format: str = "csv", gzip: bool = False, window: Dict[str, Any] = Depends(submitted_between), teacher: User = Depends(require_teacher)):
+    """Stream one row per submission, with a percentage column per standard"""
+    test = await db.tests.find_one({"id": test_id}, {"_id": 0, "teacher_id": 1, "questions.standard": 1})
+    if not test or test["teacher_id"] != teacher.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
     
+    standards = sorted({q["standard"] for q in test.get("questions", [])})
+    fieldnames = ["student_id", "student_name", "student_email", "score", "submitted_at"] + standards
+    return export_response(test_report_rows(test_id, standards, window), format, fieldnames, gzip, f"test-{test_id}")
+
+@api_router.get("/exports/student/{student_id}")
+async def export_student_report(student_id: str, format: str = "csv", gzip: bool = False, window: Dict[str, Any] = Depends(submitted_between), teacher: User = Depends(require_teacher)):
+    teacher_tests = await db.tests.find({"teacher_id": teacher.id}, {"_id": 0, "id": 1, "title": 1}).to_list(1000)
+    titles = {t["id"]: t["title"] for t in teacher_tests}
+    fieldnames = ["test_id", "test_title", "score", "submitted_at", "standards_breakdown"]
+    return export_response(student_report_rows(student_id, titles, window), format, fieldnames, gzip, f"student-{student_id}")
+
+@api_router.get("/exports/standards")
+async def export_standards(format: str = "csv", gzip: bool = False, window: Dict[str, Any] = Depends(submitted_between), teacher: User = Depends(require_teacher)):
+    tests = await db.tests.find({"teacher_id": teacher.id}, {"_id": 0, "id": 1}).to_list(1000)
+    fieldnames = ["submitted_at", "test_id", "student_id", "standard", "correct", "total", "percentage"]
+    return export_response(standards_rows([t["id"] for t in tests], window), format, fieldnames, gzip, "standards")
+
+# ===== Submission Routes =====
+def unshuffle_answer(answer: StudentAnswer, option_orders: Dict[str, List[int]]) -> StudentAnswer:
+    order = option_orders.get(answer.question_id)
+    if order is None or not 0 <= answer.selected_answer < len(order):
+        return answer
+    return StudentAnswer(question_id=answer.question_id, selected_answer=order[answer.selected_answer])
+
+async def record_submission(test: Dict[str, Any], student_id: str, answers: List[StudentAnswer]) -> Submission:
+    """Score answers (in stored option order) and save the submission"""
     # Calculate score and standards breakdown
     questions = {q["id"]: q for q in test["questions"]}
+    # One answer per question on the test (the last one wins), so repeats cannot inflate the score
+    # or the summaries, item stats and rollups fed from this submission
+    selected = {a.question_id: a.selected_answer for a in answers if a.question_id in questions}
+    answers = [StudentAnswer(question_id=qid, selected_answer=choice) for qid, choice in selected.items()]
     correct_count = 0
     standards_stats = {}
     
-    for answer in req.answers:
-        question = questions.get(answer.question_id)
-        if not question:
-            continue
-        
+    for answer in answers:
+        question = questions[answer.question_id]
         standard = question["standard"]
         if standard not in standards_stats:
             standards_stats[standard] = {"correct": 0, "total": 0}
@@ -1165,20 +2788,121 @@ async def submit_test(req: SubmitTestRequest, user: User = Depends(require_auth)
         stats = standards_stats[standard]
         stats["percentage"] = round((stats["correct"] / stats["total"]) * 100, 2) if stats["total"] > 0 else 0
     
+    if not test["questions"]:
+        raise HTTPException(status_code=400, detail="Test has no questions")
     score = round((correct_count / len(test["questions"])) * 100, 2)
     
     # Create submission
     submission = Submission(
-        test_id=req.test_id,
-        student_id=user.id,
-        answers=req.answers,
+        test_id=test["id"],
+        student_id=student_id,
+        answers=answers,
         score=score,
         standards_breakdown=standards_stats
     )
     
     submission_dict = submission.model_dump()
-    submission_dict['submitted_at'] = submission_dict['submitted_at'].isoformat()
-    await db.submissions.insert_one(submission_dict)
+    stored = submission_dict
+    if SUBMISSION_ANSWER_ENCODING == "packed":
+        stored = {k: v for k, v in submission_dict.items() if k != "answers"}
+        stored["answers_packed"] = pack_answers(await get_answer_slots(test), submission_dict["answers"])
+    await db.submissions.insert_one(stored)
+    await apply_submission_to_summary(test["teacher_id"], submission_dict)
+    await apply_submission_to_item_stats(test, answers)
+    await apply_submission_to_rollups(test, submission_dict)
+    forecast_cache.invalidate(test["teacher_id"])
+    submission_dict.pop("_id", None)
+    submission_feed.publish(submission_dict)
+    
+    return submission
+
+async def get_answer_slots(test: Dict[str, Any]) -> List[str]:
+    """The test's append-only question slot list, extended with any questions added since"""
+    slots = test.get("answer_slots", [])
+    question_ids = [q["id"] for q in test["questions"]]
+    if set(question_ids) <= set(slots):
+        return slots
+    # $addToSet keeps existing slots in place and is a no-op for a concurrent submit's additions
+    updated = await db.tests.find_one_and_update(
+        {"id": test["id"]},
+        {"$addToSet": {"answer_slots": {"$each": question_ids}}},
+        projection={"_id": 0, "answer_slots": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    return updated["answer_slots"]
+
+@api_router.post("/submissions")
+async def submit_test(req: SubmitTestRequest, user: User = Depends(require_auth)):
+    # Get test
+    test = await db.tests.find_one({"id": req.test_id}, {"_id": 0})
+    if not test:
+        raise HTTPException(status_code=404, detail="Test not found")
+    
+    # Check if already submitted
+    existing = await db.submissions.find_one({"test_id": req.test_id, "student_id": user.id})
+    if existing:
+        raise HTTPException(status_code=400, detail="Test already submitted")
+    await ensure_assignment_open(req.test_id)
+    
+    # Answers from a shuffled attempt index the displayed options; map them back to stored order.
+    # Students only ever see the shuffled view, so their answers cannot be scored without it.
+    if user.role == "student" and not req.attempt_token:
+        raise HTTPException(status_code=400, detail="attempt_token is required; open the test before submitting")
+    answers = req.answers
+    if req.attempt_token:
+        attempt = await db.attempts.find_one(
+            {"token": req.attempt_token, "test_id": req.test_id, "student_id": user.id},
+            {"_id": 0, "option_orders": 1}
+        )
+        if not attempt:
+            raise HTTPException(status_code=400, detail="Invalid or expired attempt")
+        answers = [unshuffle_answer(answer, attempt["option_orders"]) for answer in req.answers]
+    
+    submission = await record_submission(test, user.id, answers)
+    if req.attempt_token:
+        attempt_autosaver.discard(req.attempt_token)
+        await db.attempts.delete_one({"token": req.attempt_token})
+    
+    return submission
+
+# ===== Attempt Autosave Routes =====
+@api_router.patch("/attempts/{token}/answers")
+async def autosave_answer(token: str, req: AutosaveAnswerRequest, user: User = Depends(require_auth)):
+    """Record one answer change; concurrent changes are coalesced into one write"""
+    attempt = await attempt_autosaver.get_attempt(token, user.id)
+    order = attempt["option_orders"].get(req.question_id)
+    if order is None:
+        raise HTTPException(status_code=400, detail="Question is not part of this attempt")
+    if not 0 <= req.selected_answer < len(order):
+        raise HTTPException(status_code=400, detail="Invalid answer index")
+    
+    await attempt_autosaver.save(token, req.question_id, order[req.selected_answer])
+    return {"message": "Answer saved"}
+
+@api_router.post("/attempts/{token}/submit")
+async def finalize_attempt(token: str, user: User = Depends(require_auth)):
+    """Turn an autosaved attempt into a submission"""
+    # Every acknowledged autosave is already in the attempt, whichever worker took it
+    attempt = await db.attempts.find_one({"token": token, "student_id": user.id}, {"_id": 0})
+    if not attempt:
+        raise HTTPException(status_code=404, detail="Attempt not found")
+    
+    test = await db.tests.find_one({"id": attempt["test_id"]}, {"_id": 0})
+    if not test:
+        raise HTTPException(status_code=404, detail="Test not found")
+    existing = await db.submissions.find_one({"test_id": attempt["test_id"], "student_id": user.id})
+    if existing:
+        raise HTTPException(status_code=400, detail="Test already submitted")
+    await ensure_assignment_open(attempt["test_id"])
+    
+    # Unanswered questions count as wrong, like a manual submission with -1
+    answers = [
+        StudentAnswer(question_id=question_id, selected_answer=attempt.get("answers", {}).get(question_id, -1))
+        for question_id in attempt["question_order"]
+    ]
+    submission = await record_submission(test, user.id, answers)
+    attempt_autosaver.discard(token)
+    await db.attempts.delete_one({"token": token})
     
     return submission
 
@@ -1193,6 +2917,7 @@ async def get_test_submissions(test_id: str, teacher: User = Depends(require_tea
     
     # Enrich with student info
     for sub in submissions:
+        decode_submission(sub, test.get("answer_slots", []))
         student = await db.users.find_one({"id": sub["student_id"]}, {"_id": 0, "name": 1, "email": 1})
         if student:
             sub["student_name"] = student.get("name", "")
@@ -1200,22 +2925,222 @@ async def get_test_submissions(test_id: str, teacher: User = Depends(require_tea
     
     return submissions
 
+@api_router.get("/submissions/test/{test_id}/stream")
+async def stream_test_submissions(test_id: str, request: Request, teacher: User = Depends(require_teacher)):
+    """Server-sent events for a live test: one snapshot, then one event per new submission"""
+    # Verify test belongs to teacher
+    test = await db.tests.find_one({"id": test_id}, {"_id": 0, "teacher_id": 1})
+    if not test or test["teacher_id"] != teacher.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    async def events():
+        # Subscribe before reading the snapshot so nothing falls in between; subscribing in here
+        # means a response that is never streamed leaves no subscriber behind
+        queue = submission_feed.subscribe(test_id)
+        try:
+            submissions = await db.submissions.find({"test_id": test_id}, SUBMISSION_WITHOUT_ANSWERS).to_list(None)
+            students = await db.users.find(
+                {"id": {"$in": [sub["student_id"] for sub in submissions]}}, {"_id": 0, "id": 1, "name": 1, "email": 1}
+            ).to_list(None)
+            students_by_id = {st["id"]: st for st in students}
+            
+            aggregate = empty_submission_aggregate()
+            seen = set()
+            for sub in submissions:
+                student = students_by_id.get(sub["student_id"], {})
+                sub["student_name"] = student.get("name", "")
+                sub["student_email"] = student.get("email", "")
+                add_to_submission_aggregate(aggregate, sub)
+                seen.add(sub["id"])
+            yield sse_event("snapshot", {"submissions": submissions, "aggregate": aggregate})
+            
+            while not await request.is_disconnected():
+                try:
+                    sub = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if sub["id"] in seen:
+                    continue
+                seen.add(sub["id"])
+                
+                # Enrich only the new submission
+                student = await db.users.find_one({"id": sub["student_id"]}, {"_id": 0, "name": 1, "email": 1}) or {}
+                event = {k: v for k, v in sub.items() if k not in ("answers", "answers_packed")}
+                event["student_name"] = student.get("name", "")
+                event["student_email"] = student.get("email", "")
+                add_to_submission_aggregate(aggregate, sub)
+                yield sse_event("submission", {"submission": event, "aggregate": aggregate})
+        finally:
+            submission_feed.unsubscribe(test_id, queue)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @api_router.get("/submissions/student/{test_id}")
 async def get_student_submission(test_id: str, user: User = Depends(require_auth)):
     submission = await db.submissions.find_one({"test_id": test_id, "student_id": user.id}, {"_id": 0})
     if not submission:
         raise HTTPException(status_code=404, detail="Submission not found")
+    if "answers_packed" in submission:
+        test = await db.tests.find_one({"id": test_id}, {"_id": 0, "answer_slots": 1}) or {}
+        decode_submission(submission, test.get("answer_slots", []))
     return submission
 
+# ===== Profiling =====
+class ProfileRecording:
+    def __init__(self, thread_id: int):
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.samples = 0
+
+class StackSampler:
+    """Statistical profiler: samples the stack of the thread that started each active recording.
+
+    Stacks are stored in folded ("collapsed") form, one line per unique stack,
+    so they can be fed directly to flamegraph.pl or speedscope. Requests
+    record the event loop thread, where Python aggregation and serialization
+    run; time spent waiting on Mongo (which Motor runs on executor threads
+    shared by all requests) shows up as the loop idling in its selector.
+    """
+
+    def __init__(self, interval_ms: float):
+        self.interval = interval_ms / 1000
+        self._recordings = set()
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread = None
+
+    def start(self) -> ProfileRecording:
+        recording = ProfileRecording(threading.get_ident())
+        with self._lock:
+            self._recordings.add(recording)
+            self._active.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+        return recording
+
+    def stop(self, recording: ProfileRecording):
+        with self._lock:
+            self._recordings.discard(recording)
+            if not self._recordings:
+                self._active.clear()
+
+    @staticmethod
+    def _fold(frame) -> str:
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(parts))
+
+    def _run(self):
+        while True:
+            self._active.wait()
+            with self._lock:
+                recordings = list(self._recordings)
+            if not recordings:
+                continue
+            frames = sys._current_frames()
+            stacks = {}
+            for recording in recordings:
+                frame = frames.get(recording.thread_id)
+                if frame is None:
+                    continue
+                if recording.thread_id not in stacks:
+                    stacks[recording.thread_id] = self._fold(frame)
+                recording.stacks[stacks[recording.thread_id]] += 1
+                recording.samples += 1
+            time.sleep(self.interval)
+
+profiler = StackSampler(PROFILE_SAMPLE_INTERVAL_MS)
+
+async def save_profile(request: Request, user: Optional[User], recording: ProfileRecording, duration_ms: float, trigger: str) -> str:
+    profile_id = str(uuid.uuid4())
+    await db.request_profiles.insert_one({
+        "id": profile_id,
+        "method": request.method,
+        "path": request.url.path,
+        "query": str(request.url.query),
+        "user_id": user.id if user else None,
+        "trigger": trigger,  # "requested" or "slow"
+        "duration_ms": round(duration_ms, 2),
+        "sample_interval_ms": PROFILE_SAMPLE_INTERVAL_MS,
+        "samples": recording.samples,
+        "folded": "\n".join(f"{stack} {count}" for stack, count in recording.stacks.most_common()),
+        "created_at": datetime.now(timezone.utc)
+    })
+    return profile_id
+
+@api_router.get("/admin/profiles")
+async def list_profiles(limit: int = 50, admin: User = Depends(require_admin)):
+    """List recent request profiles (without stack data)"""
+    profiles = await db.request_profiles.find({}, {"_id": 0, "folded": 0}).sort("created_at", -1).to_list(min(limit, 500))
+    return profiles
+
+@api_router.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, admin: User = Depends(require_admin)):
+    """Return a profile as folded stacks (flamegraph.pl / speedscope input)"""
+    profile = await db.request_profiles.find_one({"id": profile_id}, {"_id": 0, "folded": 1})
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile["folded"])
+
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    # Opt-in via "X-Profile: 1" header or "?profile=1"; only honoured for admins
+    user = None
+    requested = request.headers.get("X-Profile") == "1" or request.query_params.get("profile") == "1"
+    if requested:
+        user = await get_current_user(request)
+        requested = is_admin(user)
+
+    if not requested and SLOW_REQUEST_THRESHOLD_MS <= 0:
+        return await call_next(request)
+
+    recordings, timer = [], None
+    if requested:
+        recordings.append(profiler.start())
+    else:
+        # Slow capture only samples once a request has run past the threshold, so fast requests cost nothing
+        timer = asyncio.get_running_loop().call_later(
+            SLOW_REQUEST_THRESHOLD_MS / 1000, lambda: recordings.append(profiler.start())
+        )
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        if timer:
+            timer.cancel()
+        for recording in recordings:
+            profiler.stop(recording)
+    duration_ms = (time.perf_counter() - started) * 1000
+
+    slow = SLOW_REQUEST_THRESHOLD_MS > 0 and duration_ms >= SLOW_REQUEST_THRESHOLD_MS
+    if slow:
+        logger.warning(f"Slow request {request.method} {request.url.path}: {duration_ms:.0f}ms")
+    if recordings and (requested or slow):
+        try:
+            if user is None:
+                user = await get_current_user(request)
+            profile_id = await save_profile(request, user, recordings[0], duration_ms, "requested" if requested else "slow")
+            response.headers["X-Profile-Id"] = profile_id
+        except Exception as e:
+            logger.error(f"Failed to store request profile: {str(e)}")
+
+    return response
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Profile-Id"],
 )
 
 # Configure logging
@@ -1225,6 +3150,77 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_indexes():
+    try:
+        await db.classes.create_index("class_code", unique=True)
+    except OperationFailure as e:
+        # An earlier non-unique index or duplicate codes; keep serving on the old index
+        logger.warning(f"class_code index is not unique, run `python migrations.py class-codes`: {e}")
+    await db.classes.create_index("student_ids")
+    await db.enrollments.create_index([("class_id", 1), ("student_id", 1)], unique=True)
+    await db.enrollments.create_index("student_id")
+    await db.student_summaries.create_index([("teacher_id", 1), ("student_id", 1)], unique=True)
+    await db.submissions.create_index([("student_id", 1), ("submitted_at", -1)])
+    await db.submissions.create_index([("test_id", 1), ("submitted_at", -1)])
+    # Sessions expire on their own once expires_at is a date (string values are ignored by TTL)
+    await db.user_sessions.create_index("expires_at", expireAfterSeconds=0)
+    await db.question_signatures.create_index([("teacher_id", 1), ("bands", 1)])
+    await db.question_signatures.create_index("question_id", unique=True)
+    await db.question_signatures.create_index("test_id")
+    await db.question_bank.create_index("id", unique=True)
+    await db.question_bank.create_index([("teacher_id", 1), ("standard", 1)])
+    await db.question_bank.create_index([("teacher_id", 1), ("grade_level", 1)])
+    await db.question_bank.create_index([("teacher_id", 1), ("question_text", "text")])
+    await db.item_stats.create_index([("test_id", 1), ("question_id", 1)], unique=True)
+    await db.cleanup_jobs.create_index([("status", 1), ("created_at", 1)])
+    await db.cleanup_jobs.create_index("finished_at", expireAfterSeconds=7 * 24 * 60 * 60)
+    try:
+        await db.assignments.create_index("test_id", unique=True)
+    except OperationFailure as e:
+        # Duplicate assignments from before upserts, or the old non-unique index
+        logger.warning(f"assignments.test_id index is not unique, run `python migrations.py assignments`: {e}")
+        await db.assignments.create_index("test_id")
+    await db.assignments.create_index("class_ids")
+    await db.org_units.create_index("id", unique=True)
+    await db.org_units.create_index("path")
+    await db.org_units.create_index("viewer_ids")
+    await db.org_rollups.create_index([("org_unit_id", 1), ("day", 1), ("standard", 1)], unique=True)
+    await db.users.create_index("org_unit_id")
+    try:
+        await db.users.create_index("email", unique=True)
+    except OperationFailure as e:
+        # Existing duplicate accounts; concurrent roster imports may then race on the same email
+        logger.warning(f"users.email index is not unique: {e}")
+        await db.users.create_index("email")
+    await db.attempts.create_index("token", unique=True)
+    try:
+        await db.attempts.create_index([("test_id", 1), ("student_id", 1)], unique=True)
+    except OperationFailure:
+        # Attempts taken before resuming existed can repeat a (test, student); keep the newest
+        removed = await dedupe_attempts()
+        logger.info(f"Removed {removed} duplicate attempts")
+        try:
+            await db.attempts.create_index([("test_id", 1), ("student_id", 1)], unique=True)
+        except OperationFailure as e:
+            logger.warning(f"attempts (test_id, student_id) index is not unique yet: {e}")
+    # Unsubmitted attempts expire a day after their last autosave
+    if "created_at_1" in await db.attempts.index_information():
+        # The TTL used to run from creation, expiring attempts still being taken
+        await db.attempts.update_many(
+            {"updated_at": {"$exists": False}}, [{"$set": {"updated_at": "$created_at"}}]
+        )
+        await db.attempts.drop_index("created_at_1")
+    await db.attempts.create_index("updated_at", expireAfterSeconds=ATTEMPT_TTL_SECONDS)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    submission_feed.start()
+    cleanup_worker.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await attempt_autosaver.stop()
+    submission_feed.stop()
+    cleanup_worker.stop()
     client.close()
\ No newline at end of file
@@ -193,6 +193,11 @@ const Analytics = ({ user }) => {
                 <div style={{ fontSize: "1.75rem", fontWeight: "700", color: prediction.predicted_score >= 70 ? "#10b981" : "#f59e0b" }}>
                   {prediction.predicted_score}%
                 </div>
+                {prediction.interval && (
+                  <div style={{ fontSize: "0.75rem", color: "#718096", marginTop: "0.25rem" }}>
+                    95% range {prediction.interval.low}–{prediction.interval.high}%
+                  </div>
+                )}
               </div>
               <div style={{ padding: "1rem", background: "#f7fafc", borderRadius: "12px" }}>
                 <div style={{ fontSize: "0.875rem", color: "#718096", marginBottom: "0.5rem" }}>Trend</div>
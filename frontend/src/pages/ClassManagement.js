@@ -146,7 +146,7 @@ const ClassManagement = ({ user }) => {
         <div className="dashboard-header">
           <div className="header-left">
             <h1>{selectedClass.name}</h1>
-            <p>{selectedClass.students?.length || 0} students enrolled</p>
+            <p>{selectedClass.student_count ?? selectedClass.students?.length ?? 0} students enrolled</p>
           </div>
           <div className="header-right">
             <button className="btn btn-secondary" onClick={() => setSelectedClass(null)} data-testid="back-btn">
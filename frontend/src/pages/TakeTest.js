@@ -23,6 +23,8 @@ const TakeTest = ({ user }) => {
     try {
       const response = await axios.get(`${API}/tests/${testId}/take`);
       setTest(response.data);
+      // Restore answers autosaved before a reload or crash
+      setAnswers(response.data.saved_answers || {});
     } catch (e) {
       toast.error("Failed to load test");
       navigate("/dashboard");
@@ -33,6 +35,10 @@ const TakeTest = ({ user }) => {
 
   const handleSelectAnswer = (questionId, answerIndex) => {
     setAnswers({ ...answers, [questionId]: answerIndex });
+    axios.patch(`${API}/attempts/${test.attempt_token}/answers`, {
+      question_id: questionId,
+      selected_answer: answerIndex
+    }).catch((e) => console.error("Autosave failed:", e.response?.data || e.message));
   };
 
   const handleNext = () => {
@@ -65,7 +71,8 @@ const TakeTest = ({ user }) => {
       
       await axios.post(`${API}/submissions`, {
         test_id: testId,
-        answers: submissionAnswers
+        answers: submissionAnswers,
+        attempt_token: test.attempt_token
       });
       
       toast.success("Test submitted successfully!");
@@ -106,7 +113,9 @@ const TakeTest = ({ user }) => {
         <div className="question-card" data-testid="question-card">
           <div className="question-header">
             <div className="question-number">Question {currentQuestion + 1}</div>
-            <div className="question-standard" data-testid="question-standard">{question.standard}</div>
+            {question.standard && (
+              <div className="question-standard" data-testid="question-standard">{question.standard}</div>
+            )}
           </div>
           
           <div className="question-text" data-testid="question-text">{question.question_text}</div>
@@ -0,0 +1,56 @@
+import asyncio
+import functools
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+@functools.lru_cache(maxsize=None)
+def _mongo_available(url):
+    return asyncio.run(_ping(url))
+
+
+async def _ping(url):
+    probe = AsyncIOMotorClient(url, serverSelectionTimeoutMS=2000)
+    try:
+        await probe.admin.command("ping")
+        return True
+    except Exception:
+        return False
+    finally:
+        probe.close()
+
+
+@pytest.fixture
+def mongo_db():
+    """A throwaway, indexed database swapped in for all of server's handles; skips without MongoDB"""
+    import server
+
+    if not _mongo_available(server.mongo_url):
+        pytest.skip("MongoDB is not reachable at MONGO_URL")
+
+    saved = server.db, server.analytics_db, server.reports_db
+    db = server.client[f"test_{uuid.uuid4().hex[:12]}"]
+    server.db = server.analytics_db = server.reports_db = db
+    try:
+        asyncio.run(server.create_indexes())
+        yield db
+    finally:
+        server.db, server.analytics_db, server.reports_db = saved
+        asyncio.run(server.client.drop_database(db.name))
+
+
+@pytest.fixture
+def sync_db(mongo_db):
+    """A blocking handle on the same database, for the offline migrations"""
+    import server
+
+    client = MongoClient(server.mongo_url)
+    yield client[mongo_db.name]
+    client.close()
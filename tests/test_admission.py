@@ -0,0 +1,109 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from llm_providers import StubProvider  # noqa: E402
+from question_generation import QuestionGenerator  # noqa: E402
+from server import GenerationAdmission  # noqa: E402
+
+
+def test_token_bucket_limits_each_teacher():
+    admission = GenerationAdmission(rate_per_minute=6, burst=2, max_concurrent=10, max_queue=0, queue_timeout=1)
+
+    async def run():
+        await admission.acquire("teacher-a")
+        await admission.acquire("teacher-a")
+        with pytest.raises(HTTPException) as exc:
+            await admission.acquire("teacher-a")
+        # Other teachers have their own bucket
+        await admission.acquire("teacher-b")
+        return exc.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 429
+    assert int(error.headers["Retry-After"]) >= 1
+
+
+def test_global_cap_queues_then_rejects():
+    admission = GenerationAdmission(rate_per_minute=600, burst=10, max_concurrent=1, max_queue=1, queue_timeout=1)
+
+    async def run():
+        await admission.acquire("teacher-a")
+        queued = asyncio.create_task(admission.acquire("teacher-b"))
+        await asyncio.sleep(0)
+        # The queue is full: the third request is turned away immediately
+        with pytest.raises(HTTPException) as exc:
+            await admission.acquire("teacher-c")
+        admission.release()
+        await queued
+        admission.release()
+        return exc.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 429
+    assert "Retry-After" in error.headers
+
+
+def test_queue_timeout_rejects():
+    admission = GenerationAdmission(rate_per_minute=600, burst=10, max_concurrent=1, max_queue=5, queue_timeout=0.05)
+
+    async def run():
+        await admission.acquire("teacher-a")
+        with pytest.raises(HTTPException) as exc:
+            await admission.acquire("teacher-b")
+        return exc.value
+
+    assert asyncio.run(run()).status_code == 429
+
+
+def test_refilled_buckets_are_evicted():
+    # 100 tokens a second: a bucket of 2 is full again after 20ms
+    admission = GenerationAdmission(rate_per_minute=6000, burst=2, max_concurrent=10, max_queue=0, queue_timeout=1)
+
+    async def run():
+        for teacher_id in ("teacher-a", "teacher-b", "teacher-b"):
+            async with admission.slot(teacher_id):
+                pass
+        time.sleep(0.03)
+        # teacher-b has just used its last token, so its bucket must be kept
+        admission._buckets["teacher-b"].tokens, admission._buckets["teacher-b"].updated = 0, time.monotonic()
+        async with admission.slot("teacher-c"):
+            pass
+
+    asyncio.run(run())
+    assert set(admission._buckets) == {"teacher-b", "teacher-c"}
+
+
+def test_rejected_requests_spend_no_tokens(mongo_db, monkeypatch):
+    teacher = server.User(id="teacher-admit", email="admit@example.com", name="Admit", role="teacher")
+    monkeypatch.setattr(server, "generation_admission", GenerationAdmission(
+        rate_per_minute=1, burst=1, max_concurrent=10, max_queue=0, queue_timeout=1
+    ))
+    monkeypatch.setattr(server, "question_generator", QuestionGenerator(StubProvider(), batch_window_ms=0))
+
+    async def generate_more(test_id):
+        return await server.generate_more_questions(test_id, request=None, num_questions=1, file=None, teacher=teacher)
+
+    async def run():
+        await mongo_db.tests.insert_many([
+            {"id": "mine", "teacher_id": teacher.id, "title": "Mine", "resource_description": "Sums", "questions": []},
+            {"id": "theirs", "teacher_id": "someone-else", "title": "Theirs", "resource_description": "Sums", "questions": []}
+        ])
+        for test_id, status in (("missing", 404), ("theirs", 403), ("theirs", 403)):
+            with pytest.raises(HTTPException) as exc:
+                await generate_more(test_id)
+            assert exc.value.status_code == status
+        # The single token is still there for a valid request, and then spent
+        assert len((await generate_more("mine"))["questions"]) == 1
+        with pytest.raises(HTTPException) as exc:
+            await generate_more("mine")
+        assert exc.value.status_code == 429
+
+    asyncio.run(run())
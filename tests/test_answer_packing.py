@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from answer_packing import UNANSWERED, decode_submission, pack_answers, unpack_answers  # noqa: E402
+
+SLOTS = ["q-a", "q-b", "q-c", "q-d"]
+
+
+def test_round_trip_skips_unanswered_and_unknown_questions():
+    answers = [
+        {"question_id": "q-c", "selected_answer": 3},
+        {"question_id": "q-a", "selected_answer": 0},
+        {"question_id": "q-d", "selected_answer": -1},  # autosaved attempt, never answered
+        {"question_id": "not-on-test", "selected_answer": 1}
+    ]
+    packed = pack_answers(SLOTS, answers)
+    assert packed == bytes([0, UNANSWERED, 3, UNANSWERED])
+    assert unpack_answers(SLOTS, packed) == [
+        {"question_id": "q-a", "selected_answer": 0},
+        {"question_id": "q-c", "selected_answer": 3}
+    ]
+
+
+def test_decode_leaves_expanded_submissions_alone():
+    expanded = {"id": "s1", "answers": [{"question_id": "q-b", "selected_answer": 2}]}
+    assert decode_submission(dict(expanded), SLOTS) == expanded
+
+    stored = {"id": "s2", "answers_packed": pack_answers(SLOTS, expanded["answers"])}
+    assert decode_submission(stored, SLOTS) == {"id": "s2", "answers": expanded["answers"]}
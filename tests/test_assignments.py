@@ -0,0 +1,104 @@
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import pytest  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+from pymongo.errors import DuplicateKeyError  # noqa: E402
+
+import server  # noqa: E402
+
+TEACHER = server.User(id="teacher-assign", email="assign@example.com", name="Assign", role="teacher")
+# BSON dates keep milliseconds
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+async def _seed(db):
+    await db.tests.insert_many([
+        {"id": "t1", "teacher_id": TEACHER.id, "status": "published"},
+        {"id": "t2", "teacher_id": TEACHER.id, "status": "published"},
+        {"id": "draft", "teacher_id": TEACHER.id, "status": "draft"},
+        {"id": "foreign", "teacher_id": "someone-else", "status": "published"}
+    ])
+    await db.classes.insert_many([
+        {"id": "c1", "class_code": "C1", "teacher_id": TEACHER.id},
+        {"id": "c2", "class_code": "C2", "teacher_id": TEACHER.id},
+        {"id": "foreign-class", "class_code": "FOREIGN-CLASS", "teacher_id": "someone-else"}
+    ])
+
+
+def test_open_assignment_filter_honours_each_bound(mongo_db):
+    async def run():
+        hour = timedelta(hours=1)
+        await mongo_db.assignments.insert_many([
+            {"test_id": "always", "available_from": None, "available_until": None},
+            {"test_id": "open", "available_from": NOW - hour, "available_until": NOW + hour},
+            {"test_id": "from-only", "available_from": NOW - hour, "available_until": None},
+            {"test_id": "until-only", "available_from": None, "available_until": NOW + hour},
+            {"test_id": "not-yet", "available_from": NOW + hour, "available_until": None},
+            {"test_id": "closed", "available_from": None, "available_until": NOW - hour},
+            # The window is half-open: closing now means closed
+            {"test_id": "closing-now", "available_from": None, "available_until": NOW}
+        ])
+        found = await mongo_db.assignments.find(server.open_assignment_filter(NOW), {"_id": 0, "test_id": 1}).to_list(None)
+        assert {a["test_id"] for a in found} == {"always", "open", "from-only", "until-only"}
+
+    asyncio.run(run())
+
+
+def test_bulk_assign_validates_every_target_before_writing(mongo_db):
+    async def run():
+        await _seed(mongo_db)
+        cases = [
+            (["t1", "missing"], ["c1"], 404),
+            (["t1", "foreign"], ["c1"], 403),
+            (["t1", "draft"], ["c1"], 400),
+            (["t1"], ["c1", "foreign-class"], 403)
+        ]
+        for test_ids, class_ids, status in cases:
+            with pytest.raises(HTTPException) as e:
+                await server.bulk_assign_tests(server.BulkAssignRequest(test_ids=test_ids, class_ids=class_ids), TEACHER)
+            assert e.value.status_code == status
+        assert await mongo_db.assignments.count_documents({}) == 0
+
+        first = await server.bulk_assign_tests(server.BulkAssignRequest(test_ids=["t1", "t2", "t1"], class_ids=["c1"]), TEACHER)
+        assert first["created"] == 2
+        second = await server.bulk_assign_tests(server.BulkAssignRequest(test_ids=["t1", "t2"], class_ids=["c2"]), TEACHER)
+        assert second["created"] == 0 and second["updated"] == 2
+        assert all(sorted(a["class_ids"]) == ["c1", "c2"] for a in second["assignments"])
+
+    asyncio.run(run())
+
+
+def test_bulk_assign_rejects_a_bound_that_empties_the_stored_window(mongo_db):
+    async def run():
+        await _seed(mongo_db)
+        await server.assign_test(server.AssignTestRequest(test_id="t1", class_ids=["c1"], available_until=NOW + timedelta(days=1)), TEACHER)
+
+        with pytest.raises(HTTPException) as e:
+            await server.bulk_assign_tests(
+                server.BulkAssignRequest(test_ids=["t1", "t2"], class_ids=["c2"], available_from=NOW + timedelta(days=2)), TEACHER
+            )
+        assert e.value.status_code == 400 and "t1" in e.value.detail
+        assert await mongo_db.assignments.count_documents({}) == 1
+
+        result = await server.bulk_assign_tests(
+            server.BulkAssignRequest(test_ids=["t1", "t2"], class_ids=["c2"], available_from=NOW + timedelta(hours=1)), TEACHER
+        )
+        windows = {a["test_id"]: (a.get("available_from"), a.get("available_until")) for a in result["assignments"]}
+        assert server.as_utc(windows["t1"][1]) == NOW + timedelta(days=1)
+        assert windows["t2"][1] is None
+
+    asyncio.run(run())
+
+
+def test_a_test_has_at_most_one_assignment(mongo_db):
+    async def run():
+        await mongo_db.assignments.insert_one({"id": "a1", "test_id": "t1", "class_ids": ["c1"]})
+        with pytest.raises(DuplicateKeyError):
+            await mongo_db.assignments.insert_one({"id": "a2", "test_id": "t1", "class_ids": ["c2"]})
+
+    asyncio.run(run())
@@ -0,0 +1,108 @@
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+STUDENT = server.User(id="student-auto", email="auto@example.com", name="Auto", role="student")
+TEST = {
+    "id": "test-auto",
+    "teacher_id": "teacher-auto",
+    "questions": [
+        {"id": f"q{i}", "question_text": f"Q{i}", "options": ["a", "b", "c", "d"], "correct_answer": 1, "standard": "MATH.1"}
+        for i in range(4)
+    ]
+}
+
+
+def attempt(token, student_id=STUDENT.id, created_at=None):
+    return {
+        "token": token,
+        "test_id": TEST["id"],
+        "student_id": student_id,
+        "question_order": [q["id"] for q in TEST["questions"]],
+        "option_orders": {q["id"]: [0, 1, 2, 3] for q in TEST["questions"]},
+        "answers": {},
+        "created_at": created_at or datetime.now(timezone.utc)
+    }
+
+
+def test_concurrent_saves_coalesce_and_are_written_before_returning(mongo_db):
+    async def run():
+        await mongo_db.attempts.insert_many([attempt("tok-a"), attempt("tok-b", student_id="other")])
+        saver = server.AttemptAutosaver(0.01)
+        await asyncio.gather(
+            saver.save("tok-a", "q0", 0),
+            saver.save("tok-a", "q0", 2),
+            saver.save("tok-a", "q1", 1),
+            saver.save("tok-b", "q0", 3)
+        )
+        # Acknowledged means stored: nothing is left buffered
+        assert saver._pending == {} and saver._flush_task is None
+        a = await mongo_db.attempts.find_one({"token": "tok-a"})
+        b = await mongo_db.attempts.find_one({"token": "tok-b"})
+        assert a["answers"] == {"q0": 2, "q1": 1}
+        assert b["answers"] == {"q0": 3}
+
+    asyncio.run(run())
+
+
+def test_another_worker_finalizes_from_the_database(mongo_db):
+    async def run():
+        await mongo_db.tests.insert_one(dict(TEST))
+        await mongo_db.attempts.insert_one(attempt("tok-final"))
+        # Autosaves handled by one worker, submit handled by another (the module's own saver)
+        other_worker = server.AttemptAutosaver(0.01)
+        for question_id in ("q0", "q1", "q2"):
+            await other_worker.save("tok-final", question_id, 1)
+
+        submission = await server.finalize_attempt("tok-final", STUDENT)
+        assert submission.score == 75.0
+        assert await mongo_db.attempts.count_documents({"token": "tok-final"}) == 0
+
+    asyncio.run(run())
+
+
+def test_duplicate_attempts_are_removed_before_the_unique_index(mongo_db):
+    async def run():
+        await mongo_db.attempts.drop_index("test_id_1_student_id_1")
+        now = datetime.now(timezone.utc)
+        await mongo_db.attempts.insert_many([
+            attempt("old", created_at=now - timedelta(hours=2)),
+            attempt("newest", created_at=now),
+            attempt("older", created_at=now - timedelta(hours=3)),
+            attempt("someone-else", student_id="other")
+        ])
+        await server.create_indexes()
+
+        remaining = await mongo_db.attempts.find({}, {"token": 1}).to_list(None)
+        assert sorted(a["token"] for a in remaining) == ["newest", "someone-else"]
+        indexes = await mongo_db.attempts.index_information()
+        assert indexes["test_id_1_student_id_1"].get("unique")
+
+    asyncio.run(run())
+
+
+def test_attempts_expire_from_their_last_autosave(mongo_db):
+    async def run():
+        # A deployment still carrying the creation-time TTL index
+        await mongo_db.attempts.drop_index("updated_at_1")
+        await mongo_db.attempts.create_index("created_at", expireAfterSeconds=server.ATTEMPT_TTL_SECONDS)
+        started = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=20)
+        await mongo_db.attempts.insert_one(attempt("tok-ttl", created_at=started))
+        await server.create_indexes()
+
+        indexes = await mongo_db.attempts.index_information()
+        assert "created_at_1" not in indexes
+        assert indexes["updated_at_1"]["expireAfterSeconds"] == server.ATTEMPT_TTL_SECONDS
+        backfilled = await mongo_db.attempts.find_one({"token": "tok-ttl"})
+        assert backfilled["updated_at"].replace(tzinfo=timezone.utc) == started
+
+        await server.AttemptAutosaver(0.01).save("tok-ttl", "q0", 1)
+        saved = await mongo_db.attempts.find_one({"token": "tok-ttl"})
+        assert saved["updated_at"].replace(tzinfo=timezone.utc) > started + timedelta(hours=19)
+
+    asyncio.run(run())
@@ -0,0 +1,29 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+
+def test_login_finds_the_roster_imported_account_regardless_of_case(mongo_db):
+    async def run():
+        imported = server.User(email="ann.lee@school.org", name="Ann Lee", role="student")
+        await mongo_db.users.insert_one(imported.model_dump())
+
+        user = await server.get_or_create_user(" Ann.Lee@School.org", "Ann Lee")
+        assert user.id == imported.id
+        assert await mongo_db.users.count_documents({}) == 1
+
+    asyncio.run(run())
+
+
+def test_simultaneous_first_logins_share_one_account(mongo_db):
+    async def run():
+        users = await asyncio.gather(*[server.get_or_create_user("New.Student@school.org", "New") for _ in range(10)])
+        assert len({u.id for u in users}) == 1
+        assert users[0].email == "new.student@school.org"
+        assert await mongo_db.users.count_documents({}) == 1
+
+    asyncio.run(run())
@@ -0,0 +1,101 @@
+import asyncio
+import io
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import pytest  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+
+import server  # noqa: E402
+
+TEACHER = server.User(id="teacher-roster", email="roster@example.com", name="Roster", role="teacher")
+STUDENTS = [server.User(id=f"student-{n:02d}", email=f"s{n}@example.com", name=f"Student {n}", role="student") for n in range(7)]
+
+
+@pytest.fixture(params=["embedded", "collection"])
+def roster_storage(request, monkeypatch):
+    monkeypatch.setattr(server, "ROSTER_STORAGE", request.param)
+    monkeypatch.setattr(server, "USE_ENROLLMENTS", request.param == "collection")
+    return request.param
+
+
+async def _seed(db):
+    await db.users.insert_many([s.model_dump() for s in STUDENTS])
+    for class_id, code in (("roster-a", "ROSTRA"), ("roster-b", "ROSTRB")):
+        await db.classes.insert_one(server.Class(id=class_id, teacher_id=TEACHER.id, name=class_id, class_code=code, student_ids=[]).model_dump())
+
+
+def test_joining_is_idempotent(mongo_db, roster_storage):
+    async def run():
+        await _seed(mongo_db)
+        joined = await server.join_class(server.JoinClassRequest(class_code="rostra"), STUDENTS[0])
+        assert joined["message"] == "Successfully joined class" and "student_ids" not in joined["class"]
+        again = await server.join_class(server.JoinClassRequest(class_code="ROSTRA"), STUDENTS[0])
+        assert again["message"] == "Already enrolled in this class"
+        with pytest.raises(HTTPException) as e:
+            await server.join_class(server.JoinClassRequest(class_code="NOPE99"), STUDENTS[0])
+        assert e.value.status_code == 404
+
+        assert await server.get_student_class_ids(STUDENTS[0].id) == ["roster-a"]
+        assert await server.get_class_student_ids("roster-a") == [STUDENTS[0].id]
+        # Only the configured storage is written
+        enrollments = await mongo_db.enrollments.count_documents({})
+        embedded = (await mongo_db.classes.find_one({"id": "roster-a"}))["student_ids"]
+        assert (enrollments, embedded) == ((1, []) if roster_storage == "collection" else (0, [STUDENTS[0].id]))
+
+    asyncio.run(run())
+
+
+def test_rosters_are_paged(mongo_db, roster_storage):
+    async def run():
+        await _seed(mongo_db)
+        await server.enroll_students("roster-a", [s.id for s in STUDENTS])
+        await server.enroll_students("roster-b", [STUDENTS[0].id])
+
+        seen = []
+        for skip in (0, 3, 6):
+            page = await server.get_class("roster-a", skip=skip, limit=3, teacher=TEACHER)
+            assert page["student_count"] == len(STUDENTS) and "student_ids" not in page
+            assert len(page["students"]) == min(3, len(STUDENTS) - skip)
+            seen += [s["id"] for s in page["students"]]
+        assert sorted(seen) == [s.id for s in STUDENTS]
+
+        clamped = await server.get_class("roster-a", skip=-5, limit=10 ** 6, teacher=TEACHER)
+        assert (clamped["skip"], clamped["limit"]) == (0, server.MAX_ROSTER_PAGE_SIZE)
+        assert len(clamped["students"]) == len(STUDENTS)
+
+        assert await server.get_roster_counts(["roster-a", "roster-b"]) == {"roster-a": 7, "roster-b": 1}
+        classes = {c["id"]: c["student_count"] for c in await server.get_classes(TEACHER)}
+        assert classes == {"roster-a": 7, "roster-b": 1}
+
+        with pytest.raises(HTTPException) as e:
+            await server.get_class("roster-a", skip=0, limit=3, teacher=server.User(id="x", email="x@example.com", name="X", role="teacher"))
+        assert e.value.status_code == 403
+
+    asyncio.run(run())
+
+
+def test_rejected_roster_creates_no_accounts(mongo_db, roster_storage, monkeypatch):
+    def upload(data, filename="roster.csv"):
+        return server.UploadFile(io.BytesIO(data.encode("utf-8")), filename=filename)
+
+    async def run():
+        await _seed(mongo_db)
+        monkeypatch.setattr(server, "ROSTER_IMPORT_MAX_ROWS", 3)
+        monkeypatch.setattr(server, "ROSTER_IMPORT_BATCH_SIZE", 1)
+        oversized = "email\n" + "".join(f"new{n}@example.com\n" for n in range(4))
+        with pytest.raises(HTTPException) as e:
+            await server.import_roster("roster-a", upload(oversized), TEACHER)
+        assert e.value.status_code == 413
+        with pytest.raises(HTTPException) as e:
+            await server.import_roster("roster-a", upload('[{"email": "new0@example.com"}, {"email": "new1@', "roster.json"), TEACHER)
+        assert e.value.status_code == 400
+        assert await mongo_db.users.count_documents({"email": {"$regex": "^new"}}) == 0
+        assert await server.get_class_student_ids("roster-a") == []
+
+        report = await server.import_roster("roster-a", upload("email\nnew0@example.com\nnew0@example.com\nS1@example.com\n"), TEACHER)
+        assert (report["created"], report["existing"], report["enrolled"], report["failed_count"]) == (1, 1, 2, 1)
+
+    asyncio.run(run())
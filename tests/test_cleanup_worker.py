@@ -0,0 +1,115 @@
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+TEACHER_ID = "teacher-cleanup"
+
+
+def worker():
+    return server.CleanupWorker(batch_size=2, pause=0, poll_interval=60, lease=30)
+
+
+def dependent(test_id, n):
+    """A document fitting the unique indexes of every dependent collection"""
+    key = f"{test_id}-{n}"
+    return {"test_id": test_id, "student_id": key, "question_id": key, "token": key}
+
+
+def test_test_job_removes_the_test_and_all_its_dependents(mongo_db):
+    async def run():
+        # The test is still there, as after a crash between enqueueing and deleting it
+        await mongo_db.tests.insert_many([{"id": "t1", "teacher_id": TEACHER_ID}, {"id": "t2", "teacher_id": TEACHER_ID}])
+        # A test has a single assignment, and many of everything else
+        counts = {collection: 1 if collection == "assignments" else 5 for collection in server.TEST_DEPENDENTS}
+        for collection, count in counts.items():
+            await mongo_db[collection].insert_many(
+                [dependent("t1", n) for n in range(count)] + [dependent("t2", 0)]
+            )
+        await mongo_db.student_summaries.insert_one({"teacher_id": TEACHER_ID, "student_id": "s1"})
+
+        cleanup = worker()
+        job_id = await cleanup.enqueue("test", "t1", TEACHER_ID)
+        job = await cleanup._claim()
+        assert job["id"] == job_id
+        deleted = await cleanup.run_job(job)
+
+        assert await mongo_db.tests.count_documents({}) == 1
+        for collection in server.TEST_DEPENDENTS:
+            assert deleted[collection] == counts[collection]
+            assert await mongo_db[collection].count_documents({"test_id": "t1"}) == 0
+            assert await mongo_db[collection].count_documents({"test_id": "t2"}) == 1
+        assert deleted["student_summaries"] == 1
+        done = await mongo_db.cleanup_jobs.find_one({"id": job_id})
+        assert done["status"] == "done" and "lease_until" not in done
+        assert await cleanup._claim() is None
+
+    asyncio.run(run())
+
+
+def test_class_job_pulls_the_class_from_shared_assignments(mongo_db):
+    async def run():
+        await mongo_db.classes.insert_one({"id": "c1", "teacher_id": TEACHER_ID})
+        await mongo_db.enrollments.insert_many([{"class_id": "c1", "student_id": "s1"}, {"class_id": "c2", "student_id": "s1"}])
+        await mongo_db.assignments.insert_many([
+            {"id": "a1", "test_id": "t1", "class_ids": ["c1"]},
+            {"id": "a2", "test_id": "t2", "class_ids": ["c1", "c2"]},
+            {"id": "a3", "test_id": "t3", "class_ids": ["c2"]},
+            # Another teacher's assignment that was already empty is none of this job's business
+            {"id": "a4", "test_id": "t4", "class_ids": []}
+        ])
+
+        cleanup = worker()
+        await cleanup.enqueue("class", "c1", TEACHER_ID)
+        deleted = await cleanup.run_job(await cleanup._claim())
+
+        assert deleted == {"enrollments": 1, "assignments": 1}
+        assert await mongo_db.classes.count_documents({}) == 0
+        remaining = {a["id"]: a["class_ids"] for a in await mongo_db.assignments.find({}).to_list(None)}
+        assert remaining == {"a2": ["c2"], "a3": ["c2"], "a4": []}
+
+    asyncio.run(run())
+
+
+def test_expired_leases_are_reclaimed(mongo_db):
+    async def run():
+        now = datetime.now(timezone.utc)
+        await mongo_db.cleanup_jobs.insert_many([
+            {"id": "held", "kind": "test", "target_id": "t1", "teacher_id": TEACHER_ID, "status": "running",
+             "created_at": now - timedelta(minutes=10), "lease_until": now + timedelta(minutes=1)},
+            {"id": "abandoned", "kind": "test", "target_id": "t2", "teacher_id": TEACHER_ID, "status": "running",
+             "created_at": now - timedelta(minutes=5), "lease_until": now - timedelta(seconds=1)}
+        ])
+
+        cleanup = worker()
+        job = await cleanup._claim()
+        assert job["id"] == "abandoned"
+        assert job["lease_until"].replace(tzinfo=timezone.utc) > now
+        # The reclaimed job now holds a fresh lease, and the other is still held
+        assert await cleanup._claim() is None
+
+    asyncio.run(run())
+
+
+def test_reclaimed_class_job_still_removes_the_assignments_it_emptied(mongo_db):
+    async def run():
+        await mongo_db.assignments.insert_many([
+            {"id": "a1", "test_id": "t1", "class_ids": ["c1"]},
+            {"id": "a2", "test_id": "t2", "class_ids": []}
+        ])
+        cleanup = worker()
+        await cleanup.enqueue("class", "c1", TEACHER_ID)
+        job = await cleanup._claim()
+        # A first run recorded the assignments and pulled the class, then its process died
+        await mongo_db.cleanup_jobs.update_one({"id": job["id"]}, {"$set": {"assignment_ids": ["a1"]}})
+        await mongo_db.assignments.update_one({"id": "a1"}, {"$pull": {"class_ids": "c1"}})
+
+        deleted = await cleanup.run_job(await mongo_db.cleanup_jobs.find_one({"id": job["id"]}, {"_id": 0}))
+        assert deleted["assignments"] == 1
+        assert [a["id"] for a in await mongo_db.assignments.find({}).to_list(None)] == ["a2"]
+
+    asyncio.run(run())
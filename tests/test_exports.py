@@ -0,0 +1,73 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import pytest  # noqa: E402
+
+import server  # noqa: E402
+
+FIELDS = ["student_id", "name", "score", "submitted_at"]
+SUBMITTED = datetime(2026, 3, 2, 9, 30, tzinfo=timezone.utc)
+ROWS = [
+    {"student_id": f"s{n}", "name": f'Zoë "Z" O\'Neil, #{n}\nsecond line', "score": n * 1.5, "submitted_at": SUBMITTED, "extra": "x"}
+    for n in range(200)
+]
+
+
+async def _rows():
+    for row in ROWS:
+        yield row
+
+
+def encode(fmt, compress):
+    async def run():
+        return [chunk async for chunk in server.encode_rows(_rows(), fmt, FIELDS, compress)]
+    return asyncio.run(run())
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    # Force many chunks, so rows straddle chunk boundaries
+    monkeypatch.setattr(server, "EXPORT_CHUNK_SIZE", 256)
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_csv_round_trip(compress):
+    chunks = encode("csv", compress)
+    assert len(chunks) > 1
+    data = b"".join(chunks)
+    text = (gzip.decompress(data) if compress else data).decode()
+    parsed = list(csv.DictReader(io.StringIO(text)))
+    assert len(parsed) == len(ROWS)
+    assert list(parsed[0]) == FIELDS
+    for row, original in zip(parsed, ROWS):
+        assert row["name"] == original["name"]
+        assert float(row["score"]) == original["score"]
+        assert datetime.fromisoformat(row["submitted_at"]) == SUBMITTED
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_ndjson_round_trip(compress):
+    data = b"".join(encode("ndjson", compress))
+    lines = (gzip.decompress(data) if compress else data).decode().splitlines()
+    parsed = [json.loads(line) for line in lines]
+    assert parsed == [{**row, "submitted_at": SUBMITTED.isoformat()} for row in ROWS]
+
+
+def test_empty_exports_are_still_valid_files():
+    async def nothing():
+        return
+        yield
+
+    async def run(fmt, compress):
+        return b"".join([chunk async for chunk in server.encode_rows(nothing(), fmt, FIELDS, compress)])
+
+    assert asyncio.run(run("csv", False)).decode().splitlines() == [",".join(FIELDS)]
+    assert gzip.decompress(asyncio.run(run("ndjson", True))) == b""
@@ -0,0 +1,113 @@
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import numpy as np  # noqa: E402
+
+import forecasting  # noqa: E402
+import server  # noqa: E402
+
+START = date(2026, 3, 2)  # a Monday
+
+
+def daily_rows(standard, percentages, start=START, step=1):
+    return [
+        {"standard": standard, "day": (start + timedelta(days=i * step)).isoformat(), "percentage_sum": p, "submissions": 1}
+        for i, p in enumerate(percentages)
+    ]
+
+
+def test_linear_series_projects_next_bucket():
+    (result,) = forecasting.forecast(daily_rows("MATH.1", [40, 50, 60, 70]))
+    assert result["predicted_score"] == 80
+    assert result["slope_per_bucket"] == 10
+    assert result["trend"] == "improving"
+    assert result["interval"] == {"low": 80, "high": 80}
+    assert result["next_bucket"] == (START + timedelta(days=4)).isoformat()
+
+
+def test_all_standards_fit_at_once_match_individual_fits():
+    noisy = daily_rows("ELA.2", [90, 70, 85, 60, 75, 55])
+    flat = daily_rows("SCI.3", [70, 72, 68, 71, 69, 70])
+    together = {r["standard"]: r for r in forecasting.forecast(noisy + flat)}
+    assert together["ELA.2"] == forecasting.forecast(noisy)[0]
+    assert together["SCI.3"] == forecasting.forecast(flat)[0]
+    assert together["ELA.2"]["interval"]["low"] < together["ELA.2"]["predicted_score"] < together["ELA.2"]["interval"]["high"]
+    assert together["SCI.3"]["trend"] == "stable"
+
+
+def test_each_standard_projects_from_its_own_last_bucket():
+    stopped = daily_rows("ELA.2", [40, 50, 60, 70])
+    ongoing = daily_rows("SCI.3", [60, 61, 62, 63, 64, 65, 66, 67, 68, 69])
+    together = {r["standard"]: r for r in forecasting.forecast(stopped + ongoing)}
+    alone = forecasting.forecast(stopped)[0]
+    assert together["ELA.2"] == alone
+    assert together["ELA.2"]["predicted_score"] == 80
+    assert together["ELA.2"]["next_bucket"] == (START + timedelta(days=4)).isoformat()
+    assert together["SCI.3"]["next_bucket"] == (START + timedelta(days=10)).isoformat()
+
+
+def test_weekly_buckets_average_submissions_and_skip_gaps():
+    rows = daily_rows("MATH.1", [20, 40]) + daily_rows("MATH.1", [50], start=START + timedelta(days=14))
+    standards, periods, values, weights = forecasting.build_matrix(rows, "week")
+    assert standards == ["MATH.1"]
+    assert len(periods) == 3
+    assert values.tolist() == [[30, 0, 50]]
+    assert weights.tolist() == [[2, 0, 1]]
+
+
+def test_too_few_buckets_falls_back_to_ewma_level():
+    (result,) = forecasting.forecast(daily_rows("MATH.1", [40, 80]))
+    assert result["interval"] is None
+    assert result["predicted_score"] == result["current_average"] == 60
+    assert result["confidence"] == "low"
+
+
+def test_timelines_roll_up_by_month():
+    rows = [
+        {"standard": "MATH.1", "day": "2026-03-02", "correct": 3, "total": 4, "percentage_sum": 75.0, "submissions": 1},
+        {"standard": "MATH.1", "day": "2026-03-20", "correct": 2, "total": 8, "percentage_sum": 50.0, "submissions": 2},
+        {"standard": "MATH.1", "day": "2026-04-01", "correct": 4, "total": 4, "percentage_sum": 100.0, "submissions": 1}
+    ]
+    timeline = forecasting.bucket_timelines(rows, "month")["MATH.1"]
+    assert [(p["date"], p["percentage"], p["correct"], p["total"]) for p in timeline] == [
+        ("2026-03-01", 41.67, 5, 12),
+        ("2026-04-01", 100.0, 4, 4)
+    ]
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    x = np.arange(1000, dtype=float)
+    y = np.full(1000, 50.0)
+    y[500] = 100.0
+    keep = forecasting.lttb(x, y, 20)
+    assert len(keep) == 20
+    assert keep[0] == 0 and keep[-1] == 999
+    assert 500 in keep
+    assert (np.diff(keep) > 0).all()
+
+
+def test_forecast_cache_drops_forecasts_computed_before_a_submission():
+    cache = server.ForecastCache(ttl=60)
+    generation = cache.generation("t1")
+    cache.invalidate("t1")
+    cache.put("t1", "day", generation, "stale")
+    assert cache.get("t1", "day") is None
+    cache.put("t1", "day", cache.generation("t1"), "fresh")
+    assert cache.get("t1", "day") == "fresh"
+
+
+def test_forecast_cache_stays_bounded():
+    cache = server.ForecastCache(ttl=60)
+    cache.MAX_ENTRIES = 3
+    in_flight = cache.generation("t0")
+    for n in range(10):
+        cache.invalidate(f"t{n}")
+        cache.put(f"t{n}", "day", cache.generation(f"t{n}"), n)
+        assert len(cache._generations) <= 3 and len(cache._entries) <= 3
+    assert cache.get("t9", "day") == 9
+    # t0 was forgotten, but a forecast that started before the reset still cannot be stored
+    cache.put("t0", "day", in_flight, "stale")
+    assert cache.get("t0", "day") is None
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+# Cumulative time to import server.py in a fresh interpreter
+IMPORT_TIME_BUDGET_MS = float(os.environ.get("IMPORT_TIME_BUDGET_MS", "1500"))
+# Only generation, de-duplication, forecasting and login need these; they must not load at start-up
+HEAVY_MODULES = (
+    "emergentintegrations", "litellm", "google.genai", "google.generativeai", "openai",
+    "numpy", "forecasting", "question_similarity", "aiohttp"
+)
+
+
+def _import_times():
+    """Run `python -X importtime -c "import server"` and return {module: cumulative_us}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        times[name] = int(cumulative_us)
+    return times
+
+
+def test_server_import_skips_heavy_modules():
+    times = _import_times()
+    loaded = [name for name in times if any(name == m or name.startswith(m + ".") for m in HEAVY_MODULES)]
+    assert loaded == [], f"Heavy modules imported at start-up: {loaded[:10]}"
+
+
+def test_server_import_within_budget():
+    times = _import_times()
+    server_ms = times["server"] / 1000
+    assert server_ms < IMPORT_TIME_BUDGET_MS, f"import server: {server_ms:.0f}ms (budget {IMPORT_TIME_BUDGET_MS:.0f}ms)"
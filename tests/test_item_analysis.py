@@ -0,0 +1,97 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from item_analysis import item_increments, point_biserial, summarize_item  # noqa: E402
+
+QUESTIONS = [
+    {"id": f"q{i}", "question_text": f"Question {i}", "options": ["A", "B", "C", "D"], "correct_answer": 0, "standard": "MATH.1"}
+    for i in range(3)
+]
+
+
+def accumulate(responses):
+    totals = {}
+    for selected in responses:
+        for question_id, inc in item_increments(QUESTIONS, selected).items():
+            counters = totals.setdefault(question_id, {"choice_counts": {}})
+            for field, value in inc.items():
+                if field.startswith("choice_counts."):
+                    choice = field.split(".", 1)[1]
+                    counters["choice_counts"][choice] = counters["choice_counts"].get(choice, 0) + value
+                else:
+                    counters[field] = counters.get(field, 0) + value
+    return totals
+
+
+def pearson(xs, ys):
+    n = len(xs)
+    mx, my = sum(xs) / n, sum(ys) / n
+    cov = sum((x - mx) * (y - my) for x, y in zip(xs, ys))
+    return cov / (sum((x - mx) ** 2 for x in xs) ** 0.5 * sum((y - my) ** 2 for y in ys) ** 0.5)
+
+
+def test_counters_match_direct_item_rest_correlation():
+    responses = [
+        {"q0": 0, "q1": 0, "q2": 0},
+        {"q0": 0, "q1": 0, "q2": 1},
+        {"q0": 0, "q1": 2, "q2": 0},
+        {"q0": 1, "q1": 1, "q2": 3},
+        {"q0": 2, "q2": 0},
+        {"q0": 0, "q1": 1, "q2": 1}
+    ]
+    stats = accumulate(responses)["q0"]
+    item = [int(r.get("q0") == 0) for r in responses]
+    rest = [int(r.get("q1") == 0) + int(r.get("q2") == 0) for r in responses]
+    assert abs(point_biserial(stats) - pearson(item, rest)) < 1e-9
+
+    summary = summarize_item(QUESTIONS[1], accumulate(responses)["q1"])
+    assert summary["attempts"] == 6
+    assert summary["skipped"] == 1
+    assert summary["choice_counts"] == [2, 2, 1, 0]
+    assert summary["difficulty"] == round(2 / 6, 3)
+
+
+def test_flags_need_enough_attempts():
+    hard = accumulate([{"q0": 1, "q1": 0, "q2": 0}] * 9)
+    assert summarize_item(QUESTIONS[0], hard["q0"])["flags"] == []
+    hard = accumulate([{"q0": 1, "q1": 0, "q2": 0}] * 10)
+    assert summarize_item(QUESTIONS[0], hard["q0"])["flags"] == ["too_hard", "distractor_outdraws_key"]
+
+
+def test_unanswered_selections_count_as_skipped():
+    # Finalized autosave attempts submit -1 for questions never answered
+    increments = item_increments(QUESTIONS, {"q0": -1, "q1": 9, "q2": 0})
+    for question_id in ("q0", "q1"):
+        assert increments[question_id]["skipped"] == 1
+        assert not any(field.startswith("choice_counts.") for field in increments[question_id])
+    assert increments["q2"]["choice_counts.0"] == 1
+    assert increments["q2"]["rest_sum"] == 0
+
+
+def test_repeated_and_foreign_answers_count_once(mongo_db):
+    questions = [
+        server.Question(id=f"q{n}", question_text=f"Q{n}", options=["a", "b", "c", "d"], correct_answer=0, standard="MATH.1")
+        for n in range(4)
+    ]
+    test = server.Test(title="Quiz", teacher_id="teacher-items", resource_description="Sums", questions=questions)
+
+    async def run():
+        await mongo_db.tests.insert_one(test.model_dump())
+        answers = [server.StudentAnswer(question_id="q0", selected_answer=0)] * 4 + [
+            server.StudentAnswer(question_id="elsewhere", selected_answer=0)
+        ]
+        submission = await server.record_submission(test.model_dump(), "student-items", answers)
+        stats = await mongo_db.item_stats.find_one({"question_id": "q0"})
+        rollup = await mongo_db.org_rollups.find_one({"org_unit_id": "teacher-items", "standard": "MATH.1"})
+        return submission, stats, rollup
+
+    submission, stats, rollup = asyncio.run(run())
+    assert submission.score == 25
+    assert submission.standards_breakdown["MATH.1"] == {"correct": 1, "total": 1, "percentage": 100}
+    assert [a.question_id for a in submission.answers] == ["q0"]
+    assert (stats["attempts"], stats["correct"]) == (1, 1)
+    assert (rollup["correct"], rollup["total"]) == (1, 1)
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+NUM_STUDENTS = 200
+# p95 latency budget for a join while the whole class joins at once
+JOIN_P95_BUDGET_MS = float(os.environ.get("JOIN_P95_BUDGET_MS", "1500"))
+CLASS_CODE = "JOINME"
+
+STUDENTS = [
+    server.User(id=f"student-join-{i}", email=f"join{i}@example.com", name=f"Student {i}", role="student")
+    for i in range(NUM_STUDENTS)
+]
+
+
+async def _seed(db):
+    expires_at = datetime.now(timezone.utc) + timedelta(days=1)
+    await db.users.insert_many([s.model_dump() for s in STUDENTS])
+    await db.user_sessions.insert_many([
+        server.UserSession(user_id=s.id, session_token=f"session-{s.id}", expires_at=expires_at).model_dump()
+        for s in STUDENTS
+    ])
+    await db.classes.insert_one(
+        server.Class(id="class-join", teacher_id="teacher-join", name="Projector Class", class_code=CLASS_CODE).model_dump()
+    )
+
+
+async def _join(http, code, student):
+    started = time.perf_counter()
+    resp = await http.post(
+        "/api/classes/join",
+        json={"class_code": code},
+        headers={"Authorization": f"Bearer session-{student.id}"}
+    )
+    return resp, (time.perf_counter() - started) * 1000
+
+
+def test_concurrent_joins(mongo_db):
+    async def run():
+        await _seed(mongo_db)
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            results = await asyncio.gather(*[_join(http, CLASS_CODE, s) for s in STUDENTS])
+
+            for resp, _ in results:
+                assert resp.status_code == 200
+                body = resp.json()
+                assert body["message"] == "Successfully joined class"
+                assert "student_ids" not in body["class"]
+
+            latencies = sorted(ms for _, ms in results)
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            assert p95 < JOIN_P95_BUDGET_MS, f"{NUM_STUDENTS} concurrent joins: p95={p95:.1f}ms"
+
+            # Joining again is idempotent
+            resp, _ = await _join(http, CLASS_CODE, STUDENTS[0])
+            assert resp.status_code == 200
+            assert resp.json()["message"] == "Already enrolled in this class"
+
+            resp, _ = await _join(http, "ZZZZZZZ", STUDENTS[0])
+            assert resp.status_code == 404
+
+        assert sorted(await server.get_class_student_ids("class-join")) == sorted(s.id for s in STUDENTS)
+
+    asyncio.run(run())
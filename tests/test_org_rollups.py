@@ -0,0 +1,92 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import migrations  # noqa: E402
+import server  # noqa: E402
+
+ADMIN = server.User(id="admin", email="admin@example.com", name="Admin", role="teacher")
+TEACHER_ID = "teacher-rollups"
+
+
+def question(qid, standard):
+    return server.Question(id=qid, question_text=qid, options=["a", "b", "c", "d"], correct_answer=0, standard=standard)
+
+
+async def _seed(db):
+    await db.org_units.insert_many([
+        {"id": "district", "name": "District", "type": "district", "path": ["district"], "viewer_ids": []},
+        {"id": "north", "name": "North", "type": "school", "parent_id": "district", "path": ["district", "north"], "viewer_ids": []},
+        {"id": "south", "name": "South", "type": "school", "parent_id": "district", "path": ["district", "south"], "viewer_ids": []}
+    ])
+    teacher = server.User(id=TEACHER_ID, email="rollups@example.com", name="Rollups", role="teacher", org_path=["district", "north"])
+    await db.users.insert_one(teacher.model_dump())
+    test = server.Test(
+        title="Fractions", teacher_id=TEACHER_ID, resource_description="Fractions", status="published",
+        questions=[question("q1", "MATH.1"), question("q2", "MATH.2")], org_path=teacher.org_path
+    )
+    await db.tests.insert_one(test.model_dump())
+    return test.id
+
+
+async def _submit(db, test_id, student_id, selected):
+    test = await db.tests.find_one({"id": test_id}, {"_id": 0})
+    answers = [server.StudentAnswer(question_id=qid, selected_answer=s) for qid, s in zip(("q1", "q2"), selected)]
+    return await server.record_submission(test, student_id, answers)
+
+
+def _cube(sync_db):
+    cells = {}
+    for cell in sync_db.org_rollups.find({"submissions": {"$gt": 0}}, {"_id": 0, "compacted_at": 0}):
+        key = (cell.pop("org_unit_id"), cell.pop("standard"), cell.pop("day"))
+        cells[key] = {field: round(value, 6) for field, value in cell.items()}
+    return cells
+
+
+def test_incremental_rollups_and_moves_match_a_rebuild(mongo_db, sync_db):
+    async def run():
+        test_id = await _seed(mongo_db)
+        for n, selected in enumerate([(0, 0), (0, 1), (1, 1)]):
+            await _submit(mongo_db, test_id, f"s{n}", selected)
+
+        await server.add_org_members("south", server.OrgMembersRequest(teacher_ids=[TEACHER_ID]), ADMIN)
+        test = await mongo_db.tests.find_one({"id": test_id})
+        assert test["org_path"] == ["district", "south"]
+        await _submit(mongo_db, test_id, "s3", (0, 1))
+
+    asyncio.run(run())
+    incremental = _cube(sync_db)
+    assert {unit for unit, _, _ in incremental} == {"district", "south", TEACHER_ID}
+    assert sum(cell["submissions"] for (unit, standard, _), cell in incremental.items() if unit == "south" and standard is None) == 4
+
+    migrations.migrate_org_rollups(sync_db)
+    assert _cube(sync_db) == incremental
+
+
+def test_empty_and_negative_cells_are_left_out_of_org_analytics(mongo_db, monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_EMAILS", {ADMIN.email})
+
+    async def run():
+        await _seed(mongo_db)
+        base = {"correct": 0, "total": 0, "percentage_sum": 0, "score_sum": 0}
+        await mongo_db.org_rollups.insert_many([
+            {**base, "org_unit_id": "north", "standard": None, "day": "2024-03-04", "submissions": 2, "score_sum": 150},
+            {**base, "org_unit_id": "north", "standard": "MATH.1", "day": "2024-03-04", "submissions": 2, "percentage_sum": 150},
+            # Left behind by a teacher moving away, and by a move racing a submission
+            {**base, "org_unit_id": "north", "standard": "MATH.2", "day": "2024-03-04", "submissions": 0},
+            {**base, "org_unit_id": "north", "standard": "MATH.3", "day": "2024-03-05", "submissions": -1, "percentage_sum": -50},
+            {**base, "org_unit_id": "north", "standard": None, "day": "2024-03-05", "submissions": -1, "score_sum": -50}
+        ])
+        standards = await server.get_org_standards("north", bucket="day", max_points=10, days={}, user=ADMIN)
+        children = await server.get_org_children("district", days={}, user=ADMIN)
+        return standards, children
+
+    standards, children = asyncio.run(run())
+    assert [s["standard"] for s in standards["standards"]] == ["MATH.1"]
+    assert standards["summary"]["total_submissions"] == 2
+    assert standards["summary"]["average_score"] == 75
+    north = next(c for c in children["children"] if c["id"] == "north")
+    assert list(north["standards"]) == ["MATH.1"]
+    assert north["total_submissions"] == 2 and north["average_score"] == 75
@@ -0,0 +1,98 @@
+import asyncio
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from starlette.requests import Request  # noqa: E402
+from starlette.responses import Response  # noqa: E402
+
+import server  # noqa: E402
+
+
+def spin(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def other_thread_work(stop):
+    while not stop.is_set():
+        spin(0.01)
+
+
+def recorded_thread_work():
+    spin(0.2)
+
+
+def test_recordings_sample_only_their_own_thread():
+    sampler = server.StackSampler(1)
+    stop = threading.Event()
+    other = threading.Thread(target=other_thread_work, args=(stop,))
+    other.start()
+    try:
+        recording = sampler.start()
+        recorded_thread_work()
+        sampler.stop(recording)
+    finally:
+        stop.set()
+        other.join()
+
+    assert recording.samples > 0
+    assert any("recorded_thread_work" in stack for stack in recording.stacks)
+    assert not any("other_thread_work" in stack for stack in recording.stacks)
+
+
+class CountingSampler(server.StackSampler):
+    def __init__(self):
+        super().__init__(1)
+        self.started = 0
+
+    def start(self):
+        self.started += 1
+        return super().start()
+
+
+def make_request(headers=()):
+    return Request({"type": "http", "method": "GET", "path": "/api/tests", "query_string": b"", "headers": list(headers)})
+
+
+def test_fast_requests_are_not_sampled(monkeypatch):
+    sampler = CountingSampler()
+    monkeypatch.setattr(server, "profiler", sampler)
+    monkeypatch.setattr(server, "SLOW_REQUEST_THRESHOLD_MS", 200)
+
+    async def call_next(request):
+        return Response("ok")
+
+    response = asyncio.run(server.profile_requests(make_request(), call_next))
+    assert sampler.started == 0
+    assert "X-Profile-Id" not in response.headers
+
+
+def test_slow_requests_are_profiled_with_their_user(mongo_db, monkeypatch):
+    sampler = CountingSampler()
+    monkeypatch.setattr(server, "profiler", sampler)
+    monkeypatch.setattr(server, "SLOW_REQUEST_THRESHOLD_MS", 20)
+
+    async def call_next(request):
+        await asyncio.sleep(0.03)
+        spin(0.05)
+        return Response("ok")
+
+    async def run():
+        await mongo_db.users.insert_one({"id": "slow-user", "email": "slow@example.com", "name": "Slow", "role": "teacher"})
+        await mongo_db.user_sessions.insert_one({
+            "session_token": "slow-token", "user_id": "slow-user", "expires_at": datetime.now(timezone.utc) + timedelta(hours=1)
+        })
+        response = await server.profile_requests(make_request([(b"authorization", b"Bearer slow-token")]), call_next)
+        profile = await mongo_db.request_profiles.find_one({"id": response.headers["X-Profile-Id"]})
+        return profile
+
+    profile = asyncio.run(run())
+    assert sampler.started == 1
+    assert profile["trigger"] == "slow" and profile["user_id"] == "slow-user"
+    assert profile["samples"] > 0 and "spin" in profile["folded"]
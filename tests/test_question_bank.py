@@ -0,0 +1,90 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import pytest  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+
+import server  # noqa: E402
+
+TEACHER = server.User(id="teacher-bank", email="bank@example.com", name="Bank", role="teacher")
+OTHER_TEACHER = server.User(id="teacher-other", email="other@example.com", name="Other", role="teacher")
+
+
+async def _seed(db):
+    """Five bank questions for TEACHER (MATH.1 x3 for grade 3, MATH.2 x2 for grade 4) and one for another teacher"""
+    for teacher, grade, standard, texts in (
+        (TEACHER, "3rd Grade", "MATH.1", ["Add 2 and 3", "Add 4 and 5", "Subtract 1 from 9"]),
+        (TEACHER, "4th Grade", "MATH.2", ["Multiply 6 by 7", "Divide 8 by 2"]),
+        (OTHER_TEACHER, "3rd Grade", "MATH.1", ["Add 1 and 1"])
+    ):
+        test = {"id": f"{teacher.id}-{standard}", "grade_level": grade, "state_standards": "Common Core"}
+        questions = [server.Question(question_text=t, options=["1", "2", "3", "4"], correct_answer=0, standard=standard).model_dump() for t in texts]
+        await server.add_to_question_bank(teacher.id, test, questions)
+    return await db.question_bank.find({"teacher_id": TEACHER.id}, {"_id": 0}).to_list(None)
+
+
+def search(**filters):
+    return server.search_question_bank(**{"q": None, "standard": None, "grade_level": None, "skip": 0, "limit": 50, **filters}, teacher=TEACHER)
+
+
+def test_bank_search_filters_and_pages_the_teachers_questions(mongo_db):
+    async def run():
+        await _seed(mongo_db)
+        everything = await search()
+        assert everything["total"] == 5 and len(everything["questions"]) == 5
+        assert {q["teacher_id"] for q in everything["questions"]} == {TEACHER.id}
+
+        by_standard = await search(standard="MATH.2")
+        assert sorted(q["question_text"] for q in by_standard["questions"]) == ["Divide 8 by 2", "Multiply 6 by 7"]
+        by_grade = await search(grade_level="3rd Grade", skip=1, limit=1)
+        assert by_grade["total"] == 3 and len(by_grade["questions"]) == 1
+
+        by_text = await search(q="add")
+        assert sorted(q["question_text"] for q in by_text["questions"]) == ["Add 2 and 3", "Add 4 and 5"]
+
+    asyncio.run(run())
+
+
+def test_assembly_copies_chosen_questions_in_order(mongo_db):
+    async def run():
+        bank = await _seed(mongo_db)
+        chosen = [bank[3]["id"], bank[0]["id"]]
+        test = await server.assemble_test_from_bank(server.AssembleTestRequest(title="Mixed", question_ids=chosen), TEACHER)
+        assert [q.question_text for q in test.questions] == [bank[3]["question_text"], bank[0]["question_text"]]
+        # Copies get fresh ids
+        assert not {q.id for q in test.questions} & set(chosen)
+        assert test.status == "draft"
+        assert await mongo_db.tests.count_documents({"id": test.id}) == 1
+
+        other = await mongo_db.question_bank.find_one({"teacher_id": OTHER_TEACHER.id})
+        with pytest.raises(HTTPException) as e:
+            await server.assemble_test_from_bank(server.AssembleTestRequest(title="Theirs", question_ids=[other["id"]]), TEACHER)
+        assert e.value.status_code == 404
+        with pytest.raises(HTTPException) as e:
+            await server.assemble_test_from_bank(server.AssembleTestRequest(title="Empty"), TEACHER)
+        assert e.value.status_code == 400
+
+    asyncio.run(run())
+
+
+def test_sampling_by_standard_is_capped(mongo_db, monkeypatch):
+    monkeypatch.setattr(server, "MAX_ASSEMBLED_QUESTIONS", 2)
+
+    async def run():
+        await _seed(mongo_db)
+        sampled = await server.assemble_test_from_bank(
+            server.AssembleTestRequest(title="Sampled", standards=["MATH.1"], num_questions=10 ** 9), TEACHER
+        )
+        assert len(sampled.questions) == 2 and {q.standard for q in sampled.questions} == {"MATH.1"}
+
+        with pytest.raises(HTTPException) as e:
+            await server.assemble_test_from_bank(server.AssembleTestRequest(title="Too many", question_ids=["a", "b", "c"]), TEACHER)
+        assert e.value.status_code == 400
+        with pytest.raises(HTTPException) as e:
+            await server.assemble_test_from_bank(server.AssembleTestRequest(title="None", standards=["SCI.9"]), TEACHER)
+        assert e.value.status_code == 404
+
+    asyncio.run(run())
@@ -0,0 +1,107 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import pytest  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+
+import server  # noqa: E402
+from llm_providers import StubProvider  # noqa: E402
+from question_generation import QuestionGenerator  # noqa: E402
+
+TEACHER = server.User(id="teacher-edit", email="edit@example.com", name="Edit", role="teacher")
+OTHER_TEACHER = server.User(id="teacher-other", email="other@example.com", name="Other", role="teacher")
+
+
+def new_question(text="What is 2 + 2?", **overrides):
+    return server.AddQuestionRequest(**{"question_text": text, "options": ["3", "4", "5", "6"], "correct_answer": 1, "standard": "MATH.1", **overrides})
+
+
+async def _seed(db):
+    test = server.Test(title="Edits", teacher_id=TEACHER.id, resource_description="Arithmetic", questions=[])
+    await db.tests.insert_one(test.model_dump())
+    return test.id
+
+
+def test_added_questions_get_server_ids_and_are_banked(mongo_db):
+    async def run():
+        test_id = await _seed(mongo_db)
+        # A client-supplied id is ignored, so resending one cannot collide
+        first = await server.add_question(test_id, server.AddQuestionRequest(**{**new_question().model_dump(), "id": "client-id"}), TEACHER)
+        body = {**new_question("Which planet is closest to the Sun?", options=["Venus", "Mercury", "Mars", "Earth"]).model_dump(), "id": "client-id"}
+        second = await server.add_question(test_id, server.AddQuestionRequest(**body), TEACHER)
+        ids = [q["id"] for q in second["questions"]]
+        assert len(first["questions"]) == 1 and len(set(ids)) == 2 and "client-id" not in ids
+        assert await mongo_db.question_signatures.count_documents({"test_id": test_id}) == 2
+        banked = await mongo_db.question_bank.find({"teacher_id": TEACHER.id}, {"_id": 0, "id": 1}).to_list(None)
+        assert sorted(b["id"] for b in banked) == sorted(ids)
+
+        # Re-adding the same question is caught like a generated duplicate
+        with pytest.raises(HTTPException) as e:
+            await server.add_question(test_id, new_question(), TEACHER)
+        assert e.value.status_code == 409
+        assert len((await mongo_db.tests.find_one({"id": test_id}))["questions"]) == 2
+
+        with pytest.raises(HTTPException) as e:
+            await server.add_question(test_id, new_question(correct_answer=4), TEACHER)
+        assert e.value.status_code == 400
+        with pytest.raises(HTTPException) as e:
+            await server.add_question(test_id, new_question(), OTHER_TEACHER)
+        assert e.value.status_code == 403
+
+    asyncio.run(run())
+
+
+def test_update_keeps_the_answer_key_in_range_and_resets_stats(mongo_db):
+    async def run():
+        test_id = await _seed(mongo_db)
+        added = await server.add_question(test_id, new_question(), TEACHER)
+        question_id = added["questions"][0]["id"]
+        await mongo_db.item_stats.insert_one({"test_id": test_id, "question_id": question_id, "attempts": 3})
+
+        # correct_answer 1 would no longer point at an option
+        with pytest.raises(HTTPException) as e:
+            await server.update_question(test_id, question_id, server.UpdateQuestionRequest(options=["4"]), TEACHER)
+        assert e.value.status_code == 404
+
+        updated = await server.update_question(
+            test_id, question_id, server.UpdateQuestionRequest(options=["4", "5"], correct_answer=0), TEACHER
+        )
+        assert updated["questions"][0]["options"] == ["4", "5"]
+        assert updated["questions"][0]["correct_answer"] == 0
+        assert await mongo_db.item_stats.count_documents({"question_id": question_id}) == 0
+
+        await server.delete_question(test_id, question_id, TEACHER)
+        test = await mongo_db.tests.find_one({"id": test_id})
+        assert test["questions"] == []
+        assert await mongo_db.question_signatures.count_documents({"question_id": question_id}) == 0
+        with pytest.raises(HTTPException) as e:
+            await server.delete_question(test_id, question_id, TEACHER)
+        assert e.value.status_code == 404
+
+    asyncio.run(run())
+
+
+class DeletingProvider(StubProvider):
+    """Deletes the test while its questions are being generated"""
+
+    def __init__(self, db, test_id):
+        super().__init__()
+        self.db, self.test_id = db, test_id
+
+    async def complete(self, prompt, system_message, **kwargs):
+        await self.db.tests.delete_one({"id": self.test_id})
+        return await super().complete(prompt, system_message, **kwargs)
+
+
+def test_generate_more_on_a_test_deleted_meanwhile_is_not_found(mongo_db, monkeypatch):
+    async def run():
+        test_id = await _seed(mongo_db)
+        monkeypatch.setattr(server, "question_generator", QuestionGenerator(DeletingProvider(mongo_db, test_id), batch_window_ms=0))
+        with pytest.raises(HTTPException) as e:
+            await server.generate_more_questions(test_id, request=None, num_questions=2, file=None, teacher=TEACHER)
+        assert e.value.status_code == 404
+
+    asyncio.run(run())
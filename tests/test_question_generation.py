@@ -0,0 +1,124 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from llm_providers import LlmProvider, StubProvider, get_llm_provider  # noqa: E402
+from question_generation import QuestionGenerator, parse_questions  # noqa: E402
+
+TEST_DOC = {
+    "id": "test-1",
+    "resource_description": "Two-digit addition",
+    "questions": [{"standard": "CCSS.Math.2.NBT.B.5"}]
+}
+
+
+class FlakyProvider(StubProvider):
+    """Fails the first `failures` calls, then behaves like the stub"""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    async def complete(self, prompt, system_message, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            return "not json"
+        return await super().complete(prompt, system_message, **kwargs)
+
+
+class ShortProvider(StubProvider):
+    """Returns at most `limit` questions whatever the prompt asks for"""
+
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+
+    async def complete(self, prompt, system_message, **kwargs):
+        questions = json.loads(await super().complete(prompt, system_message, **kwargs))
+        return json.dumps(questions[:self.limit])
+
+
+def test_stub_is_deterministic():
+    generator = QuestionGenerator(StubProvider())
+
+    async def run():
+        first = await generator.generate_test(5, "Fractions")
+        second = await generator.generate_test(5, "Fractions")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert len(first) == 5
+    assert first == second
+    for q in first:
+        assert len(q["options"]) == 4
+        assert 0 <= q["correct_answer"] <= 3
+
+
+def test_concurrent_generate_more_is_batched():
+    provider = StubProvider(latency_ms=10)
+    generator = QuestionGenerator(provider, batch_window_ms=20, max_batch_questions=20)
+
+    async def run():
+        return await asyncio.gather(*[generator.generate_more(TEST_DOC, n) for n in (2, 3, 5)])
+
+    results = asyncio.run(run())
+    assert [len(r) for r in results] == [2, 3, 5]
+    assert provider.calls == 1
+    # Each caller gets its own slice of the shared call
+    texts = [q["question_text"] for r in results for q in r]
+    assert len(texts) == 10
+
+
+def test_short_batched_reply_fails_the_requests_it_cannot_fill():
+    generator = QuestionGenerator(ShortProvider(limit=4), batch_window_ms=20, max_batch_questions=20)
+
+    async def run():
+        return await asyncio.gather(*[generator.generate_more(TEST_DOC, n) for n in (2, 3, 5)], return_exceptions=True)
+
+    first, second, third = asyncio.run(run())
+    assert len(first) == 2
+    for result in (second, third):
+        assert isinstance(result, ValueError)
+        assert "returned 4 of the 10 questions" in str(result)
+    assert not generator._flush_tasks
+
+
+def test_retries_then_succeeds():
+    provider = FlakyProvider(failures=2)
+    generator = QuestionGenerator(provider, max_retries=2, retry_backoff=0)
+    questions = asyncio.run(generator.generate_test(3, "Fractions"))
+    assert len(questions) == 3
+
+
+def test_gives_up_after_max_retries():
+    generator = QuestionGenerator(FlakyProvider(failures=5), max_retries=1, retry_backoff=0)
+    with pytest.raises(ValueError, match="Failed to parse AI response"):
+        asyncio.run(generator.generate_test(3, "Fractions"))
+
+
+def test_timeout():
+    generator = QuestionGenerator(StubProvider(latency_ms=200), timeout=0.05, max_retries=0)
+    with pytest.raises(TimeoutError):
+        asyncio.run(generator.generate_test(3, "Fractions"))
+
+
+def test_parse_strips_markdown_fence():
+    assert parse_questions('```json\n[{"question_text": "Q"}]\n```') == [{"question_text": "Q"}]
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        get_llm_provider("nope")
+
+
+def test_providers_must_implement_complete():
+    class Incomplete(LlmProvider):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,67 @@
+import asyncio
+import io
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import pytest  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+
+import server  # noqa: E402
+from llm_providers import StubProvider  # noqa: E402
+from question_generation import QuestionGenerator  # noqa: E402
+
+TEACHER = server.User(id="teacher-gen", email="gen@example.com", name="Gen", role="teacher")
+
+
+def generate(**overrides):
+    args = dict(
+        request=None, title="Sums", resource_description="Two-digit addition", num_questions=5,
+        grade_level=None, state_standards=None, standards=None, file=None, teacher=TEACHER
+    )
+    return server.generate_test(**{**args, **overrides})
+
+
+def test_regenerating_only_duplicates_is_rejected(mongo_db, monkeypatch):
+    # The stub provider answers identical prompts with identical questions
+    monkeypatch.setattr(server, "question_generator", QuestionGenerator(StubProvider()))
+
+    async def run():
+        first = await generate()
+        assert len(first["questions"]) == 5
+        assert first["duplicates_skipped"] == 0
+
+        with pytest.raises(HTTPException) as e:
+            await generate(title="Sums again")
+        assert e.value.status_code == 409
+        assert await mongo_db.tests.count_documents({"teacher_id": TEACHER.id}) == 1
+
+    asyncio.run(run())
+
+
+def test_throttled_upload_is_not_written(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "generation_admission", server.GenerationAdmission(1 / 60, 1, 1, 0, 1))
+    saved = []
+
+    async def save_upload(file):
+        saved.append(file.filename)
+        return str(tmp_path / file.filename), "text/plain"
+
+    async def generate_test(*args, **kwargs):
+        return []
+
+    monkeypatch.setattr(server, "save_upload", save_upload)
+    monkeypatch.setattr(server.question_generator, "generate_test", generate_test)
+
+    async def run():
+        upload = server.UploadFile(io.BytesIO(b"notes"), filename="notes.txt")
+        with pytest.raises(HTTPException) as e:
+            await generate(file=upload)
+        # The stub generator returns nothing, so the admitted request fails after saving
+        assert e.value.status_code == 409 and saved == ["notes.txt"]
+        with pytest.raises(HTTPException) as e:
+            await generate(file=upload)
+        assert e.value.status_code == 429 and saved == ["notes.txt"]
+
+    asyncio.run(run())
@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from question_similarity import SimilarityIndex, minhash, similarity  # noqa: E402
+
+CAPITAL = {"question_text": "What is the capital of France?", "options": ["Paris", "London", "Rome", "Berlin"]}
+
+
+def test_rephrased_question_is_near_duplicate():
+    rephrased = {"question_text": "what is the capital  of FRANCE ?", "options": ["Berlin", "Rome", "London", "Paris"]}
+    assert similarity(minhash(CAPITAL), minhash(rephrased)) == 1.0
+
+
+def test_different_numbers_are_not_duplicates():
+    a = {"question_text": "What is 2 + 3?", "options": ["5", "6", "7", "4"]}
+    b = {"question_text": "What is 2 + 4?", "options": ["6", "5", "7", "8"]}
+    assert similarity(minhash(a), minhash(b)) < 0.8
+
+
+def test_index_finds_only_similar_questions():
+    index = SimilarityIndex()
+    index.add("capital", minhash(CAPITAL))
+    index.add("photosynthesis", minhash({
+        "question_text": "Which gas do plants absorb during photosynthesis?",
+        "options": ["Oxygen", "Carbon dioxide", "Nitrogen", "Helium"]
+    }))
+
+    close = {"question_text": "What is the capital city of France?", "options": CAPITAL["options"]}
+    assert index.find_similar(minhash(close)) == ["capital"]
+    assert index.find_similar(minhash({"question_text": "How many legs does a spider have?", "options": ["6", "8", "10", "4"]})) == []
@@ -0,0 +1,146 @@
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient, monitoring
+from pymongo.read_preferences import Primary, Secondary, SecondaryPreferred
+from pymongo.write_concern import WriteConcern
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from data_access import DataAccess, read_preference, routes_from_env  # noqa: E402
+
+MONGOD = os.environ.get("MONGOD_BIN") or shutil.which("mongod")
+REPLICA_SET = "rs-routing-test"
+
+
+def test_routes_default_to_secondaries_for_analytics_and_reports():
+    routes = routes_from_env({})
+    assert routes["primary"] == ("primary", None)
+    assert routes["analytics"] == routes["reports"] == ("secondaryPreferred", 90)
+
+    routes = routes_from_env({
+        "REPORTS_READ_PREFERENCE": "nearest",
+        "REPORTS_MAX_STALENESS_SECONDS": "0",
+        "ANALYTICS_READ_PREFERENCE": "primary",
+        "PRIMARY_READ_PREFERENCE": "secondary"
+    })
+    assert routes["primary"] == ("primary", None)
+    assert routes["analytics"] == ("primary", None)
+    assert routes["reports"] == ("nearest", None)
+
+
+def test_invalid_read_preferences_are_rejected():
+    assert read_preference("secondaryPreferred", 120) == SecondaryPreferred(max_staleness=120)
+    assert read_preference("primary", 120) == Primary()
+    with pytest.raises(ValueError):
+        read_preference("secondaryPreferred", 30)
+    with pytest.raises(ValueError):
+        read_preference("secondaries")
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(predicate, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if predicate():
+                return
+        except Exception:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError("replica set did not come up")
+
+
+@pytest.fixture(scope="module")
+def replica_set(tmp_path_factory):
+    """Two local mongods, a primary and a priority-0 secondary; skipped without a mongod binary"""
+    if not MONGOD:
+        pytest.skip("mongod is not installed")
+
+    members, processes = [], []
+    try:
+        for i in range(2):
+            port, dbpath = _free_port(), tmp_path_factory.mktemp(f"rs{i}")
+            processes.append(subprocess.Popen(
+                [MONGOD, "--replSet", REPLICA_SET, "--port", str(port), "--dbpath", str(dbpath),
+                 "--bind_ip", "127.0.0.1", "--logpath", str(dbpath / "mongod.log")],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            ))
+            members.append(f"127.0.0.1:{port}")
+
+        seed = MongoClient(members[0], directConnection=True, serverSelectionTimeoutMS=30000)
+        seed.admin.command("replSetInitiate", {"_id": REPLICA_SET, "members": [
+            {"_id": 0, "host": members[0], "priority": 1},
+            {"_id": 1, "host": members[1], "priority": 0}
+        ]})
+
+        def ready():
+            states = [m["stateStr"] for m in seed.admin.command("replSetGetStatus")["members"]]
+            return sorted(states) == ["PRIMARY", "SECONDARY"]
+        _wait_for(ready)
+        seed.close()
+
+        yield {"url": f"mongodb://{','.join(members)}/?replicaSet={REPLICA_SET}", "primary": members[0], "secondary": members[1]}
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+
+
+class CommandLog(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        self.commands.append((event.command_name, event.database_name, "%s:%s" % event.connection_id))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def hosts(self, command_name, db_name):
+        return {host for name, database, host in self.commands if name == command_name and database == db_name}
+
+
+def test_analytics_and_reports_read_from_the_secondary(replica_set):
+    log = CommandLog()
+
+    async def run():
+        client = AsyncIOMotorClient(replica_set["url"], event_listeners=[log])
+        data = DataAccess(client, "routing_test", routes_from_env({}))
+        try:
+            replicated = data.primary.get_collection("submissions", write_concern=WriteConcern(w=2, wtimeout=30000))
+            await replicated.insert_one({"id": "sub-1", "test_id": "t1"})
+            # Block until the client has discovered the secondary, so secondaryPreferred has a choice
+            await client.get_database("admin", read_preference=Secondary()).command("ping")
+
+            await data.primary.submissions.find_one({"id": "sub-1"})
+            primary_reads = log.hosts("find", "routing_test")
+            log.commands.clear()
+            await data["analytics"].submissions.aggregate([{"$match": {"test_id": "t1"}}]).to_list(None)
+            await data["reports"].submissions.find({"test_id": "t1"}).to_list(None)
+            return primary_reads, log.hosts("aggregate", "routing_test"), log.hosts("find", "routing_test")
+        finally:
+            await client.drop_database("routing_test")
+            client.close()
+
+    primary_reads, analytics_reads, report_reads = asyncio.run(run())
+    assert primary_reads == {replica_set["primary"]}
+    assert analytics_reads == {replica_set["secondary"]}
+    assert report_reads == {replica_set["secondary"]}
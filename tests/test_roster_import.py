@@ -0,0 +1,46 @@
+import io
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import pytest  # noqa: E402
+
+from roster_import import RosterParseError, iter_json_records, iter_roster_rows, normalize_roster_row  # noqa: E402
+
+
+def rows(data, filename):
+    return list(iter_roster_rows(io.BytesIO(data.encode("utf-8")), filename, None, chunk_size=7))
+
+
+def test_csv_rows_survive_small_chunks_and_quoted_newlines():
+    data = '﻿Email,Name\r\nA@School.org,"Lee,\nAnn"\r\nb@school.org,\r\n'
+    assert rows(data, "roster.csv") == [
+        (2, {"email": "A@School.org", "name": "Lee,\nAnn"}),
+        (3, {"email": "b@school.org", "name": ""})
+    ]
+    assert normalize_roster_row(rows(data, "roster.csv")[0][1]) == ("a@school.org", "Lee,\nAnn", None)
+    assert normalize_roster_row({"email": "not-an-email"})[2] == "invalid email"
+
+
+def test_csv_fields_keep_unicode_line_separators():
+    data = 'email,name\r\nc@school.org,"Tab\x0bForm\x0cFeed"\r\nd@school.org,Line\u2028Sep\x1cD\r\n'
+    assert rows(data, "roster.csv") == [
+        (2, {"email": "c@school.org", "name": "Tab\x0bForm\x0cFeed"}),
+        (3, {"email": "d@school.org", "name": "Line\u2028Sep\x1cD"})
+    ]
+
+
+def test_json_array_and_ndjson_stream_the_same_records():
+    records = [{"email": "a@school.org", "name": "A [1]"}, {"email": "b@school.org"}]
+    array = '[\n  {"email": "a@school.org", "name": "A [1]"},\n  {"email": "b@school.org"}\n]'
+    ndjson = '{"email": "a@school.org", "name": "A [1]"}\n{"email": "b@school.org"}\n'
+    chunked = (array[i:i + 5] for i in range(0, len(array), 5))
+    assert list(iter_json_records(chunked)) == records
+    assert [record for _, record in rows(ndjson, "roster.ndjson")] == records
+
+
+def test_truncated_json_reports_the_failing_row():
+    with pytest.raises(RosterParseError) as e:
+        rows('[{"email": "a@school.org"}, {"email": "b@', "roster.json")
+    assert e.value.row == 2
@@ -0,0 +1,67 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import pytest  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+
+import server  # noqa: E402
+
+TEACHER = server.User(id="teacher-access", email="access@example.com", name="Access", role="teacher")
+STUDENT = server.User(id="student-access", email="student@example.com", name="Student", role="student")
+OUTSIDER = server.User(id="student-outside", email="outside@example.com", name="Outside", role="student")
+
+
+async def _seed(db):
+    questions = [
+        server.Question(question_text=f"Q{n}", options=["right", "wrong 1", "wrong 2", "wrong 3"], correct_answer=0, standard="MATH.1")
+        for n in range(4)
+    ]
+    test = server.Test(title="Quiz", teacher_id=TEACHER.id, resource_description="Sums", questions=questions, status="published")
+    await db.tests.insert_one(test.model_dump())
+    await db.classes.insert_one(server.Class(
+        id="class-access", teacher_id=TEACHER.id, name="Access", class_code="ACCESS", student_ids=[STUDENT.id]
+    ).model_dump())
+    await db.assignments.insert_one(server.Assignment(test_id=test.id, class_ids=["class-access"]).model_dump())
+    return test.id
+
+
+def test_students_never_receive_the_answer_key(mongo_db):
+    async def run():
+        test_id = await _seed(mongo_db)
+        (listed,) = await server.get_tests(STUDENT)
+        single = await server.get_test(test_id, STUDENT)
+        for test in (listed, single):
+            assert test["title"] == "Quiz" and len(test["questions"]) == 4
+            assert "teacher_id" not in test
+            assert all(set(q) == {"id", "question_text", "options"} for q in test["questions"])
+
+        # Assignment is checked through the student's classes
+        with pytest.raises(HTTPException) as e:
+            await server.get_test(test_id, OUTSIDER)
+        assert e.value.status_code == 403
+        # The teacher still sees the key
+        assert "correct_answer" in (await server.get_test(test_id, TEACHER))["questions"][0]
+
+    asyncio.run(run())
+
+
+def test_student_submissions_are_scored_against_their_shuffled_view(mongo_db):
+    async def run():
+        test_id = await _seed(mongo_db)
+        view = await server.get_test_for_taking(test_id, STUDENT)
+        answers = [server.StudentAnswer(question_id=q.id, selected_answer=q.options.index("right")) for q in view.questions]
+
+        with pytest.raises(HTTPException) as e:
+            await server.submit_test(server.SubmitTestRequest(test_id=test_id, answers=answers), STUDENT)
+        assert e.value.status_code == 400
+        assert await mongo_db.submissions.count_documents({}) == 0
+
+        submission = await server.submit_test(
+            server.SubmitTestRequest(test_id=test_id, answers=answers, attempt_token=view.attempt_token), STUDENT
+        )
+        assert submission.score == 100
+
+    asyncio.run(run())
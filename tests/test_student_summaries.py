@@ -0,0 +1,79 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+TEACHER_ID = "teacher-sum"
+STUDENT_ID = "student-sum"
+TEST = {
+    "id": "test-sum",
+    "teacher_id": TEACHER_ID,
+    "questions": [
+        {"id": f"q{i}", "question_text": f"Q{i}", "options": ["a", "b", "c", "d"], "correct_answer": i % 4, "standard": f"MATH.{i % 2}"}
+        for i in range(4)
+    ]
+}
+
+
+def answers(*selected):
+    return [server.StudentAnswer(question_id=f"q{i}", selected_answer=a) for i, a in enumerate(selected)]
+
+
+def comparable(summary):
+    return {k: summary[k] for k in ("total_tests", "score_sum", "standards")}
+
+
+async def _seed(db):
+    await db.tests.insert_one(dict(TEST))
+
+
+def test_incremental_summary_matches_full_rebuild(mongo_db):
+    async def run():
+        await _seed(mongo_db)
+        await server.record_submission(TEST, STUDENT_ID, answers(0, 1, 2, 3))
+        # The first read builds the summary; later submissions are applied incrementally
+        await server.rebuild_student_summary(TEACHER_ID, STUDENT_ID)
+        await server.record_submission(TEST, STUDENT_ID, answers(1, 1, 1, 1))
+        await server.record_submission(TEST, STUDENT_ID, answers(0, 0, 2, 0))
+
+        stored = await mongo_db.student_summaries.find_one({"teacher_id": TEACHER_ID, "student_id": STUDENT_ID})
+        expected = await server.summarize_student(TEACHER_ID, STUDENT_ID)
+        assert stored["total_tests"] == 3
+        assert comparable(stored) == comparable(expected)
+
+    asyncio.run(run())
+
+
+def test_rebuild_racing_an_increment_counts_the_submission_once(mongo_db):
+    async def run():
+        await _seed(mongo_db)
+        submission = server.Submission(
+            test_id=TEST["id"], student_id=STUDENT_ID, answers=answers(0, 1, 2, 3), score=100.0,
+            standards_breakdown={"MATH.0": {"correct": 2, "total": 2, "percentage": 100.0}}
+        ).model_dump()
+        # record_submission has inserted, then a report read rebuilds before the increment lands
+        await mongo_db.submissions.insert_one(dict(submission))
+        rebuilt = await server.rebuild_student_summary(TEACHER_ID, STUDENT_ID)
+        await server.apply_submission_to_summary(TEACHER_ID, submission)
+        await server.apply_submission_to_summary(TEACHER_ID, submission)
+
+        stored = await mongo_db.student_summaries.find_one({"teacher_id": TEACHER_ID, "student_id": STUDENT_ID})
+        assert rebuilt["total_tests"] == stored["total_tests"] == 1
+        assert stored["standards"]["MATH%2E0"] == {"correct": 2, "total": 2, "tests_count": 1}
+
+    asyncio.run(run())
+
+
+def test_increment_before_the_summary_exists_is_caught_up_by_the_rebuild(mongo_db):
+    async def run():
+        await _seed(mongo_db)
+        submission = await server.record_submission(TEST, STUDENT_ID, answers(0, 1, 2, 3))
+        assert await mongo_db.student_summaries.count_documents({}) == 0
+        rebuilt = await server.rebuild_student_summary(TEACHER_ID, STUDENT_ID)
+        assert rebuilt["total_tests"] == 1
+        assert rebuilt["score_sum"] == submission.score
+
+    asyncio.run(run())
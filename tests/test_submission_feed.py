@@ -0,0 +1,106 @@
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from starlette.requests import Request  # noqa: E402
+
+import server  # noqa: E402
+
+TEACHER = server.User(id="teacher-feed", email="feed@example.com", name="Feed", role="teacher")
+
+
+def test_publish_is_in_process_only_while_the_change_stream_is_down():
+    async def run():
+        feed = server.SubmissionFeed()
+        queue = feed.subscribe("t1")
+        other = feed.subscribe("t2")
+        feed.publish({"id": "s1", "test_id": "t1"})
+        feed.change_stream_active = True
+        feed.publish({"id": "s2", "test_id": "t1"})
+        assert queue.get_nowait()["id"] == "s1" and queue.empty() and other.empty()
+        feed.unsubscribe("t1", queue)
+        feed.unsubscribe("t2", other)
+        assert feed._subscribers == {}
+
+    asyncio.run(run())
+
+
+class FlakyCollection:
+    """Change streams that fail to open, then deliver one change and drop, then stay open"""
+
+    def __init__(self):
+        self.opened = []
+
+    def watch(self, pipeline, resume_after=None):
+        self.opened.append(resume_after)
+        return FlakyStream(len(self.opened))
+
+
+class FlakyStream:
+    def __init__(self, attempt):
+        self.attempt = attempt
+
+    async def __aenter__(self):
+        if self.attempt == 1:
+            raise server.OperationFailure("The $changeStream stage is only supported on replica sets", 40573)
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def __aiter__(self):
+        if self.attempt == 2:
+            yield {"_id": {"_data": "token-1"}, "fullDocument": {"_id": 1, "id": "s1", "test_id": "t1"}}
+            raise server.OperationFailure("connection reset", 6)
+        yield {"_id": {"_data": "token-2"}, "fullDocument": {"_id": 2, "id": "s2", "test_id": "t1"}}
+        await asyncio.Event().wait()
+
+
+def test_change_stream_is_reopened_and_resumed_after_errors(monkeypatch):
+    collection = FlakyCollection()
+    monkeypatch.setattr(server, "db", SimpleNamespace(submissions=collection))
+
+    async def run():
+        feed = server.SubmissionFeed()
+        feed.RETRY_DELAYS = (0,)
+        queue = feed.subscribe("t1")
+        feed.start()
+        try:
+            first = await asyncio.wait_for(queue.get(), timeout=5)
+            second = await asyncio.wait_for(queue.get(), timeout=5)
+            assert feed.change_stream_active
+        finally:
+            feed.stop()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert (first["id"], second["id"]) == ("s1", "s2") and "_id" not in first
+    assert collection.opened == [None, None, {"_data": "token-1"}]
+
+
+def test_stream_subscribes_only_while_it_is_being_read(mongo_db):
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def run():
+        await mongo_db.tests.insert_one({"id": "live", "teacher_id": TEACHER.id})
+        request = Request({"type": "http", "method": "GET", "path": "/", "headers": []}, receive)
+
+        # A response that is never streamed leaves nothing behind
+        await server.stream_test_submissions("live", request, TEACHER)
+        assert "live" not in server.submission_feed._subscribers
+
+        response = await server.stream_test_submissions("live", request, TEACHER)
+        events = response.body_iterator
+        snapshot = await events.__anext__()
+        assert snapshot.startswith("event: snapshot")
+        assert len(server.submission_feed._subscribers["live"]) == 1
+        # The client has gone, so the stream ends and unsubscribes
+        async for _ in events:
+            pass
+        assert "live" not in server.submission_feed._subscribers
+
+    asyncio.run(run())
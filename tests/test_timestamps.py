@@ -0,0 +1,36 @@
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from server import as_utc, rollup_days_between, time_range_filter  # noqa: E402
+
+JAN = datetime(2026, 1, 1, tzinfo=timezone.utc)
+FEB = datetime(2026, 2, 1, tzinfo=timezone.utc)
+
+
+def test_stored_timestamps_read_as_utc():
+    assert as_utc("2026-01-01T00:00:00+00:00") == JAN
+    assert as_utc(datetime(2026, 1, 1)) == JAN  # naive BSON dates are UTC
+    assert as_utc(JAN) is JAN
+    assert as_utc(None) is None
+
+
+def test_range_filter_matches_dates_and_legacy_strings():
+    assert time_range_filter("submitted_at", JAN, FEB) == {"$or": [
+        {"submitted_at": {"$gte": JAN, "$lt": FEB}},
+        {"submitted_at": {"$gte": "2026-01-01T00:00:00+00:00", "$lt": "2026-02-01T00:00:00+00:00"}}
+    ]}
+    assert time_range_filter("submitted_at", None, None) == {}
+    with pytest.raises(HTTPException):
+        time_range_filter("submitted_at", FEB, JAN)
+
+
+def test_rollup_window_includes_partial_days():
+    assert rollup_days_between(JAN, FEB) == {"day": {"$gte": "2026-01-01", "$lte": "2026-01-31"}}
+    assert rollup_days_between(None, datetime(2026, 2, 1, 12, tzinfo=timezone.utc)) == {"day": {"$lte": "2026-02-01"}}
+    assert rollup_days_between(None, None) == {}